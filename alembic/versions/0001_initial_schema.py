@@ -0,0 +1,79 @@
+"""Initial schema: users and gift_sessions
+
+Databases created earlier through create_tables() already have these
+tables and should be stamped at this revision instead of upgraded:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-01-15 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("instagram_id", sa.String(255), nullable=True),
+        sa.Column("whatsapp_id", sa.String(255), nullable=True),
+        sa.Column("name", sa.String(100), nullable=True),
+        sa.Column("email", sa.String(255), nullable=True, unique=True),
+        sa.Column("preferences", sa.JSON(), nullable=True),
+        sa.Column("personality_traits", sa.JSON(), nullable=True),
+        sa.Column("values", sa.JSON(), nullable=True),
+        sa.Column("typical_budget_min", sa.Integer(), nullable=True),
+        sa.Column("typical_budget_max", sa.Integer(), nullable=True),
+        sa.Column("planning_style", sa.String(50), nullable=True),
+        sa.Column("total_conversations", sa.Integer(), nullable=True),
+        sa.Column("successful_recommendations", sa.Integer(), nullable=True),
+        sa.Column("last_active", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_users_instagram_id", "users", ["instagram_id"], unique=True)
+    op.create_index("ix_users_whatsapp_id", "users", ["whatsapp_id"], unique=True)
+
+    op.create_table(
+        "gift_sessions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=True),
+        sa.Column("platform", sa.String(20), nullable=False),
+        sa.Column("recipient_name", sa.String(100), nullable=True),
+        sa.Column("relationship_type", sa.String(50), nullable=True),
+        sa.Column("occasion", sa.String(100), nullable=True),
+        sa.Column("budget_min", sa.Integer(), nullable=True),
+        sa.Column("budget_max", sa.Integer(), nullable=True),
+        sa.Column("primary_emotion", sa.String(50), nullable=True),
+        sa.Column("relationship_goal", sa.String(100), nullable=True),
+        sa.Column("conversation_context", sa.JSON(), nullable=True),
+        sa.Column("extracted_insights", sa.JSON(), nullable=True),
+        sa.Column("user_constraints", sa.JSON(), nullable=True),
+        sa.Column("recommendations_given", sa.JSON(), nullable=True),
+        sa.Column("user_feedback", sa.JSON(), nullable=True),
+        sa.Column("final_choice", sa.String(500), nullable=True),
+        sa.Column("satisfaction_score", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_gift_sessions_user_id", "gift_sessions", ["user_id"])
+
+
+def downgrade():
+    op.drop_index("ix_gift_sessions_user_id", table_name="gift_sessions")
+    op.drop_table("gift_sessions")
+    op.drop_index("ix_users_whatsapp_id", table_name="users")
+    op.drop_index("ix_users_instagram_id", table_name="users")
+    op.drop_table("users")
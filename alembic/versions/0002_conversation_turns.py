@@ -0,0 +1,102 @@
+"""Move conversation turns out of gift_sessions.conversation_context
+
+Creates the append-only conversation_turns table, adds
+gift_sessions.turn_count, backfills both from the JSON "turns" arrays and
+then removes those arrays from conversation_context.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-02-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "conversation_turns",
+        sa.Column(
+            "session_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("gift_sessions.id", ondelete="CASCADE"),
+            primary_key=True
+        ),
+        sa.Column("seq", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_message", sa.Text(), nullable=False),
+        sa.Column("bot_response", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.add_column(
+        "gift_sessions",
+        sa.Column("turn_count", sa.Integer(), nullable=False, server_default="0")
+    )
+
+    # Backfill one row per element of conversation_context->'turns', in order.
+    # The stored per-turn timestamps were never valid, so use the session's.
+    op.execute("""
+        INSERT INTO conversation_turns (session_id, seq, user_message, bot_response, created_at)
+        SELECT
+            s.id,
+            t.seq,
+            COALESCE(t.turn ->> 'user_message', ''),
+            COALESCE(t.turn ->> 'bot_response', ''),
+            COALESCE(s.updated_at, s.created_at, now())
+        FROM gift_sessions s
+        CROSS JOIN LATERAL jsonb_array_elements(s.conversation_context::jsonb -> 'turns')
+            WITH ORDINALITY AS t(turn, seq)
+        WHERE jsonb_typeof(s.conversation_context::jsonb -> 'turns') = 'array'
+    """)
+
+    op.execute("""
+        UPDATE gift_sessions s
+        SET turn_count = c.turns
+        FROM (
+            SELECT session_id, count(*) AS turns
+            FROM conversation_turns
+            GROUP BY session_id
+        ) c
+        WHERE c.session_id = s.id
+    """)
+
+    op.execute("""
+        UPDATE gift_sessions
+        SET conversation_context = (conversation_context::jsonb - 'turns')::json
+        WHERE conversation_context::jsonb ? 'turns'
+    """)
+
+
+def downgrade():
+    # Fold the rows back into the JSON arrays before dropping the table
+    op.execute("""
+        UPDATE gift_sessions s
+        SET conversation_context = (
+            COALESCE(s.conversation_context::jsonb, '{}'::jsonb)
+            || jsonb_build_object('turns', t.turns)
+        )::json
+        FROM (
+            SELECT
+                session_id,
+                jsonb_agg(
+                    jsonb_build_object(
+                        'timestamp', created_at,
+                        'user_message', user_message,
+                        'bot_response', bot_response
+                    )
+                    ORDER BY seq
+                ) AS turns
+            FROM conversation_turns
+            GROUP BY session_id
+        ) t
+        WHERE t.session_id = s.id
+    """)
+
+    op.drop_column("gift_sessions", "turn_count")
+    op.drop_table("conversation_turns")
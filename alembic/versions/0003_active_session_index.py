@@ -0,0 +1,43 @@
+"""Partial index for the active-session lookup
+
+Each incoming message looks up the user's newest session with
+status = 'active'. The index holds only active sessions, ordered by
+(user_id, created_at DESC), so it stays small as finished sessions pile up
+and the lookup reads a single entry. It is built CONCURRENTLY so writes to
+gift_sessions are not blocked during the upgrade.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-03-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_gift_sessions_user_active",
+            "gift_sessions",
+            ["user_id", sa.text("created_at DESC")],
+            postgresql_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_gift_sessions_user_active",
+            table_name="gift_sessions",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,82 @@
+"""Store JSON document columns as JSONB and index the queried ones
+
+Converts the JSON columns of users and gift_sessions to JSONB, so they can
+be indexed and updated in place with jsonb_set and ||. Then it adds GIN
+(jsonb_path_ops) indexes for containment queries on
+gift_sessions.extracted_insights, gift_sessions.user_constraints and
+users.values, e.g. extracted_insights @> '{"occasion": "anniversary"}'.
+
+The type change rewrites both tables under an ACCESS EXCLUSIVE lock, so
+run it in a maintenance window. The indexes are then built CONCURRENTLY.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-03-15 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+DOCUMENT_COLUMNS = {
+    "users": ["preferences", "personality_traits", "values"],
+    "gift_sessions": [
+        "conversation_context",
+        "extracted_insights",
+        "user_constraints",
+        "recommendations_given",
+        "user_feedback",
+    ],
+}
+
+GIN_INDEXES = [
+    ("ix_gift_sessions_extracted_insights", "gift_sessions", "extracted_insights"),
+    ("ix_gift_sessions_user_constraints", "gift_sessions", "user_constraints"),
+    ("ix_users_values", "users", "values"),
+]
+
+
+def upgrade():
+    for table, columns in DOCUMENT_COLUMNS.items():
+        for column in columns:
+            op.alter_column(
+                table,
+                column,
+                type_=postgresql.JSONB(),
+                existing_type=sa.JSON(),
+                postgresql_using=f'"{column}"::jsonb'
+            )
+
+    with op.get_context().autocommit_block():
+        for name, table, column in GIN_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "jsonb_path_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in GIN_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+    for table, columns in DOCUMENT_COLUMNS.items():
+        for column in columns:
+            op.alter_column(
+                table,
+                column,
+                type_=sa.JSON(),
+                existing_type=postgresql.JSONB(),
+                postgresql_using=f'"{column}"::json'
+            )
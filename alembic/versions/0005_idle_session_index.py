@@ -0,0 +1,44 @@
+"""Partial expression index for the idle session sweep
+
+The session sweeper abandons active sessions whose last activity,
+coalesce(updated_at, created_at), is older than the idle timeout. The
+index is on that exact expression and holds only active sessions, so the
+sweep reads the idle rows from the start of the index instead of scanning
+every active session. It is built CONCURRENTLY so writes to gift_sessions
+are not blocked during the upgrade.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-06-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_gift_sessions_active_last_activity",
+            "gift_sessions",
+            [sa.text("coalesce(updated_at, created_at)")],
+            postgresql_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_gift_sessions_active_last_activity",
+            table_name="gift_sessions",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
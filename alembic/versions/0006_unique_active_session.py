@@ -0,0 +1,64 @@
+"""Allow at most one active session per user
+
+The ingest statement opens a session for a user who has no active one.
+Without a constraint, two first messages arriving together could each
+open one. A partial unique index on gift_sessions(user_id) WHERE
+status = 'active' lets the second insert do nothing (ON CONFLICT DO
+NOTHING) and pick up the first one's session instead.
+
+Existing duplicates are resolved first: all but the newest active
+session of each user are marked abandoned. The index is then built
+CONCURRENTLY so writes to gift_sessions are not blocked. If a duplicate
+appears between the two steps, the build fails and leaves an invalid
+index; drop it and run the upgrade again.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-06-15 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        UPDATE gift_sessions SET status = 'abandoned', completed_at = now()
+        WHERE status = 'active' AND id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY created_at DESC) AS position
+                FROM gift_sessions
+                WHERE status = 'active'
+            ) ranked
+            WHERE position > 1
+        )
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_gift_sessions_user_active",
+            "gift_sessions",
+            ["user_id"],
+            unique=True,
+            postgresql_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "uq_gift_sessions_user_active",
+            table_name="gift_sessions",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,301 @@
+"""Stream gift_sessions and users to partitioned Parquet for offline analysis
+
+Rows are read in primary-key order through a server-side cursor, batch_size
+rows at a time, on a dedicated connection outside the app's pool (pass a
+read replica with --database-url or ANALYTICS_DATABASE_URL). JSON columns
+are flattened into typed columns. Every batch is written as its own Parquet
+file in Hive-style created_month=YYYY-MM partitions, and a checkpoint is
+saved after each batch. Memory stays flat, and an interrupted export resumes
+where it stopped:
+
+    python -m app.analytics.export --output exports/2024-06-01
+    python -m app.analytics.export --output exports/2024-06-01 --tables gift_sessions --batch-size 5000
+
+Names and emails are not exported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import get_settings
+from app.database import async_database_url
+from app.models import GiftSession, User
+
+logger = structlog.get_logger()
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+
+def _json_dumps(value: Any) -> Optional[str]:
+    return json.dumps(value, sort_keys=True, default=str) if value not in (None, {}, []) else None
+
+
+def _str_list(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    return [str(item) for item in value if item is not None]
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _session_row(row) -> Dict[str, Any]:
+    insights = row["extracted_insights"] or {}
+    recommendations = [rec for rec in (row["recommendations_given"] or []) if isinstance(rec, dict)]
+    constraints = row["user_constraints"] or {}
+    context = row["conversation_context"] or {}
+    return {
+        "id": str(row["id"]),
+        "user_id": str(row["user_id"]),
+        "status": row["status"],
+        "platform": row["platform"],
+        "relationship_type": row["relationship_type"],
+        "occasion": row["occasion"],
+        "budget_min": row["budget_min"],
+        "budget_max": row["budget_max"],
+        "primary_emotion": row["primary_emotion"],
+        "relationship_goal": row["relationship_goal"],
+        "turn_count": row["turn_count"],
+        "satisfaction_score": row["satisfaction_score"],
+        "final_choice": row["final_choice"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "completed_at": row["completed_at"],
+        "insight_recipient_type": insights.get("recipient_type"),
+        "insight_occasion": insights.get("occasion"),
+        "insight_interests": _str_list(insights.get("interests")),
+        "insight_budget_hints": insights.get("budget_hints"),
+        "insight_emotional_context": insights.get("emotional_context"),
+        "recommendation_count": len(recommendations),
+        "recommended_names": [str(rec.get("name", "")) for rec in recommendations],
+        "recommended_product_ids": [str(rec["product_id"]) for rec in recommendations if rec.get("product_id")],
+        "recommended_prices": [_number(rec.get("estimated_price")) for rec in recommendations],
+        "constraint_international_shipping": constraints.get("international_shipping"),
+        "constraint_max_delivery_days": constraints.get("max_delivery_days"),
+        "has_summary": bool(context.get("summary")),
+        "user_feedback_json": _json_dumps(row["user_feedback"]),
+    }
+
+
+def _user_row(row) -> Dict[str, Any]:
+    values = row["values"] or {}
+    return {
+        "id": str(row["id"]),
+        "instagram_id": row["instagram_id"],
+        "whatsapp_id": row["whatsapp_id"],
+        "typical_budget_min": row["typical_budget_min"],
+        "typical_budget_max": row["typical_budget_max"],
+        "planning_style": row["planning_style"],
+        "total_conversations": row["total_conversations"],
+        "successful_recommendations": row["successful_recommendations"],
+        "last_active": row["last_active"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "values_sustainability": values.get("sustainability"),
+        "values_local_business": values.get("local_business"),
+        "preferences_json": _json_dumps(row["preferences"]),
+        "personality_traits_json": _json_dumps(row["personality_traits"]),
+    }
+
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+SESSION_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("user_id", pa.string()),
+    ("status", pa.string()),
+    ("platform", pa.string()),
+    ("relationship_type", pa.string()),
+    ("occasion", pa.string()),
+    ("budget_min", pa.int32()),
+    ("budget_max", pa.int32()),
+    ("primary_emotion", pa.string()),
+    ("relationship_goal", pa.string()),
+    ("turn_count", pa.int32()),
+    ("satisfaction_score", pa.int8()),
+    ("final_choice", pa.string()),
+    ("created_at", TIMESTAMP),
+    ("updated_at", TIMESTAMP),
+    ("completed_at", TIMESTAMP),
+    ("insight_recipient_type", pa.string()),
+    ("insight_occasion", pa.string()),
+    ("insight_interests", pa.list_(pa.string())),
+    ("insight_budget_hints", pa.string()),
+    ("insight_emotional_context", pa.string()),
+    ("recommendation_count", pa.int16()),
+    ("recommended_names", pa.list_(pa.string())),
+    ("recommended_product_ids", pa.list_(pa.string())),
+    ("recommended_prices", pa.list_(pa.float64())),
+    ("constraint_international_shipping", pa.bool_()),
+    ("constraint_max_delivery_days", pa.int16()),
+    ("has_summary", pa.bool_()),
+    ("user_feedback_json", pa.string()),
+])
+
+USER_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("instagram_id", pa.string()),
+    ("whatsapp_id", pa.string()),
+    ("typical_budget_min", pa.int32()),
+    ("typical_budget_max", pa.int32()),
+    ("planning_style", pa.string()),
+    ("total_conversations", pa.int32()),
+    ("successful_recommendations", pa.int32()),
+    ("last_active", TIMESTAMP),
+    ("created_at", TIMESTAMP),
+    ("updated_at", TIMESTAMP),
+    ("values_sustainability", pa.bool_()),
+    ("values_local_business", pa.bool_()),
+    ("preferences_json", pa.string()),
+    ("personality_traits_json", pa.string()),
+])
+
+# table name -> (table, row flattener, schema)
+EXPORTS: Dict[str, tuple] = {
+    "gift_sessions": (GiftSession.__table__, _session_row, SESSION_SCHEMA),
+    "users": (User.__table__, _user_row, USER_SCHEMA),
+}
+
+
+def _partition(created_at: Optional[datetime]) -> str:
+    return f"created_month={created_at.strftime('%Y-%m')}" if created_at else "created_month=unknown"
+
+
+class Checkpoint:
+    """Progress per table, rewritten atomically after every batch"""
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.state = json.load(f)
+
+    def table(self, name: str) -> Dict[str, Any]:
+        return self.state.setdefault(name, {"last_id": None, "batches": 0, "rows": 0, "done": False})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def write_batch(output_dir: str, name: str, batch_number: int, rows: List[Dict[str, Any]], schema: pa.Schema):
+    """Write one batch as a Parquet file per month partition it touches
+
+    File names depend only on the batch number, so a batch that is rewritten
+    after a crash replaces its earlier files instead of duplicating them.
+    """
+    by_partition: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        by_partition[_partition(row["created_at"])].append(row)
+
+    for partition, partition_rows in by_partition.items():
+        directory = os.path.join(output_dir, name, partition)
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pylist(partition_rows, schema=schema)
+        pq.write_table(table, os.path.join(directory, f"part-{batch_number:06d}.parquet"), compression="zstd")
+
+
+async def export_table(
+    engine: AsyncEngine,
+    output_dir: str,
+    name: str,
+    checkpoint: Checkpoint,
+    batch_size: int
+) -> int:
+    """Stream one table to Parquet from its checkpoint; returns the rows written in this run"""
+    table, flatten, schema = EXPORTS[name]
+    progress = checkpoint.table(name)
+    if progress["done"]:
+        logger.info("Table already exported", table=name, rows=progress["rows"])
+        return 0
+
+    query = select(table).order_by(table.c.id)
+    if progress["last_id"]:
+        query = query.where(table.c.id > table.c.id.type.python_type(progress["last_id"]))
+
+    written = 0
+    started = time.monotonic()
+
+    async with engine.connect() as conn:
+        # Server-side cursor: only batch_size rows are buffered at a time
+        result = await conn.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions(batch_size):
+            rows = [flatten(row._mapping) for row in partition]
+            write_batch(output_dir, name, progress["batches"], rows, schema)
+
+            progress["batches"] += 1
+            progress["rows"] += len(rows)
+            progress["last_id"] = rows[-1]["id"]
+            checkpoint.save()
+            written += len(rows)
+
+            logger.info(
+                "Export batch written",
+                table=name,
+                batch=progress["batches"],
+                rows=progress["rows"],
+                rows_per_second=round(written / max(time.monotonic() - started, 1e-6))
+            )
+
+    progress["done"] = True
+    checkpoint.save()
+    return written
+
+
+async def export(output_dir: str, tables: List[str], batch_size: int, database_url: Optional[str] = None) -> Dict[str, int]:
+    """Export the tables and return the total rows exported per table"""
+    settings = get_settings()
+    url = async_database_url(database_url or settings.analytics_database_url or settings.database_url)
+
+    # A single unpooled connection, separate from the app's engine
+    engine = create_async_engine(url, poolclass=NullPool)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(output_dir)
+
+    try:
+        for name in tables:
+            await export_table(engine, output_dir, name, checkpoint, batch_size)
+    finally:
+        await engine.dispose()
+
+    return {name: checkpoint.table(name)["rows"] for name in tables}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="export directory; rerun with the same one to resume")
+    parser.add_argument("--tables", nargs="+", choices=list(EXPORTS), default=list(EXPORTS))
+    parser.add_argument("--batch-size", type=int, default=get_settings().analytics_export_batch_size)
+    parser.add_argument("--database-url", help="defaults to ANALYTICS_DATABASE_URL, then DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    totals = asyncio.run(export(args.output, args.tables, args.batch_size, args.database_url))
+    for name, rows in totals.items():
+        print(f"{name}: {rows} rows in {os.path.join(args.output, name)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import redis.asyncio as redis
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+
+# Global Redis client, set up by init_cache()
+redis_client = None
+
+
+async def init_cache():
+    """Initialize Redis connection"""
+    global redis_client
+    
+    settings = get_settings()
+    
+    if not settings.cache_enabled:
+        logger.info("Redis cache disabled")
+        return
+    
+    redis_client = redis.from_url(
+        settings.redis_url,
+        decode_responses=True,
+        socket_timeout=settings.cache_socket_timeout,
+        socket_connect_timeout=settings.cache_socket_timeout
+    )
+    
+    logger.info("Redis cache initialized", redis_url=settings.redis_url.split("@")[-1])
+
+
+async def close_cache():
+    """Close Redis connection"""
+    global redis_client
+    
+    if redis_client is not None:
+        await redis_client.close()
+        redis_client = None
+        logger.info("Redis cache closed")
+
+
+def get_redis():
+    """Get the Redis client, or None when caching is disabled"""
+    return redis_client
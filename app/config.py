@@ -1,5 +1,27 @@
+from pydantic import BaseModel, field_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List, Optional
+
+
+class ModelRoute(BaseModel):
+    """One tier of an AI operation's model routing"""
+    
+    model: str
+    max_tokens: int
+    timeout: float  # seconds, covering the whole call including client retries
+
+
+DEFAULT_AI_ROUTES = {
+    "extract_context": [
+        ModelRoute(model="gpt-3.5-turbo", max_tokens=500, timeout=8.0),
+        ModelRoute(model="gpt-4-turbo", max_tokens=500, timeout=15.0),
+    ],
+    "generate_recommendations": [
+        ModelRoute(model="gpt-4-turbo", max_tokens=1000, timeout=30.0),
+        ModelRoute(model="gpt-3.5-turbo", max_tokens=1000, timeout=20.0),
+    ],
+}
 
 
 class Settings(BaseSettings):
@@ -8,22 +30,180 @@ class Settings(BaseSettings):
     # Database
     database_url: str = "postgresql://localhost/present_agent"
     redis_url: str = "redis://localhost:6379"
+    # Analytics exports read from this (e.g. a replica) instead of database_url
+    analytics_database_url: Optional[str] = None
+    analytics_export_batch_size: int = 10000
+    
+    # Cache
+    cache_enabled: bool = True
+    cache_key_prefix: str = "present_agent"
+    cache_user_ttl: int = 3600
+    cache_session_ttl: int = 1800
+    cache_socket_timeout: float = 0.5
     
     # OpenAI
     openai_api_key: str = ""
+    openai_max_retries: int = 1
+    
+    # Model routing per AIService operation, tried in order on timeout or error.
+    # Override with a JSON object in AI_ROUTES; unlisted operations keep the defaults.
+    ai_routes: Dict[str, List[ModelRoute]] = DEFAULT_AI_ROUTES
+    
+    # AI call resilience: overall deadline per operation (seconds, across all tiers),
+    # optional hedging of slow calls after the p95 latency, and a circuit breaker
+    ai_deadlines: Dict[str, float] = {"extract_context": 12.0, "generate_recommendations": 40.0}
+    ai_hedging_enabled: bool = False
+    ai_hedge_quantile: float = 0.95
+    ai_hedge_min_delay: float = 1.0
+    ai_breaker_window: int = 20
+    ai_breaker_min_calls: int = 10
+    ai_breaker_error_threshold: float = 0.5
+    ai_breaker_cooldown: float = 30.0
+    
+    # Stream recommendation completions (JSON mode) so the first idea can be
+    # sent while the rest are still being generated
+    ai_stream_recommendations: bool = True
+    
+    # LLM response cache (TTLs in seconds per AIService operation)
+    llm_cache_enabled: bool = True
+    llm_cache_use_redis: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_extract_ttl: int = 600
+    llm_cache_recommend_ttl: int = 3600
+    
+    # Recommendation cache keyed on the canonical gift context
+    recommendation_cache_enabled: bool = True
+    recommendation_cache_use_redis: bool = True
+    recommendation_cache_ttl: int = 86400
+    recommendation_cache_min_similarity: float = 0.6
+    recommendation_cache_max_buckets: int = 5000
+    
+    # Context-gathering turns the local extractor fully explains (share of
+    # content words matched) skip the model's context extraction
+    local_nlu_enabled: bool = True
+    local_nlu_min_coverage: float = 0.8
+    
+    # Text embeddings: "openai", or "local" for the deterministic hashing model
+    # (also used when no OpenAI key is configured). Concurrent requests are
+    # micro-batched, and vectors are cached in memory and in a SQLite file
+    # (empty path disables the file).
+    embedding_provider: str = "openai"
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int = 256
+    embedding_batch_size: int = 64
+    embedding_batch_window_ms: int = 10
+    embedding_timeout: float = 10.0
+    embedding_cache_path: str = ".embeddings/cache.sqlite"
+    embedding_cache_max_entries: int = 10000
+    
+    # Product catalog used for recommendation candidates; embeddings are
+    # computed once and kept in catalog_index_dir
+    catalog_enabled: bool = True
+    catalog_path: str = "app/data/catalog.json"
+    catalog_index_dir: str = ".catalog_index"
+    catalog_candidates: int = 8
+    # Backoff before retrying a catalog whose embeddings could not be computed
+    catalog_retry_base: float = 30.0
+    catalog_retry_max: float = 600.0
     
     # Instagram
     instagram_verify_token: str = ""
     instagram_access_token: str = ""
     
+    # Instagram Graph API client
+    graph_api_url: str = "https://graph.facebook.com/v18.0"
+    graph_api_http2: bool = True
+    graph_api_max_connections: int = 20
+    graph_api_max_keepalive_connections: int = 10
+    graph_api_keepalive_expiry: float = 30.0
+    graph_api_timeout: float = 10.0
+    
+    # Outbound message delivery
+    outbox_workers: int = 4
+    outbox_queue_size: int = 1000
+    outbox_max_attempts: int = 4
+    outbox_backoff_base: float = 0.5
+    outbox_backoff_max: float = 8.0
+
+    # Send API rate limit for the page access token. The rate is scaled down
+    # once the usage headers pass outbox_throttle_usage percent, and sending
+    # pauses after a rate-limit response
+    outbox_rate_limit: float = 100.0
+    outbox_rate_burst: int = 20
+    outbox_throttle_usage: float = 75.0
+    outbox_min_rate_fraction: float = 0.1
+    outbox_max_throttled: int = 8
+    outbox_throttle_backoff_max: float = 60.0
+    
+    # Webhook processing
+    webhook_workers: int = 8
+    webhook_queue_size: int = 1000
+    webhook_drain_timeout: float = 10.0
+    
+    # Redelivered messages are dropped by message ID (TTL in seconds)
+    dedup_enabled: bool = True
+    dedup_use_redis: bool = True
+    dedup_max_entries: int = 10000
+    dedup_ttl: int = 86400
+    
+    # Bursts of text messages from one sender within the window (ms) are merged
+    # into a single turn; 0 disables coalescing
+    webhook_coalesce_window_ms: int = 1500
+    webhook_coalesce_max_wait_ms: int = 5000
+    webhook_coalesce_max_messages: int = 10
+    
+    # Active sessions idle longer than session_idle_timeout (seconds) are
+    # marked abandoned by a background sweep every session_sweep_interval seconds
+    session_sweep_enabled: bool = True
+    session_idle_timeout: int = 172800
+    session_sweep_interval: int = 300
+    session_sweep_batch_size: int = 500
+    
+    # Conversation turns and session/user changes are committed in groups:
+    # writes arriving within the window (ms) share one transaction
+    write_batch_window_ms: int = 5
+    write_batch_max_records: int = 200
+    
     # Application
     debug: bool = True
     secret_key: str = "dev-secret-key-change-in-production"
     app_host: str = "0.0.0.0"
     app_port: int = 8000
     
+    # Conversation
+    conversation_history_turns: int = 5
+    
+    # Prompt assembly (input token budgets per AI call)
+    prompt_budget_extract: int = 1500
+    prompt_budget_recommend: int = 2500
+    prompt_message_max_tokens: int = 300
+    prompt_insights_max_tokens: int = 250
+    prompt_summary_max_tokens: int = 200
+    
     # Logging
     log_level: str = "INFO"
+    log_async: bool = True
+    log_queue_size: int = 10000
+    # Fraction of debug/info events kept, per event name (warnings and errors are always kept)
+    log_sample_rates: Dict[str, float] = {
+        "Request completed": 0.1,
+        "Instagram webhook received": 0.1,
+    }
+    log_max_value_chars: int = 512
+    log_max_items: int = 20
+    log_redact_keys: List[str] = [
+        "access_token", "authorization", "app_secret", "secret_key",
+        "instagram_access_token", "instagram_app_secret", "openai_api_key",
+    ]
+    
+    # Metrics
+    metrics_enabled: bool = True
+    
+    @field_validator("ai_routes")
+    @classmethod
+    def merge_default_routes(cls, routes: Dict[str, List[ModelRoute]]) -> Dict[str, List[ModelRoute]]:
+        """Keep default routes for operations the override doesn't mention"""
+        return {**DEFAULT_AI_ROUTES, **routes}
     
     class Config:
         env_file = ".env"
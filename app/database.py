@@ -17,6 +17,15 @@ engine = None
 async_session = None
 
 
+def async_database_url(url: str) -> str:
+    """Use the asyncpg driver for plain PostgreSQL URLs"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    return url
+
+
 async def init_db():
     """Initialize database connection"""
     global engine, async_session
@@ -24,11 +33,7 @@ async def init_db():
     settings = get_settings()
     
     # Convert PostgreSQL URL to async version
-    db_url = settings.database_url
-    if db_url.startswith("postgresql://"):
-        db_url = db_url.replace("postgresql://", "postgresql+asyncpg://", 1)
-    elif db_url.startswith("postgres://"):
-        db_url = db_url.replace("postgres://", "postgresql+asyncpg://", 1)
+    db_url = async_database_url(settings.database_url)
     
     # Create async engine
     engine = create_async_engine(
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Optional, Tuple
+
+import httpx
+import structlog
+
+from app.config import Settings, get_settings
+from app.utils.metrics import (
+    GRAPH_API_USAGE,
+    OUTBOUND_DELIVERY_SECONDS,
+    OUTBOUND_MESSAGES,
+    OUTBOUND_WAIT_SECONDS,
+    track_stage,
+)
+from app.utils.rate_limiter import TokenBucket
+from app.utils.worker_pool import KeyedWorkerPool
+
+logger = structlog.get_logger()
+
+
+class GraphAPIClient:
+    """Long-lived, pooled HTTP client for the Instagram Graph API
+
+    A single instance is created per process in the app lifespan so every
+    outbound message reuses warm keep-alive (and HTTP/2) connections instead of
+    paying for a fresh TCP and TLS handshake.
+    """
+
+    def __init__(self, settings: Settings, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.settings = settings
+        self._client = httpx.AsyncClient(
+            base_url=settings.graph_api_url,
+            http2=settings.graph_api_http2,
+            limits=httpx.Limits(
+                max_connections=settings.graph_api_max_connections,
+                max_keepalive_connections=settings.graph_api_max_keepalive_connections,
+                keepalive_expiry=settings.graph_api_keepalive_expiry
+            ),
+            timeout=settings.graph_api_timeout,
+            headers={"Content-Type": "application/json"},
+            transport=transport
+        )
+
+    async def send_message(self, recipient_id: str, message: str) -> httpx.Response:
+        """Send a text message to a recipient"""
+        payload = {
+            "recipient": {"id": recipient_id},
+            "message": {"text": message}
+        }
+        headers = {"Authorization": f"Bearer {self.settings.instagram_access_token}"}
+        return await self._client.post("/me/messages", json=payload, headers=headers)
+
+    async def close(self):
+        """Close pooled connections"""
+        await self._client.aclose()
+
+
+# Graph API error codes meaning the app, page or user is being rate limited;
+# these can arrive with a 400 or 403 status rather than 429
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}
+
+USAGE_HEADERS = ("x-app-usage", "x-page-usage", "x-business-use-case-usage")
+
+
+def parse_usage(headers: httpx.Headers) -> Tuple[Optional[float], float]:
+    """Highest usage percentage and longest wait in seconds from the usage headers
+
+    X-App-Usage and X-Page-Usage hold one object of percentages;
+    X-Business-Use-Case-Usage maps business IDs to lists of them, which may
+    include estimated_time_to_regain_access in minutes. The usage is None
+    when the response carries no usage headers.
+    """
+    usage: Optional[float] = None
+    regain = 0.0
+    for name in USAGE_HEADERS:
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+
+        if name == "x-business-use-case-usage" and isinstance(data, dict):
+            entries = [entry for value in data.values() if isinstance(value, list) for entry in value]
+        else:
+            entries = [data]
+
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            for key in ("call_count", "total_cputime", "total_time"):
+                try:
+                    usage = max(usage or 0.0, float(entry.get(key) or 0))
+                except (TypeError, ValueError):
+                    continue
+            try:
+                regain = max(regain, float(entry.get("estimated_time_to_regain_access") or 0) * 60)
+            except (TypeError, ValueError):
+                pass
+    return usage, regain
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """Whether a response is a Graph API rate-limit rejection"""
+    if response.status_code == 429:
+        return True
+    if response.status_code not in (400, 403):
+        return False
+    try:
+        error = response.json().get("error") or {}
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(error, dict) and error.get("code") in RATE_LIMIT_ERROR_CODES
+
+
+class MessagePriority(IntEnum):
+    """Delivery priority; lower values are sent first"""
+    REPLY = 0
+    NOTICE = 1
+
+
+@dataclass
+class OutboundMessage:
+    """A message waiting in the outbox"""
+    recipient_id: str
+    text: str
+    priority: MessagePriority = MessagePriority.REPLY
+    attempts: int = 0
+    throttled: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class SendOutbox:
+    """Queue of outbound messages delivered by background workers
+
+    Sends are keyed on the recipient so replies to the same user stay in order.
+    Transient failures (5xx and transport errors) are retried with exponential
+    backoff inside the outbox, so conversation workers never wait on delivery.
+
+    Every send takes a token from a bucket sized to the Send API limit for
+    the page access token. The rate is scaled down as the usage headers
+    approach 100%, and a rate-limit response pauses all sending for a
+    jittered backoff (or Retry-After) before the message is retried. Queued
+    messages and waiters for the bucket are served by priority, so replies
+    go out ahead of canned notices when sending is throttled.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.client: Optional[GraphAPIClient] = None
+        self.limiter = TokenBucket(settings.outbox_rate_limit, settings.outbox_rate_burst)
+        self._pool = KeyedWorkerPool(
+            name="instagram-outbox",
+            handler=self._deliver,
+            workers=settings.outbox_workers,
+            queue_size=settings.outbox_queue_size
+        )
+
+        # Stats
+        self.sent = 0
+        self.retried = 0
+        self.throttled = 0
+        self.dropped = 0
+
+    async def start(self, client: GraphAPIClient):
+        """Attach the shared client and start delivering"""
+        self.client = client
+        await self._pool.start()
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Flush pending messages and stop the workers"""
+        await self._pool.stop(drain_timeout=drain_timeout)
+
+    def enqueue(self, recipient_id: str, message: str, priority: MessagePriority = MessagePriority.REPLY) -> bool:
+        """Queue a message for delivery, returning False if it could not be queued"""
+        priority = MessagePriority(priority)
+        try:
+            self._pool.submit(recipient_id, OutboundMessage(recipient_id, message, priority), priority=priority)
+            return True
+        except (asyncio.QueueFull, RuntimeError) as e:
+            self.dropped += 1
+            logger.error("Outbox unavailable, message dropped", recipient_id=recipient_id, exc_info=e)
+            return False
+
+    def stats(self) -> dict:
+        """Delivery counters, rate limiter and queue stats"""
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "limiter": self.limiter.stats(),
+            **self._pool.stats()
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        ceiling = min(self.settings.outbox_backoff_max, self.settings.outbox_backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _throttle_delay(self, response: httpx.Response, throttled: int, regain: float) -> float:
+        """How long to pause sending after a rate-limit response
+
+        Exponential backoff with equal jitter, so the pause is never close to
+        zero, extended to Retry-After or the estimated time to regain access
+        when the response gives one.
+        """
+        ceiling = min(self.settings.outbox_throttle_backoff_max, self.settings.outbox_backoff_base * (2 ** throttled))
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        try:
+            retry_after = float(response.headers.get("retry-after", 0))
+        except ValueError:
+            retry_after = 0.0
+        return max(delay, retry_after, regain)
+
+    def _observe_usage(self, response: httpx.Response) -> float:
+        """Adjust the send rate to the reported usage, returning any wait the API asked for"""
+        usage, regain = parse_usage(response.headers)
+        if usage is not None:
+            GRAPH_API_USAGE.set(usage)
+            rate = self.settings.outbox_rate_limit
+            start = self.settings.outbox_throttle_usage
+            if usage > start:
+                # Scale linearly from the full rate at the threshold to the floor at 100%
+                fraction = max(self.settings.outbox_min_rate_fraction, (100 - usage) / max(100 - start, 1e-6))
+                rate *= fraction
+            if rate != self.limiter.rate:
+                logger.info("Adjusting Instagram send rate", usage=usage, rate=round(rate, 2))
+                self.limiter.set_rate(rate)
+        if regain:
+            self.limiter.pause(regain)
+        return regain
+
+    async def _deliver(self, outbound: OutboundMessage):
+        """Send a single message, retrying transient failures and rate limits"""
+        max_attempts = self.settings.outbox_max_attempts
+        priority = outbound.priority.name.lower()
+
+        while True:
+            await self.limiter.acquire(outbound.priority)
+            if outbound.attempts == 0:
+                OUTBOUND_WAIT_SECONDS.labels(priority).observe(time.monotonic() - outbound.enqueued_at)
+            outbound.attempts += 1
+
+            try:
+                with track_stage("send_instagram_message"):
+                    response = await self.client.send_message(outbound.recipient_id, outbound.text)
+            except httpx.TransportError as e:
+                logger.warning("Transport error sending Instagram message", recipient_id=outbound.recipient_id, attempt=outbound.attempts, exc_info=e)
+            else:
+                regain = self._observe_usage(response)
+
+                if response.status_code == 200:
+                    self.sent += 1
+                    OUTBOUND_MESSAGES.labels("sent").inc()
+                    OUTBOUND_DELIVERY_SECONDS.labels(priority).observe(time.monotonic() - outbound.enqueued_at)
+                    logger.info(
+                        "Message sent successfully",
+                        recipient_id=outbound.recipient_id,
+                        attempts=outbound.attempts,
+                        message_preview=outbound.text[:50] + "..." if len(outbound.text) > 50 else outbound.text
+                    )
+                    return
+
+                if is_rate_limited(response):
+                    if outbound.throttled >= self.settings.outbox_max_throttled:
+                        break
+                    outbound.throttled += 1
+                    self.throttled += 1
+                    OUTBOUND_MESSAGES.labels("throttled").inc()
+                    delay = self._throttle_delay(response, outbound.throttled, regain)
+                    logger.warning(
+                        "Instagram send rate limited, pausing sends",
+                        status_code=response.status_code,
+                        recipient_id=outbound.recipient_id,
+                        pause=round(delay, 3)
+                    )
+                    # The limiter holds back this retry and every other send
+                    self.limiter.pause(delay)
+                    continue
+
+                if response.status_code < 500:
+                    # Client errors will not succeed on retry
+                    self.dropped += 1
+                    OUTBOUND_MESSAGES.labels("dropped").inc()
+                    logger.error(
+                        "Failed to send Instagram message",
+                        status_code=response.status_code,
+                        response=response.text,
+                        recipient_id=outbound.recipient_id
+                    )
+                    return
+
+                logger.warning(
+                    "Transient error sending Instagram message",
+                    status_code=response.status_code,
+                    recipient_id=outbound.recipient_id,
+                    attempt=outbound.attempts
+                )
+
+            failures = outbound.attempts - outbound.throttled
+            if failures >= max_attempts:
+                break
+            self.retried += 1
+            OUTBOUND_MESSAGES.labels("retried").inc()
+            await asyncio.sleep(self._backoff(failures))
+
+        self.dropped += 1
+        OUTBOUND_MESSAGES.labels("dropped").inc()
+        logger.error(
+            "Giving up on Instagram message",
+            recipient_id=outbound.recipient_id,
+            attempts=outbound.attempts,
+            throttled=outbound.throttled
+        )
+
+
+# Process-wide outbox, started with the shared client from the app lifespan
+send_outbox = SendOutbox(get_settings())
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Request, HTTPException, Query, Depends
 from fastapi.responses import PlainTextResponse
+import asyncio
+import functools
 import structlog
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from app.config import get_settings, Settings
+from app.integrations.graph_api import MessagePriority, send_outbox
 from app.services.conversation_handler import ConversationHandler
+from app.services.message_dedup import MessageDeduplicator
+from app.services.session_sweeper import session_sweeper
+from app.services.write_behind import write_buffer
+from app.utils.coalescer import MessageCoalescer
+from app.utils.metrics import track_stage
+from app.utils.worker_pool import KeyedWorkerPool
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -12,6 +21,9 @@ router = APIRouter()
 # Initialize conversation handler
 conversation_handler = ConversationHandler()
 
+# Drops webhook redeliveries before they reach the workers
+message_dedup = MessageDeduplicator()
+
 
 @router.get("/instagram")
 async def verify_webhook(
@@ -38,25 +50,101 @@ async def verify_webhook(
 
 @router.post("/instagram")
 async def handle_instagram_webhook(request: Request):
-    """Handle incoming Instagram messages"""
+    """Handle incoming Instagram messages
+    
+    Events are validated and queued for the background workers so that Meta
+    gets its acknowledgement immediately instead of waiting on the DB and LLM.
+    """
     
+    # Parse request body
     try:
-        # Parse request body
         body = await request.json()
-        
-        logger.info("Instagram webhook received", data=body)
-        
-        # Process each entry
+    except ValueError:
+        logger.warning("Instagram webhook with invalid JSON body")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    
+    if not isinstance(body, dict) or not isinstance(body.get("entry", []), list):
+        logger.warning("Instagram webhook with unexpected payload shape")
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    # Queue each messaging event, keyed on the sender to keep their order.
+    # Text messages wait briefly in the coalescer so a burst becomes one turn.
+    queued = 0
+    duplicates = 0
+    mid = None
+    try:
         for entry in body.get("entry", []):
-            # Process messaging events
             for messaging_event in entry.get("messaging", []):
-                await process_messaging_event(messaging_event)
-        
-        return {"status": "ok"}
+                mid = (messaging_event.get("message") or {}).get("mid")
+                if not await message_dedup.claim(mid):
+                    duplicates += 1
+                    continue
+                
+                sender_id = messaging_event.get("sender", {}).get("id") or ""
+                if message_coalescer.window > 0 and is_text_message(messaging_event):
+                    message_coalescer.add(sender_id, messaging_event)
+                else:
+                    # Anything pending for the sender goes first
+                    message_coalescer.flush(sender_id)
+                    event_dispatcher.submit(sender_id, messaging_event)
+                queued += 1
+    except (asyncio.QueueFull, RuntimeError) as e:
+        # The redelivery of the rejected event must not count as a duplicate
+        await message_dedup.release(mid)
+        # Let Meta redeliver later rather than silently dropping the events
+        logger.error("Instagram webhook rejected, event queue unavailable", queued=queued, exc_info=e)
+        raise HTTPException(status_code=503, detail="Event queue unavailable")
     
-    except Exception as e:
-        logger.error("Error processing Instagram webhook", exc_info=e)
-        raise HTTPException(status_code=500, detail="Webhook processing failed")
+    # Counts only; message contents are logged (truncated) per event by the workers
+    logger.info("Instagram webhook received", object=body.get("object"), entries=len(body.get("entry", [])), queued=queued, duplicates=duplicates)
+    
+    return {"status": "ok", "queued": queued, "duplicates": duplicates}
+
+
+@router.get("/instagram/stats")
+async def webhook_stats():
+    """Event queue and outbox depth, lag and delivery counters, plus AI call stats"""
+    return {
+        "events": event_dispatcher.stats(),
+        "coalescer": message_coalescer.stats(),
+        "dedup": message_dedup.stats(),
+        "sweeper": session_sweeper.stats(),
+        "writes": write_buffer.stats(),
+        "context_cache": conversation_handler.context_cache.stats(),
+        "outbox": send_outbox.stats(),
+        "ai": conversation_handler.ai_service.stats(),
+        "llm_cache": conversation_handler.ai_service.response_cache.stats(),
+        "recommendation_cache": conversation_handler.recommendation_cache.stats(),
+        "embeddings": conversation_handler.ai_service.embeddings.stats()
+    }
+
+
+def is_text_message(event: Dict[str, Any]) -> bool:
+    """Whether the event is a plain text message that can be merged with its neighbours"""
+    message_data = event.get("message") or {}
+    return bool(event.get("sender", {}).get("id") and message_data.get("text", "").strip())
+
+
+def merge_messaging_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold a burst of text events from one sender into a single event
+    
+    The texts are joined in arrival order, one per line; everything else
+    comes from the latest event. The original message IDs are kept in
+    message.coalesced_mids.
+    """
+    
+    if len(events) == 1:
+        return events[0]
+    
+    latest = events[-1]
+    return {
+        **latest,
+        "message": {
+            **latest["message"],
+            "text": "\n".join(event["message"]["text"].strip() for event in events),
+            "coalesced_mids": [event["message"].get("mid") for event in events],
+        },
+    }
 
 
 async def process_messaging_event(event: Dict[str, Any]):
@@ -68,7 +156,7 @@ async def process_messaging_event(event: Dict[str, Any]):
         message_data = event.get("message", {})
         
         if not sender_id or not message_data:
-            logger.warning("Invalid messaging event", event=event)
+            logger.warning("Invalid messaging event", messaging_event=event)
             return
         
         # Extract message text
@@ -78,7 +166,8 @@ async def process_messaging_event(event: Dict[str, Any]):
             logger.info("Non-text message received", sender_id=sender_id, message_data=message_data)
             await send_instagram_message(
                 sender_id, 
-                "Hi! I can help you find the perfect gift. Just send me a text message describing what you're looking for! 🎁"
+                "Hi! I can help you find the perfect gift. Just send me a text message describing what you're looking for! 🎁",
+                priority=MessagePriority.NOTICE
             )
             return
         
@@ -89,29 +178,38 @@ async def process_messaging_event(event: Dict[str, Any]):
         )
         
         # Process message through conversation handler
-        response = await conversation_handler.process_message(
-            user_id=sender_id,
-            message=message_text,
-            platform="instagram"
-        )
+        with track_stage("process_message"):
+            response = await conversation_handler.process_message(
+                user_id=sender_id,
+                message=message_text,
+                platform="instagram",
+                send_early=functools.partial(send_instagram_message, sender_id)
+            )
         
         # Send response back to Instagram
         await send_instagram_message(sender_id, response)
         
     except Exception as e:
-        logger.error("Error processing messaging event", exc_info=e, event=event)
+        logger.error("Error processing messaging event", exc_info=e, messaging_event=event)
         # Send error message to user
         if sender_id:
             await send_instagram_message(
                 sender_id, 
-                "Sorry, I'm having technical difficulties. Please try again in a moment! 🤖"
+                "Sorry, I'm having technical difficulties. Please try again in a moment! 🤖",
+                priority=MessagePriority.NOTICE
             )
 
 
-async def send_instagram_message(recipient_id: str, message: str):
-    """Send a message via Instagram API"""
-    
-    import httpx
+async def send_instagram_message(
+    recipient_id: str,
+    message: str,
+    priority: MessagePriority = MessagePriority.REPLY
+):
+    """Queue a message for delivery via the Instagram API
+
+    Replies and recommendations use the default priority; canned notices
+    pass MessagePriority.NOTICE so they wait behind them when throttled.
+    """
     
     settings = get_settings()
     
@@ -119,35 +217,24 @@ async def send_instagram_message(recipient_id: str, message: str):
         logger.error("Instagram access token not configured")
         return
     
-    url = f"https://graph.facebook.com/v18.0/me/messages"
-    
-    payload = {
-        "recipient": {"id": recipient_id},
-        "message": {"text": message}
-    }
-    
-    headers = {
-        "Authorization": f"Bearer {settings.instagram_access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
-            
-            if response.status_code == 200:
-                logger.info(
-                    "Message sent successfully",
-                    recipient_id=recipient_id,
-                    message_preview=message[:50] + "..." if len(message) > 50 else message
-                )
-            else:
-                logger.error(
-                    "Failed to send Instagram message",
-                    status_code=response.status_code,
-                    response=response.text,
-                    recipient_id=recipient_id
-                )
-    
-    except Exception as e:
-        logger.error("Error sending Instagram message", exc_info=e, recipient_id=recipient_id)
\ No newline at end of file
+    send_outbox.enqueue(recipient_id, message, priority=priority)
+
+
+# Background workers draining webhook events, started from the app lifespan
+event_dispatcher = KeyedWorkerPool(
+    name="instagram-events",
+    handler=process_messaging_event,
+    workers=get_settings().webhook_workers,
+    queue_size=get_settings().webhook_queue_size
+)
+
+# Debounces text bursts per sender in front of the event workers, started from the app lifespan
+message_coalescer = MessageCoalescer(
+    name="instagram-messages",
+    sink=event_dispatcher.submit,
+    merge=merge_messaging_events,
+    window=get_settings().webhook_coalesce_window_ms / 1000,
+    max_wait=get_settings().webhook_coalesce_max_wait_ms / 1000,
+    max_items=get_settings().webhook_coalesce_max_messages,
+    max_keys=get_settings().webhook_queue_size
+)
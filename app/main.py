@@ -1,31 +1,22 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import structlog
 import time
 from contextlib import asynccontextmanager
 
 from app.config import get_settings
 from app.database import init_db
-from app.integrations.instagram import router as instagram_router
-
-# Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    cache_logger_on_first_use=True,
-)
+from app.cache import init_cache, close_cache
+from app.integrations.instagram import router as instagram_router, event_dispatcher, message_coalescer
+from app.integrations.graph_api import GraphAPIClient, send_outbox
+from app.services.session_sweeper import session_sweeper
+from app.services.write_behind import write_buffer
+from app.utils.log_pipeline import configure_logging, shutdown_logging
+from app.utils.metrics import render_metrics
+
+# Configure structured logging (written off the event loop by a background thread)
+configure_logging(get_settings())
 
 logger = structlog.get_logger()
 
@@ -44,10 +35,45 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
     
+    # Initialize Redis cache
+    await init_cache()
+    
+    # Shared Graph API client and outbound message delivery
+    graph_client = GraphAPIClient(settings)
+    await send_outbox.start(graph_client)
+    
+    # Group commit of conversation writes
+    await write_buffer.start()
+    
+    # Start webhook event workers
+    await event_dispatcher.start()
+    await message_coalescer.start()
+    
+    # Abandon idle sessions in the background
+    await session_sweeper.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Present Agent API")
+    
+    await session_sweeper.stop()
+    
+    # Hand pending message bursts to the workers, then finish queued events
+    await message_coalescer.stop()
+    await event_dispatcher.stop(drain_timeout=settings.webhook_drain_timeout)
+    
+    # Commit the writes of the last messages
+    await write_buffer.stop()
+    
+    # Deliver pending replies, then release pooled connections
+    await send_outbox.stop(drain_timeout=settings.webhook_drain_timeout)
+    await graph_client.close()
+    
+    await close_cache()
+    
+    # Flush buffered log records
+    shutdown_logging()
 
 
 # Create FastAPI app
@@ -70,26 +96,20 @@ app.add_middleware(
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all HTTP requests"""
-    start_time = time.time()
-    
-    # Log request
-    logger.info(
-        "Request started",
-        method=request.method,
-        url=str(request.url),
-        client=request.client.host if request.client else None
-    )
+    """Log all HTTP requests, one line each (sampled; server errors always logged)"""
+    start_time = time.perf_counter()
     
     # Process request
     response = await call_next(request)
     
     # Log response
-    process_time = time.time() - start_time
-    logger.info(
+    process_time = time.perf_counter() - start_time
+    log = logger.warning if response.status_code >= 500 else logger.info
+    log(
         "Request completed",
         method=request.method,
-        url=str(request.url),
+        path=request.url.path,
+        client=request.client.host if request.client else None,
         status_code=response.status_code,
         process_time=process_time
     )
@@ -120,6 +140,16 @@ async def health_check():
     return {"status": "healthy", "service": "present-agent"}
 
 
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if not get_settings().metrics_enabled:
+        return Response(status_code=404)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Root endpoint
 @app.get("/")
 async def root():
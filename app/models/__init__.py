@@ -1,4 +1,5 @@
 from .user import User
 from .gift_session import GiftSession
+from .conversation_turn import ConversationTurn
 
-__all__ = ["User", "GiftSession"]
\ No newline at end of file
+__all__ = ["User", "GiftSession", "ConversationTurn"]
\ No newline at end of file
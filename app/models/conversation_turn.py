@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, Integer, Text, ForeignKey, Uuid
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class ConversationTurn(Base):
+    """A single user message and bot reply within a gift session
+    
+    Turns are append-only rows keyed by (session_id, seq), so recording a turn
+    is one INSERT and reading the recent history is a primary-key range scan.
+    """
+    
+    __tablename__ = "conversation_turns"
+    
+    # Composite primary key: session plus 1-based position in the conversation
+    session_id = Column(Uuid(as_uuid=True), ForeignKey("gift_sessions.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    
+    # Turn content
+    user_message = Column(Text, nullable=False)
+    bot_response = Column(Text, nullable=False)
+    
+    # Timing
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<ConversationTurn(session_id={self.session_id}, seq={self.seq})>"
+    
+    def to_dict(self) -> dict:
+        """Turn in the shape used for prompt history"""
+        return {
+            "seq": self.seq,
+            "user_message": self.user_message,
+            "bot_response": self.bot_response
+        }
@@ -1,11 +1,12 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, JSON, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Integer, Text, ForeignKey, Index, Uuid
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from enum import Enum
 import uuid
 
 from app.database import Base
+from app.models.conversation_turn import ConversationTurn
+from app.models.json_document import JSONDocument, JSONDocumentMixin
 
 
 class SessionStatus(str, Enum):
@@ -15,16 +16,16 @@ class SessionStatus(str, Enum):
     ABANDONED = "abandoned"
 
 
-class GiftSession(Base):
+class GiftSession(JSONDocumentMixin, Base):
     """Gift session model for tracking individual gift-seeking conversations"""
     
     __tablename__ = "gift_sessions"
     
     # Primary key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
     # Foreign key to user
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Uuid(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     
     # Session metadata
     status = Column(String(20), default=SessionStatus.ACTIVE.value)
@@ -43,14 +44,17 @@ class GiftSession(Base):
     primary_emotion = Column(String(50), nullable=True)  # celebration, apology, gratitude, etc.
     relationship_goal = Column(String(100), nullable=True)  # strengthen_bond, show_appreciation, etc.
     
-    # Rich context (stored as JSON)
-    conversation_context = Column(JSON, default=dict)  # Full conversation history
-    extracted_insights = Column(JSON, default=dict)   # AI-extracted insights about recipient
-    user_constraints = Column(JSON, default=dict)     # Dietary restrictions, shipping constraints, etc.
+    # Conversation progress (the turns themselves live in conversation_turns)
+    turn_count = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    # Rich context (JSONB on PostgreSQL)
+    conversation_context = Column(JSONDocument, default=dict)  # Conversation state other than the turns
+    extracted_insights = Column(JSONDocument, default=dict)   # AI-extracted insights about recipient
+    user_constraints = Column(JSONDocument, default=dict)     # Dietary restrictions, shipping constraints, etc.
     
     # Recommendations and outcomes
-    recommendations_given = Column(JSON, default=list)
-    user_feedback = Column(JSON, default=dict)
+    recommendations_given = Column(JSONDocument, default=list)
+    user_feedback = Column(JSONDocument, default=dict)
     final_choice = Column(String(500), nullable=True)
     satisfaction_score = Column(Integer, nullable=True)  # 1-5 rating
     
@@ -59,35 +63,74 @@ class GiftSession(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
+    __table_args__ = (
+        # Newest active session per user, the lookup on every incoming message
+        Index(
+            "ix_gift_sessions_user_active",
+            user_id,
+            created_at.desc(),
+            postgresql_where=status == SessionStatus.ACTIVE.value,
+            sqlite_where=status == SessionStatus.ACTIVE.value
+        ),
+        # At most one active session per user, so racing first messages can't open two
+        Index(
+            "uq_gift_sessions_user_active",
+            user_id,
+            unique=True,
+            postgresql_where=status == SessionStatus.ACTIVE.value,
+            sqlite_where=status == SessionStatus.ACTIVE.value
+        ),
+        # Active sessions by last activity, for the idle session sweep
+        Index(
+            "ix_gift_sessions_active_last_activity",
+            func.coalesce(updated_at, created_at),
+            postgresql_where=status == SessionStatus.ACTIVE.value,
+            sqlite_where=status == SessionStatus.ACTIVE.value
+        ),
+        # Containment queries (@>) on the fields recommendations are filtered by
+        Index(
+            "ix_gift_sessions_extracted_insights",
+            extracted_insights,
+            postgresql_using="gin",
+            postgresql_ops={"extracted_insights": "jsonb_path_ops"}
+        ),
+        Index(
+            "ix_gift_sessions_user_constraints",
+            user_constraints,
+            postgresql_using="gin",
+            postgresql_ops={"user_constraints": "jsonb_path_ops"}
+        ),
+    )
+    
     # Relationship
     user = relationship("User", back_populates="gift_sessions")
     
     def __repr__(self):
         return f"<GiftSession(id={self.id}, user_id={self.user_id}, status={self.status})>"
     
-    def add_conversation_turn(self, user_message: str, bot_response: str):
-        """Add a conversation turn to the session"""
-        if self.conversation_context is None:
-            self.conversation_context = {"turns": []}
+    def add_conversation_turn(self, user_message: str, bot_response: str) -> "ConversationTurn":
+        """Record a conversation turn, returning the row to add to the DB session"""
+        self.turn_count = (self.turn_count or 0) + 1
         
-        turn = {
-            "timestamp": func.now().isoformat(),
-            "user_message": user_message,
-            "bot_response": bot_response
-        }
-        self.conversation_context["turns"].append(turn)
+        return ConversationTurn(
+            session_id=self.id,
+            seq=self.turn_count,
+            user_message=user_message,
+            bot_response=bot_response
+        )
     
     def update_insights(self, new_insights: dict):
-        """Update extracted insights about the recipient"""
-        if self.extracted_insights is None:
-            self.extracted_insights = {}
-        self.extracted_insights.update(new_insights)
+        """Merge new insights about the recipient into the stored ones"""
+        self.merge_json("extracted_insights", new_insights)
+    
+    def set_budget(self, budget_min: float = None, budget_max: float = None):
+        """Record the budget range, rounded to whole currency units"""
+        self.budget_min = round(budget_min) if budget_min is not None else None
+        self.budget_max = round(budget_max) if budget_max is not None else None
     
     def add_recommendations(self, recommendations: list):
-        """Store the recommendations given to the user"""
-        if self.recommendations_given is None:
-            self.recommendations_given = []
-        self.recommendations_given.extend(recommendations)
+        """Append the recommendations given to the user"""
+        self.append_json("recommendations_given", recommendations)
     
     def complete_session(self, final_choice: str = None, satisfaction: int = None):
         """Mark session as completed"""
@@ -0,0 +1,160 @@
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import JSON, Text, bindparam, event, func, inspect
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
+from sqlalchemy.sql.functions import FunctionElement
+
+# JSONB on PostgreSQL (indexable, updatable in place), plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+class _JSONMerge(FunctionElement):
+    type = JSONDocument
+    inherit_cache = True
+    name = "json_merge"
+
+
+class _JSONSetKey(FunctionElement):
+    type = JSONDocument
+    inherit_cache = True
+    name = "json_set_key"
+
+
+class _JSONAppend(FunctionElement):
+    type = JSONDocument
+    inherit_cache = True
+    name = "json_append"
+
+
+def json_merge(column, patch: Dict[str, Any]) -> _JSONMerge:
+    """column || patch: top-level keys of patch replace the column's"""
+    return _JSONMerge(column, bindparam(None, patch, type_=JSONDocument))
+
+
+def json_set_key(column, key: str, value: Any) -> _JSONSetKey:
+    """jsonb_set(column, '{key}', value): a single top-level key"""
+    return _JSONSetKey(column, bindparam(None, key, type_=Text), bindparam(None, value, type_=JSONDocument))
+
+
+def json_append(column, items: List[Any]) -> _JSONAppend:
+    """column || items for a JSON array column"""
+    return _JSONAppend(column, *(bindparam(None, item, type_=JSONDocument) for item in items))
+
+
+def _args(element, compiler, **kw) -> List[str]:
+    return [compiler.process(clause, **kw) for clause in element.clauses]
+
+
+@compiles(_JSONMerge, "postgresql")
+def _merge_postgresql(element, compiler, **kw):
+    column, patch = _args(element, compiler, **kw)
+    return f"COALESCE({column}, '{{}}'::jsonb) || {patch}"
+
+
+@compiles(_JSONSetKey, "postgresql")
+def _set_key_postgresql(element, compiler, **kw):
+    column, key, value = _args(element, compiler, **kw)
+    return f"jsonb_set(COALESCE({column}, '{{}}'::jsonb), ARRAY[CAST({key} AS TEXT)], {value})"
+
+
+@compiles(_JSONAppend, "postgresql")
+def _append_postgresql(element, compiler, **kw):
+    column, *items = _args(element, compiler, **kw)
+    return f"COALESCE({column}, '[]'::jsonb) || jsonb_build_array({', '.join(items)})"
+
+
+# SQLite's JSON1 functions, used by tests and local runs. json_patch also
+# merges nested objects and drops keys set to null, unlike ||.
+
+@compiles(_JSONMerge, "sqlite")
+def _merge_sqlite(element, compiler, **kw):
+    column, patch = _args(element, compiler, **kw)
+    return f"json_patch(COALESCE({column}, '{{}}'), {patch})"
+
+
+@compiles(_JSONSetKey, "sqlite")
+def _set_key_sqlite(element, compiler, **kw):
+    column, key, value = _args(element, compiler, **kw)
+    return f"json_set(COALESCE({column}, '{{}}'), '$.\"' || {key} || '\"', json({value}))"
+
+
+@compiles(_JSONAppend, "sqlite")
+def _append_sqlite(element, compiler, **kw):
+    column, *items = _args(element, compiler, **kw)
+    appends = ", ".join(f"'$[#]', json({item})" for item in items)
+    return f"json_insert(COALESCE({column}, '[]'), {appends})"
+
+
+class JSONDocumentMixin:
+    """Partial updates of JSON document columns, applied on the database server
+
+    Each helper changes only the given keys, or appends only the given
+    items, instead of rewriting the whole document, so two writers touching
+    different keys don't overwrite each other. The in-memory value is
+    updated right away. The server-side expression (|| or jsonb_set) is
+    written by the next flush, in the object's normal UPDATE, or by the
+    write-behind buffer for detached objects. Several changes to one column
+    are folded into one expression. Objects not yet inserted, or whose
+    column was assigned directly, get a plain write. increment() stages
+    counters the same way, as column + amount.
+    """
+
+    def merge_json(self, key: str, patch: Dict[str, Any]):
+        """Merge patch into the object stored in column key"""
+        self._stage_json(key, {**(getattr(self, key) or {}), **patch}, lambda column: json_merge(column, patch))
+
+    def set_json_key(self, key: str, name: str, value: Any):
+        """Set one top-level field of the object stored in column key"""
+        self._stage_json(key, {**(getattr(self, key) or {}), name: value}, lambda column: json_set_key(column, name, value))
+
+    def append_json(self, key: str, items: List[Any]):
+        """Append items to the array stored in column key"""
+        if items:
+            self._stage_json(key, [*(getattr(self, key) or []), *items], lambda column: json_append(column, items))
+
+    def increment(self, key: str, amount: int = 1):
+        """Add amount to the integer column key, on the server rather than from the loaded value"""
+        self._stage_json(key, (getattr(self, key) or 0) + amount, lambda column: func.coalesce(column, 0) + amount)
+
+    def _stage_json(self, key: str, value: Any, expression: Callable[[Any], Any]):
+        # key -> (server-side expression, value after it is applied)
+        pending = self.__dict__.setdefault("_json_pending", {})
+        state = inspect(self)
+
+        if key in pending and self.__dict__.get(key) is pending[key][1]:
+            previous = pending[key][0]
+        elif state.has_identity and not state.attrs[key].history.has_changes():
+            previous = getattr(type(self), key)
+        else:
+            setattr(self, key, value)
+            return
+
+        pending[key] = (expression(previous), value)
+        set_committed_value(self, key, value)
+        # Only so the flush visits the object; the expression replaces the value
+        flag_modified(self, key)
+
+
+@event.listens_for(Session, "before_flush")
+def _write_staged_json(session: Session, flush_context, instances):
+    for obj in session.identity_map.values():
+        pending = obj.__dict__.get("_json_pending")
+        for key, (expression, value) in list((pending or {}).items()):
+            if obj.__dict__.get(key) is value:
+                # The ORM renders the expression in the object's UPDATE
+                setattr(obj, key, expression)
+            else:
+                # Assigned directly since; that value is written instead
+                del pending[key]
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _restore_staged_json(session: Session, flush_context):
+    for obj in session.identity_map.values():
+        pending = obj.__dict__.pop("_json_pending", None)
+        for key, (_, value) in (pending or {}).items():
+            # The flush expired the attribute; put back the known value rather than reload it
+            set_committed_value(obj, key, value)
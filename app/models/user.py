@@ -1,18 +1,18 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index, Uuid
 from sqlalchemy.sql import func
 import uuid
 
 from app.database import Base
+from app.models.json_document import JSONDocument, JSONDocumentMixin
 
 
-class User(Base):
+class User(JSONDocumentMixin, Base):
     """User model for Present Agent users"""
     
     __tablename__ = "users"
     
     # Primary key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
     # Platform-specific identifiers
     instagram_id = Column(String(255), unique=True, nullable=True, index=True)
@@ -22,10 +22,10 @@ class User(Base):
     name = Column(String(100), nullable=True)
     email = Column(String(255), unique=True, nullable=True)
     
-    # Preferences and context (stored as JSON)
-    preferences = Column(JSON, default=dict)
-    personality_traits = Column(JSON, default=dict)
-    values = Column(JSON, default=dict)  # e.g., {"sustainability": True, "local_business": True}
+    # Preferences and context (JSONB on PostgreSQL)
+    preferences = Column(JSONDocument, default=dict)
+    personality_traits = Column(JSONDocument, default=dict)
+    values = Column(JSONDocument, default=dict)  # e.g., {"sustainability": True, "local_business": True}
     
     # Gift-giving patterns
     typical_budget_min = Column(Integer, nullable=True)
@@ -41,6 +41,10 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        Index("ix_users_values", values, postgresql_using="gin", postgresql_ops={"values": "jsonb_path_ops"}),
+    )
+    
     def __repr__(self):
         return f"<User(id={self.id}, name={self.name}, instagram_id={self.instagram_id})>"
     
@@ -51,14 +55,12 @@ class User(Base):
     
     def update_preferences(self, new_preferences: dict):
         """Update user preferences, merging with existing ones"""
-        if self.preferences is None:
-            self.preferences = {}
-        self.preferences.update(new_preferences)
+        self.merge_json("preferences", new_preferences)
     
     def add_conversation(self):
         """Increment conversation count"""
-        self.total_conversations = (self.total_conversations or 0) + 1
+        self.increment("total_conversations")
     
     def add_successful_recommendation(self):
         """Increment successful recommendation count"""
-        self.successful_recommendations = (self.successful_recommendations or 0) + 1
\ No newline at end of file
+        self.increment("successful_recommendations")
\ No newline at end of file
@@ -1,20 +1,316 @@
 import structlog
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from openai import AsyncOpenAI
+import asyncio
 import json
+import time
 
 from app.config import get_settings
+from app.services.catalog import Product, ProductCatalog
+from app.services.constraint_index import HardConstraints
+from app.services.embedding_service import EmbeddingService
+from app.services.llm_cache import LLMResponseCache
+from app.services.prompt_builder import PromptBuilder, compact_insights
+from app.utils.json_stream import JSONArrayStream
+from app.utils.metrics import AI_FALLBACKS, observe_ai_call, track_stage
+from app.utils.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
 
 logger = structlog.get_logger()
 
 
+class OperationStats:
+    """Latency, token and fallback counters for one AIService operation and model"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.hedges = 0
+        self.latency = LatencyTracker()
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+    
+    def record(self, latency: float, usage: Any = None):
+        self.calls += 1
+        self.latency.record(latency)
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "hedges": self.hedges,
+            "p95_latency_seconds": self.latency.percentile(0.95),
+            "avg_latency_seconds": round(self.latency_total / self.calls, 4) if self.calls else None,
+            "max_latency_seconds": round(self.latency_max, 4),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
 class AIService:
     """Service for AI-powered gift recommendations and conversation handling"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
         settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.model = "gpt-4-turbo"
+        self.settings = settings
+        self.client = client or AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            max_retries=settings.openai_max_retries
+        )
+        self.routes = settings.ai_routes
+        self.response_cache = LLMResponseCache()
+        self.embeddings = EmbeddingService(client=self.client if settings.openai_api_key else None)
+        self.catalog = ProductCatalog(self.embeddings)
+        
+        # (operation, model) -> stats, plus how often each operation fell back a tier
+        self._stats: Dict[Tuple[str, str], OperationStats] = {}
+        self.fallbacks: Dict[str, int] = {}
+        
+        # One breaker per operation; when open, callers get their canned fallback
+        self.breakers: Dict[str, CircuitBreaker] = {}
+    
+    def model_for(self, operation: str) -> str:
+        """Primary model routed to an operation"""
+        return self.routes[operation][0].model
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-operation, per-model latency and token counters"""
+        report: Dict[str, Any] = {}
+        for (operation, model), stats in self._stats.items():
+            report.setdefault(operation, {
+                "fallbacks": self.fallbacks.get(operation, 0),
+                "breaker": self._breaker_for(operation).stats(),
+                "models": {}
+            })
+            report[operation]["models"][model] = stats.to_dict()
+        return report
+    
+    def _breaker_for(self, operation: str) -> CircuitBreaker:
+        if operation not in self.breakers:
+            self.breakers[operation] = CircuitBreaker(
+                name=f"openai:{operation}",
+                window=self.settings.ai_breaker_window,
+                min_calls=self.settings.ai_breaker_min_calls,
+                error_threshold=self.settings.ai_breaker_error_threshold,
+                cooldown=self.settings.ai_breaker_cooldown
+            )
+        return self.breakers[operation]
+    
+    def _hedge_delay(self, stats: OperationStats) -> Optional[float]:
+        """Delay before hedging a call, from the model's recent latency percentile"""
+        if not self.settings.ai_hedging_enabled:
+            return None
+        observed = stats.latency.percentile(self.settings.ai_hedge_quantile)
+        if observed is None:
+            return None
+        return max(self.settings.ai_hedge_min_delay, observed)
+    
+    def _stats_for(self, operation: str, model: str) -> OperationStats:
+        key = (operation, model)
+        if key not in self._stats:
+            self._stats[key] = OperationStats()
+        return self._stats[key]
+    
+    async def _complete_json(
+        self,
+        operation: str,
+        messages: List[Dict[str, str]],
+        temperature: float
+    ) -> Dict[str, Any]:
+        """Run a chat completion through the operation's model tiers and parse its JSON body
+        
+        Each tier gets its own timeout, and all tiers share the operation's
+        deadline. On timeout, API error or malformed JSON the next tier is
+        tried. If every tier fails, the last error is raised. Slow calls can be
+        hedged with a second request. While the operation's circuit breaker is
+        open, CircuitOpenError is raised without calling the API. Repeats are
+        served from the response cache.
+        """
+        
+        breaker = self._breaker_for(operation)
+        deadline = time.monotonic() + self.settings.ai_deadlines.get(operation, 30.0)
+        last_error: Optional[Exception] = None
+        
+        for tier, route in enumerate(self.routes[operation]):
+            stats = self._stats_for(operation, route.model)
+            
+            cache_key = self.response_cache.make_key(route.model, messages, temperature, route.max_tokens)
+            cached = await self.response_cache.get(operation, cache_key)
+            if cached is not None:
+                stats.cache_hits += 1
+                logger.debug("LLM response served from cache", operation=operation, model=route.model)
+                return cached
+            
+            if tier > 0:
+                self.fallbacks[operation] = self.fallbacks.get(operation, 0) + 1
+                AI_FALLBACKS.labels(operation, "tier").inc()
+                logger.warning("Falling back to next model tier", operation=operation, model=route.model, tier=tier)
+            
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {operation}")
+            
+            started = time.monotonic()
+            remaining = deadline - started
+            if remaining <= 0:
+                last_error = last_error or asyncio.TimeoutError(f"Deadline exceeded for {operation}")
+                break
+            
+            def create_completion(route=route):
+                return self.client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=route.max_tokens
+                )
+            
+            try:
+                response, hedge_started = await asyncio.wait_for(
+                    hedged(create_completion, self._hedge_delay(stats)),
+                    timeout=min(route.timeout, remaining)
+                )
+                if hedge_started:
+                    stats.hedges += 1
+                
+                # Parse JSON response; only well-formed results are cached
+                result = json.loads(response.choices[0].message.content)
+            except Exception as e:
+                stats.errors += 1
+                breaker.record_failure()
+                observe_ai_call(operation, route.model, "error", time.monotonic() - started)
+                last_error = e
+                logger.warning(
+                    "Model call failed",
+                    operation=operation,
+                    model=route.model,
+                    error_type=type(e).__name__,
+                    elapsed=round(time.monotonic() - started, 3)
+                )
+                continue
+            
+            elapsed = time.monotonic() - started
+            stats.record(elapsed, getattr(response, "usage", None))
+            observe_ai_call(operation, route.model, "success", elapsed)
+            breaker.record_success()
+            await self.response_cache.set(operation, cache_key, result)
+            
+            return result
+        
+        raise last_error or RuntimeError(f"No model routes configured for {operation}")
+    
+    async def _stream_json(
+        self,
+        operation: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        array_key: str,
+        on_item: Callable[[Dict[str, Any]], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """Like _complete_json, but streamed, handing over array_key's items as they close
+        
+        The completion is requested in JSON mode and parsed incrementally,
+        and on_item is awaited for each object in the array_key list as soon
+        as it is complete. If the stream fails or the finished document
+        isn't valid JSON, the next tier is tried only when nothing has been
+        handed over yet. Otherwise the items already delivered are returned
+        as {array_key: [...], "partial": True}. Streams are not hedged.
+        Cached responses have their items handed over at once.
+        """
+        
+        breaker = self._breaker_for(operation)
+        deadline = time.monotonic() + self.settings.ai_deadlines.get(operation, 30.0)
+        last_error: Optional[Exception] = None
+        delivered: List[Dict[str, Any]] = []
+        
+        for tier, route in enumerate(self.routes[operation]):
+            stats = self._stats_for(operation, route.model)
+            
+            cache_key = self.response_cache.make_key(route.model, messages, temperature, route.max_tokens)
+            cached = await self.response_cache.get(operation, cache_key)
+            if cached is not None:
+                stats.cache_hits += 1
+                for item in cached.get(array_key) or []:
+                    await on_item(item)
+                return cached
+            
+            if tier > 0:
+                self.fallbacks[operation] = self.fallbacks.get(operation, 0) + 1
+                AI_FALLBACKS.labels(operation, "tier").inc()
+                logger.warning("Falling back to next model tier", operation=operation, model=route.model, tier=tier)
+            
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {operation}")
+            
+            started = time.monotonic()
+            remaining = deadline - started
+            if remaining <= 0:
+                last_error = last_error or asyncio.TimeoutError(f"Deadline exceeded for {operation}")
+                break
+            tier_deadline = started + min(route.timeout, remaining)
+            
+            parser = JSONArrayStream(array_key)
+            content: List[str] = []
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=route.model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=route.max_tokens,
+                        response_format={"type": "json_object"},
+                        stream=True
+                    ),
+                    timeout=tier_deadline - time.monotonic()
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, tier_deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        break
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content or ""
+                    content.append(text)
+                    for item in parser.feed(text):
+                        delivered.append(item)
+                        await on_item(item)
+                
+                result = json.loads("".join(content))
+            except Exception as e:
+                stats.errors += 1
+                breaker.record_failure()
+                observe_ai_call(operation, route.model, "error", time.monotonic() - started)
+                last_error = e
+                logger.warning(
+                    "Streamed model call failed",
+                    operation=operation,
+                    model=route.model,
+                    error_type=type(e).__name__,
+                    delivered=len(delivered),
+                    elapsed=round(time.monotonic() - started, 3)
+                )
+                if delivered:
+                    # Starting over on another tier would repeat what the user already has
+                    return {array_key: delivered, "partial": True}
+                continue
+            
+            elapsed = time.monotonic() - started
+            stats.record(elapsed)
+            observe_ai_call(operation, route.model, "success", elapsed)
+            breaker.record_success()
+            await self.response_cache.set(operation, cache_key, result)
+            
+            return result
+        
+        raise last_error or RuntimeError(f"No model routes configured for {operation}")
     
     async def extract_context_and_respond(
         self, 
@@ -24,8 +320,6 @@ class AIService:
     ) -> Dict[str, Any]:
         """Extract context from user message and generate appropriate follow-up response"""
         
-        conversation_history = self._format_conversation_history(session_context)
-        
         system_prompt = """You are a thoughtful gift advisor AI. Your goal is to understand the gift recipient and occasion through natural conversation.
 
 CONTEXT EXTRACTION: Analyze each message to extract:
@@ -45,13 +339,14 @@ RESPONSE STRATEGY: Ask ONE smart follow-up question that:
 
 TONE: Warm, helpful, and genuinely interested in finding the perfect gift."""
 
-        user_prompt = f"""
+        user_template = """
 Current conversation:
 {conversation_history}
 
 Latest message: "{message}"
 
-Previous context extracted: {session_context.get('extracted_insights', {})}
+Previous context extracted:
+{previous_insights}
 
 Extract new insights and provide a natural follow-up response that gathers one key piece of missing information.
 
@@ -67,20 +362,35 @@ Respond in JSON format:
     "response": "your follow-up question/response"
 }}"""
 
+        # Fit the variable sections into the input token budget, most important first
+        builder = PromptBuilder(self.model_for("extract_context"), self.settings.prompt_budget_extract)
+        builder.reserve("system", system_prompt)
+        builder.reserve("template", user_template.format(conversation_history="", message="", previous_insights=""))
+        latest_message = builder.fit("message", message, max_tokens=self.settings.prompt_message_max_tokens)
+        previous_insights = builder.fit(
+            "insights",
+            compact_insights(session_context.get("extracted_insights", {})) or "None yet",
+            max_tokens=self.settings.prompt_insights_max_tokens
+        )
+        conversation_history = self._format_conversation_history(builder, session_context)
+        
+        user_prompt = user_template.format(
+            conversation_history=conversation_history,
+            message=latest_message,
+            previous_insights=previous_insights
+        )
+        logger.debug("Extraction prompt assembled", tokens=builder.report())
+
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            result = await self._complete_json(
+                "extract_context",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.7,
-                max_tokens=500
+                temperature=0.7
             )
             
-            # Parse JSON response
-            result = json.loads(response.choices[0].message.content)
-            
             logger.info(
                 "Context extracted successfully",
                 extracted_insights=result.get("extracted_insights", {})
@@ -90,11 +400,13 @@ Respond in JSON format:
         
         except Exception as e:
             logger.error("Error extracting context", exc_info=e)
+            AI_FALLBACKS.labels("extract_context", "canned").inc()
             
             # Fallback response
             return {
                 "extracted_insights": {},
-                "response": "That's helpful! Could you tell me a bit more about them - what do they enjoy doing in their free time?"
+                "response": "That's helpful! Could you tell me a bit more about them - what do they enjoy doing in their free time?",
+                "fallback": True
             }
     
     async def generate_recommendations(
@@ -102,15 +414,23 @@ Respond in JSON format:
         session_context: Dict,
         extracted_insights: Dict,
         user_preferences: Dict,
-        budget_range: Tuple[Optional[int], Optional[int]] = (None, None)
+        budget_range: Tuple[Optional[int], Optional[int]] = (None, None),
+        user_constraints: Optional[Dict] = None,
+        user_values: Optional[Dict] = None,
+        on_recommendation: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Generate personalized gift recommendations"""
+        """Generate personalized gift recommendations
         
-        conversation_history = self._format_conversation_history(session_context)
+        Catalog candidates are limited to products meeting the hard
+        constraints from the budget, insights, user_constraints and
+        user_values before they are ranked.
         
-        # Prepare context for AI
-        context_summary = self._summarize_context(extracted_insights, conversation_history)
-        budget_info = self._format_budget_info(budget_range, extracted_insights)
+        With on_recommendation (and ai_stream_recommendations on), the
+        completion is streamed and each recommendation is passed to it as
+        soon as it has been parsed. The full result is still returned; it
+        is marked "partial" when the stream broke off after some
+        recommendations.
+        """
         
         system_prompt = """You are an expert gift advisor with deep understanding of human relationships and thoughtful gift-giving.
 
@@ -129,58 +449,136 @@ AVOID:
 - Items requiring extensive knowledge of specific preferences (clothing sizes, exact tech specs)
 - Overly expensive items without clear value justification
 
-For each recommendation, provide:
+When CANDIDATE PRODUCTS are listed, choose only from them, best first, and give each pick's product_id and reasoning.
+Otherwise, for each recommendation, provide:
 - name: Clear, specific gift name
 - description: 1-2 sentence description
 - reasoning: Why this gift matches the recipient and occasion
 - estimated_price: Reasonable price estimate
 - where_to_find: General guidance (online, local stores, specific retailers)"""
 
-        user_prompt = f"""
+        user_template = """
 CONTEXT SUMMARY:
 {context_summary}
 
 BUDGET: {budget_info}
 
 USER PREFERENCES: {user_preferences}
+{candidates_section}
+{response_format}"""
 
-Generate 3-5 thoughtful gift recommendations in JSON format:
-{{
+        # Candidate generation: a short list from the local catalog, so the model
+        # ranks and explains real products instead of inventing them
+        constraints = HardConstraints.from_context(extracted_insights, budget_range, user_constraints, user_values)
+        candidates = await self._retrieve_candidates(extracted_insights, constraints)
+        if candidates:
+            candidates_section = "\nCANDIDATE PRODUCTS (id | name | price | description):\n" + "\n".join(
+                f"- {product.id} | {product.name} | ${product.price:g} | {product.description}"
+                for product in candidates
+            ) + "\n"
+            response_format = """Pick the 3 best candidates in JSON format:
+{
+    "recommendations": [
+        {"product_id": "candidate id", "reasoning": "Why this works for this person/occasion"}
+    ],
+    "explanation": "Brief explanation of your approach"
+}"""
+        else:
+            candidates_section = ""
+            response_format = """Generate 3-5 thoughtful gift recommendations in JSON format:
+{
     "recommendations": [
-        {{
+        {
             "name": "Specific gift name",
             "description": "Brief description",
             "reasoning": "Why this works for this person/occasion",
             "estimated_price": 25,
             "where_to_find": "Where to buy guidance"
-        }}
+        }
     ],
     "explanation": "Brief explanation of your approach"
-}}"""
+}"""
+
+        # Prepare context for AI within the input token budget
+        builder = PromptBuilder(self.model_for("generate_recommendations"), self.settings.prompt_budget_recommend)
+        builder.reserve("system", system_prompt)
+        builder.reserve("template", user_template.format(
+            context_summary="", budget_info="", user_preferences="",
+            candidates_section="", response_format=response_format
+        ))
+        candidates_section = builder.fit("candidates", candidates_section)
+        budget_info = builder.fit("budget", self._format_budget_info(budget_range, extracted_insights), max_tokens=60)
+        preferences = builder.fit(
+            "preferences",
+            compact_insights(user_preferences) or "None recorded",
+            max_tokens=self.settings.prompt_insights_max_tokens
+        )
+        context_summary = builder.fit(
+            "insights",
+            self._summarize_context(extracted_insights),
+            max_tokens=self.settings.prompt_insights_max_tokens
+        )
+        conversation_history = self._format_conversation_history(builder, session_context)
+        if conversation_history != "No previous conversation":
+            context_summary += f"\nRecent conversation:\n{conversation_history}"
+        
+        user_prompt = user_template.format(
+            context_summary=context_summary,
+            budget_info=budget_info,
+            user_preferences=preferences,
+            candidates_section=candidates_section,
+            response_format=response_format
+        )
+        logger.debug("Recommendation prompt assembled", tokens=builder.report())
 
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=1000
-            )
+            if on_recommendation is not None and self.settings.ai_stream_recommendations:
+                offered = {product.id: product for product in candidates}
+                
+                async def deliver(item: Dict[str, Any]):
+                    if candidates:
+                        item = self._attach_product(item, offered)
+                        if item is None:
+                            return
+                    await on_recommendation(item)
+                
+                result = await self._stream_json(
+                    "generate_recommendations", messages, temperature=0.8,
+                    array_key="recommendations", on_item=deliver
+                )
+            else:
+                result = await self._complete_json("generate_recommendations", messages, temperature=0.8)
             
-            # Parse JSON response
-            result = json.loads(response.choices[0].message.content)
+            if candidates:
+                result = self._attach_products(result, candidates)
             
             logger.info(
                 "Recommendations generated successfully",
-                num_recommendations=len(result.get("recommendations", []))
+                num_recommendations=len(result.get("recommendations", [])),
+                candidates=len(candidates)
             )
             
             return result
         
         except Exception as e:
             logger.error("Error generating recommendations", exc_info=e)
+            AI_FALLBACKS.labels("generate_recommendations", "canned").inc()
+            
+            # Best retrieved candidates, unexplained, when the catalog had any
+            if candidates:
+                return {
+                    "recommendations": [
+                        product.to_recommendation("A close match for what you've told me about them")
+                        for product in candidates[:3]
+                    ],
+                    "explanation": "Closest catalog matches, without AI ranking",
+                    "fallback": True
+                }
             
             # Fallback recommendations
             return {
@@ -193,24 +591,86 @@ Generate 3-5 thoughtful gift recommendations in JSON format:
                         "where_to_find": "Online photo services like Shutterfly"
                     }
                 ],
-                "explanation": "Fallback recommendation due to processing error"
+                "explanation": "Fallback recommendation due to processing error",
+                "fallback": True
             }
     
-    def _format_conversation_history(self, session_context: Dict) -> str:
-        """Format conversation history for AI context"""
-        turns = session_context.get("turns", [])
+    async def _retrieve_candidates(self, extracted_insights: Dict, constraints: HardConstraints) -> List[Product]:
+        """Nearest catalog products to the gift context that meet the hard constraints
+        
+        Empty if the catalog is unavailable.
+        """
+        
+        query = self._candidate_query(extracted_insights)
+        if not query:
+            return []
+        
+        try:
+            if not await self.catalog.load():
+                return []
+            with track_stage("candidate_generation"):
+                mask = self.catalog.mask_for(constraints)
+                matches = await self.catalog.search(query, self.settings.catalog_candidates, mask)
+        except Exception as e:
+            logger.warning("Candidate generation failed", exc_info=e)
+            return []
+        
+        return [product for product, _ in matches]
+    
+    def _candidate_query(self, extracted_insights: Dict) -> str:
+        """Search text for the catalog, built from the gift context"""
+        
+        parts = []
+        for key in ("interests", "occasion", "recipient_type", "emotional_context", "personality_traits"):
+            value = (extracted_insights or {}).get(key)
+            if isinstance(value, (list, tuple)):
+                parts.extend(str(v) for v in value)
+            elif value:
+                parts.append(str(value))
+        return " ".join(parts)
+    
+    def _attach_products(self, result: Dict[str, Any], candidates: List[Product]) -> Dict[str, Any]:
+        """Fill the model's picks with catalog details, dropping IDs that weren't offered"""
+        
+        offered = {product.id: product for product in candidates}
+        recommendations = []
+        for pick in result.get("recommendations", []):
+            recommendation = self._attach_product(pick, offered)
+            if recommendation is None:
+                logger.warning("Model picked a product that was not a candidate", product_id=pick.get("product_id"))
+                continue
+            recommendations.append(recommendation)
+        
+        return {**result, "recommendations": recommendations}
+    
+    @staticmethod
+    def _attach_product(pick: Dict[str, Any], offered: Dict[str, Product]) -> Optional[Dict[str, Any]]:
+        """A single pick as a catalog recommendation, or None if its ID wasn't offered"""
         
-        if not turns:
-            return "No previous conversation"
+        product = offered.get(str(pick.get("product_id")))
+        if product is None:
+            return None
+        return product.to_recommendation(pick.get("reasoning", ""))
+    
+    def _format_conversation_history(self, builder: PromptBuilder, session_context: Dict) -> str:
+        """Format the rolling summary and recent turns into the remaining token budget"""
         
-        history = []
-        for turn in turns[-5:]:  # Last 5 turns to stay within token limits
-            history.append(f"User: {turn.get('user_message', '')}")
-            history.append(f"Assistant: {turn.get('bot_response', '')}")
+        summary = builder.fit(
+            "summary",
+            session_context.get("summary", ""),
+            max_tokens=self.settings.prompt_summary_max_tokens
+        )
+        history = builder.fit_turns("history", session_context.get("turns", []))
         
-        return "\n".join(history)
+        parts = []
+        if summary:
+            parts.append(f"Earlier in the conversation:\n{summary}")
+        if history:
+            parts.append(history)
+        
+        return "\n".join(parts) if parts else "No previous conversation"
     
-    def _summarize_context(self, extracted_insights: Dict, conversation_history: str) -> str:
+    def _summarize_context(self, extracted_insights: Dict) -> str:
         """Create a context summary for recommendation generation"""
         
         summary_parts = []
@@ -229,10 +689,6 @@ Generate 3-5 thoughtful gift recommendations in JSON format:
         if extracted_insights.get("emotional_context"):
             summary_parts.append(f"Emotional context: {extracted_insights['emotional_context']}")
         
-        # Add conversation snippet
-        if conversation_history and conversation_history != "No previous conversation":
-            summary_parts.append(f"Recent conversation:\n{conversation_history}")
-        
         return "\n".join(summary_parts) if summary_parts else "Limited context available"
     
     def _format_budget_info(self, budget_range: Tuple[Optional[int], Optional[int]], extracted_insights: Dict) -> str:
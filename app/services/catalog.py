@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+from app.services.constraint_index import ConstraintIndex, HardConstraints
+from app.services.embedding_service import EmbeddingService
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class Product:
+    """One catalog entry"""
+
+    id: str
+    name: str
+    description: str
+    price: float
+    interests: List[str] = field(default_factory=list)
+    occasions: List[str] = field(default_factory=list)
+    relationships: List[str] = field(default_factory=list)
+    sustainable: bool = False
+    ships_international: bool = False
+    delivery_days: int = 7
+    where_to_find: str = ""
+
+    def embedding_text(self) -> str:
+        """Text the product's embedding is computed from"""
+        return (
+            f"{self.name}. {self.description} "
+            f"Interests: {', '.join(self.interests)}. "
+            f"Occasions: {', '.join(self.occasions)}. "
+            f"For: {', '.join(self.relationships)}."
+        )
+
+    def to_recommendation(self, reasoning: str = "") -> Dict[str, Any]:
+        """Shape used by AIService recommendation results"""
+        return {
+            "product_id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "reasoning": reasoning,
+            "estimated_price": self.price,
+            "where_to_find": self.where_to_find,
+        }
+
+
+class VectorIndex:
+    """Exact top-k cosine search over a matrix of unit-length row vectors
+
+    The matrix may be a read-only memory map; queries never copy it.
+    """
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Rows with the highest cosine similarity to query, best first
+
+        An optional boolean mask restricts the search to the rows where it
+        is True.
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+
+        scores = self.vectors @ query.astype(np.float32, copy=False)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(np.count_nonzero(mask)))
+            if k == 0:
+                return []
+
+        k = min(k, len(self))
+        # Partial selection of the top k, then sort only those
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+class ProductCatalog:
+    """Product catalog with an in-memory embedding index for candidate generation
+
+    Products are read from a JSON file. Hard constraints (budget, occasion,
+    relationship, shipping, values) narrow the search through a columnar
+    ConstraintIndex before any similarity is computed. Their embeddings are computed once
+    per catalog and embedding model, saved as a .npy file in
+    catalog_index_dir, and memory-mapped on later starts. Loading is lazy,
+    on the first search. If the embeddings can't be computed, load()
+    returns False and is not retried until an exponential backoff has
+    passed.
+    """
+
+    def __init__(self, embedder=None):
+        settings = get_settings()
+        self.enabled = settings.catalog_enabled
+        self.path = settings.catalog_path
+        self.index_dir = settings.catalog_index_dir
+        self.embedder = embedder or EmbeddingService()
+        self.retry_base = settings.catalog_retry_base
+        self.retry_max = settings.catalog_retry_max
+
+        self.products: List[Product] = []
+        self._by_id: Dict[str, Product] = {}
+        self.index: Optional[VectorIndex] = None
+        self.constraints: Optional[ConstraintIndex] = None
+        self._lock = asyncio.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+    async def load(self) -> bool:
+        """Read the catalog and build or memory-map its index; False if unavailable"""
+        if not self.enabled:
+            return False
+
+        async with self._lock:
+            if self.loaded:
+                return True
+            if time.monotonic() < self._retry_at:
+                return False
+
+            try:
+                with open(self.path) as f:
+                    products = [Product(**item) for item in json.load(f)]
+            except (OSError, ValueError, TypeError) as e:
+                logger.error("Product catalog unavailable", path=self.path, exc_info=e)
+                self.enabled = False
+                return False
+
+            try:
+                vectors = await self._load_vectors(products)
+            except Exception as e:
+                self._failures += 1
+                delay = min(self.retry_max, self.retry_base * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + delay
+                logger.error("Product catalog embeddings failed", retry_in=delay, exc_info=e)
+                return False
+
+            self._failures = 0
+            self.products = products
+            self._by_id = {product.id: product for product in products}
+            self.index = VectorIndex(vectors)
+            self.constraints = ConstraintIndex(products)
+
+            logger.info("Product catalog loaded", products=len(products), embedder=self.embedder.name)
+            return True
+
+    async def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[Product, float]]:
+        """Top-k products most similar to the query text"""
+        if not query or not await self.load():
+            return []
+
+        vector = (await self.embedder.embed([query]))[0]
+        return [(self.products[row], score) for row, score in self.index.search(vector, k, mask)]
+
+    def mask_for(self, constraints: HardConstraints) -> np.ndarray:
+        """Products meeting the constraints, dropping occasion and relationship fit if nothing does
+
+        Call after load().
+        """
+        mask = self.constraints.mask(constraints)
+        if not mask.any():
+            mask = self.constraints.mask(constraints.relaxed())
+        return mask
+
+    def get(self, product_id: str) -> Optional[Product]:
+        return self._by_id.get(product_id)
+
+    async def _load_vectors(self, products: List[Product]) -> np.ndarray:
+        texts = [product.embedding_text() for product in products]
+        fingerprint = hashlib.sha256(
+            json.dumps([self.embedder.name, texts]).encode("utf-8")
+        ).hexdigest()[:16]
+        index_path = os.path.join(self.index_dir, f"catalog-{fingerprint}.npy")
+
+        if os.path.exists(index_path):
+            try:
+                return np.load(index_path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                logger.warning("Catalog index unreadable, rebuilding", path=index_path, exc_info=e)
+
+        vectors = np.asarray(await self.embedder.embed(texts), dtype=np.float32)
+
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            # Write then rename so a concurrent reader never maps a partial file
+            tmp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, vectors)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning("Catalog index not persisted", path=index_path, exc_info=e)
+
+        return vectors
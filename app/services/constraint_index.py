@@ -0,0 +1,196 @@
+import re
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.recommendation_cache import OCCASION_ALIASES, RECIPIENT_ALIASES, normalize_label, price_amounts
+
+# Catalog tag meaning "suitable for every relationship/occasion"
+ANY_TAG = "any"
+
+# Relationship groups used by the catalog, on top of the recommendation cache aliases
+RELATIONSHIP_ALIASES = {
+    **RECIPIENT_ALIASES,
+    "brother": "sibling", "sister": "sibling",
+    "grandma": "grandparent", "grandmother": "grandparent", "grandpa": "grandparent",
+    "grandfather": "grandparent", "granny": "grandparent",
+    "son": "child", "daughter": "child", "kid": "child", "kids": "child",
+    "boss": "colleague", "manager": "colleague", "teacher": "colleague",
+}
+OCCASION_TAG_ALIASES = {
+    **OCCASION_ALIASES,
+    "mother day": "mothers_day", "mothers day": "mothers_day",
+    "father day": "fathers_day", "fathers day": "fathers_day",
+    "valentine": "valentines", "valentine day": "valentines", "valentines day": "valentines",
+    "house warming": "housewarming", "new home": "housewarming",
+    "holiday": "christmas", "holidays": "christmas",
+    "new job": "new job", "promotion": "new job",
+}
+
+_UPPER_BOUND = re.compile(r"\b(under|below|less than|max(?:imum)?|up to|no more than|at most)\b")
+_LOWER_BOUND = re.compile(r"\b(over|above|more than|at least|min(?:imum)?)\b")
+
+# "around $75" is read as a range around the amount
+APPROXIMATE_BUDGET = (0.6, 1.2)
+
+
+def parse_budget_hint(hint: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Price range implied by free-text budget hints such as "under $50" or "$30-60" """
+    if not isinstance(hint, str):
+        return None, None
+
+    amounts = price_amounts(hint)
+    if not amounts:
+        return None, None
+
+    text = hint.lower()
+    if len(amounts) >= 2:
+        return min(amounts), max(amounts)
+    if _UPPER_BOUND.search(text):
+        return None, amounts[0]
+    if _LOWER_BOUND.search(text):
+        return amounts[0], None
+    low, high = APPROXIMATE_BUDGET
+    return amounts[0] * low, amounts[0] * high
+
+
+@dataclass(frozen=True)
+class HardConstraints:
+    """Requirements a candidate product must meet, whatever its relevance"""
+
+    budget_min: Optional[float] = None
+    budget_max: Optional[float] = None
+    occasion: Optional[str] = None
+    relationship: Optional[str] = None
+    international_shipping: bool = False
+    max_delivery_days: Optional[int] = None
+    sustainable_only: bool = False
+
+    @classmethod
+    def from_context(
+        cls,
+        extracted_insights: Optional[Dict] = None,
+        budget_range: Tuple[Optional[int], Optional[int]] = (None, None),
+        user_constraints: Optional[Dict] = None,
+        user_values: Optional[Dict] = None
+    ) -> "HardConstraints":
+        """Collect constraints from the session budget, insights, user_constraints and User.values
+
+        An explicit budget wins over budget hints. user_constraints may set
+        international_shipping (bool) and max_delivery_days (int); User.values
+        may set sustainability (bool).
+        """
+        insights = extracted_insights or {}
+        user_constraints = user_constraints or {}
+
+        budget_min, budget_max = budget_range
+        if budget_min is None and budget_max is None:
+            budget_min, budget_max = parse_budget_hint(insights.get("budget_hints"))
+
+        max_delivery_days = user_constraints.get("max_delivery_days")
+
+        return cls(
+            budget_min=budget_min,
+            budget_max=budget_max,
+            occasion=normalize_label(insights.get("occasion"), OCCASION_TAG_ALIASES),
+            relationship=normalize_label(insights.get("recipient_type"), RELATIONSHIP_ALIASES),
+            international_shipping=bool(user_constraints.get("international_shipping")),
+            max_delivery_days=int(max_delivery_days) if max_delivery_days else None,
+            sustainable_only=bool((user_values or {}).get("sustainability")),
+        )
+
+    @property
+    def personal(self) -> bool:
+        """Whether any constraint comes from the user rather than the gift context"""
+        return self.international_shipping or self.max_delivery_days is not None or self.sustainable_only
+
+    def admits_price(self, price: Any) -> bool:
+        """Whether an estimated price, a number or free text like "$30-40", is within budget
+
+        Recommendations without a readable price are admitted.
+        """
+        if price is None or isinstance(price, bool):
+            return True
+        amounts = [float(price)] if isinstance(price, (int, float)) else price_amounts(str(price))
+        if not amounts:
+            return True
+        if self.budget_min is not None and min(amounts) < self.budget_min:
+            return False
+        if self.budget_max is not None and max(amounts) > self.budget_max:
+            return False
+        return True
+
+    def admits(self, result: Dict[str, Any]) -> bool:
+        """Whether every recommendation in a result is within budget"""
+        return all(
+            self.admits_price(rec.get("estimated_price"))
+            for rec in result.get("recommendations") or []
+            if isinstance(rec, dict)
+        )
+
+    def relaxed(self) -> "HardConstraints":
+        """The same constraints without occasion and relationship fit"""
+        return replace(self, occasion=None, relationship=None)
+
+
+class ConstraintIndex:
+    """Column arrays over the catalog for vectorized hard-constraint filtering
+
+    Numeric and boolean attributes are stored one array per attribute.
+    Occasion and relationship tags are stored as boolean matrices with one
+    column per tag. A set of constraints becomes the AND of a few
+    elementwise comparisons and column reads. Tags the catalog has never
+    seen don't filter anything, so an unusual occasion doesn't empty the
+    candidate set.
+    """
+
+    def __init__(self, products: Sequence[Any]):
+        self.size = len(products)
+        self.price = np.array([p.price for p in products], dtype=np.float32)
+        self.delivery_days = np.array([p.delivery_days for p in products], dtype=np.int16)
+        self.sustainable = np.array([p.sustainable for p in products], dtype=bool)
+        self.ships_international = np.array([p.ships_international for p in products], dtype=bool)
+        self.occasions, self.occasion_tags = self._tag_matrix([p.occasions for p in products])
+        self.relationships, self.relationship_tags = self._tag_matrix([p.relationships for p in products])
+
+    @staticmethod
+    def _tag_matrix(tag_lists: List[List[str]]) -> Tuple[np.ndarray, Dict[str, int]]:
+        """(products x tags) membership matrix; products tagged ANY_TAG match every tag"""
+        vocabulary: Dict[str, int] = {}
+        for tags in tag_lists:
+            for tag in tags:
+                if tag != ANY_TAG:
+                    vocabulary.setdefault(tag, len(vocabulary))
+
+        matrix = np.zeros((len(tag_lists), len(vocabulary)), dtype=bool)
+        for row, tags in enumerate(tag_lists):
+            if ANY_TAG in tags:
+                matrix[row, :] = True
+            else:
+                matrix[row, [vocabulary[tag] for tag in tags]] = True
+        return matrix, vocabulary
+
+    def mask(self, constraints: HardConstraints) -> np.ndarray:
+        """Boolean mask of the products satisfying every constraint"""
+        mask = np.ones(self.size, dtype=bool)
+
+        if constraints.budget_min is not None:
+            mask &= self.price >= constraints.budget_min
+        if constraints.budget_max is not None:
+            mask &= self.price <= constraints.budget_max
+        if constraints.max_delivery_days is not None:
+            mask &= self.delivery_days <= constraints.max_delivery_days
+        if constraints.international_shipping:
+            mask &= self.ships_international
+        if constraints.sustainable_only:
+            mask &= self.sustainable
+
+        column = self.occasion_tags.get(constraints.occasion or "")
+        if column is not None:
+            mask &= self.occasions[:, column]
+        column = self.relationship_tags.get(constraints.relationship or "")
+        if column is not None:
+            mask &= self.relationships[:, column]
+
+        return mask
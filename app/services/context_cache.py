@@ -0,0 +1,207 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import structlog
+from sqlalchemy import DateTime, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.types import Uuid
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.models import User, GiftSession
+from app.utils.metrics import CACHE_LOOKUPS
+
+logger = structlog.get_logger()
+
+
+def snapshot(obj: Any) -> Dict[str, Any]:
+    """Serialize the loaded column attributes of a mapped object
+
+    Expired or unloaded attributes (e.g. server-side onupdate timestamps after
+    a flush) are skipped so taking a snapshot never triggers a lazy load.
+    """
+    state = inspect(obj)
+    unloaded = state.unloaded
+    data = {}
+
+    for column_attr in state.mapper.column_attrs:
+        key = column_attr.key
+        if key in unloaded:
+            continue
+        value = state.dict.get(key)
+        if value is None:
+            continue
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        data[key] = value
+
+    return data
+
+
+def restore(model: Type, data: Dict[str, Any]) -> Any:
+    """Rebuild a detached, clean instance from a snapshot
+
+    Columns missing from the snapshot are set to None rather than left
+    expired, since an expired attribute would lazy-load outside the async
+    greenlet.
+    """
+    values = {}
+
+    for column_attr in inspect(model).column_attrs:
+        key = column_attr.key
+        value = data.get(key)
+        if value is None:
+            values[key] = None
+            continue
+        column_type = column_attr.columns[0].type
+        if isinstance(column_type, Uuid):
+            value = uuid.UUID(value)
+        elif isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        values[key] = value
+
+    obj = model(**values)
+    # Reset attribute history so only later changes are flushed as UPDATEs
+    make_transient_to_detached(obj)
+    return obj
+
+
+class ContextCache:
+    """Read-through Redis cache of users, their active gift session and its recent turns
+
+    Holds compact JSON snapshots keyed on the platform user id, so hot
+    conversations skip the database on reads. Along with the user and
+    session, the turns not yet folded into the session's summary are
+    kept, so the prompt history needs no query either. Snapshots are
+    refreshed after every commit and dropped on failures. Any Redis error
+    is treated as a cache miss.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.prefix = settings.cache_key_prefix
+        self.user_ttl = settings.cache_user_ttl
+        self.session_ttl = settings.cache_session_ttl
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def user_key(self, platform: str, platform_user_id: str) -> str:
+        return f"{self.prefix}:user:{platform}:{platform_user_id}"
+
+    def session_key(self, platform: str, platform_user_id: str) -> str:
+        return f"{self.prefix}:session:{platform}:{platform_user_id}"
+
+    def turns_key(self, platform: str, platform_user_id: str) -> str:
+        return f"{self.prefix}:turns:{platform}:{platform_user_id}"
+
+    async def load(
+        self,
+        db: AsyncSession,
+        platform: str,
+        platform_user_id: str
+    ) -> Optional[Tuple[User, GiftSession, Optional[List[Dict[str, Any]]]]]:
+        """Attach the cached user and active session to db, or return None on a miss
+
+        The third element is the cached recent turns, None if there are none.
+        """
+
+        client = get_redis()
+        if client is None:
+            return None
+
+        try:
+            user_data, session_data, turns_data = await client.mget(
+                self.user_key(platform, platform_user_id),
+                self.session_key(platform, platform_user_id),
+                self.turns_key(platform, platform_user_id)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Context cache read failed", exc_info=e)
+            return None
+
+        if not user_data or not session_data:
+            self.misses += 1
+            CACHE_LOOKUPS.labels("context", "miss").inc()
+            return None
+
+        user = restore(User, json.loads(user_data))
+        session = restore(GiftSession, json.loads(session_data))
+
+        # Persistent in this session without a SELECT
+        db.add(user)
+        db.add(session)
+
+        self.hits += 1
+        CACHE_LOOKUPS.labels("context", "hit").inc()
+        return user, session, json.loads(turns_data) if turns_data else None
+
+    async def store(
+        self,
+        platform: str,
+        platform_user_id: str,
+        user: User,
+        session: GiftSession,
+        turns: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Write committed user and session state, and the session's unsummarized turns"""
+
+        client = get_redis()
+        if client is None:
+            return
+
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(
+                    self.user_key(platform, platform_user_id),
+                    json.dumps(snapshot(user), separators=(",", ":")),
+                    ex=self.user_ttl
+                )
+                pipe.set(
+                    self.session_key(platform, platform_user_id),
+                    json.dumps(snapshot(session), separators=(",", ":")),
+                    ex=self.session_ttl
+                )
+                if turns is not None:
+                    pipe.set(
+                        self.turns_key(platform, platform_user_id),
+                        json.dumps(turns, separators=(",", ":")),
+                        ex=self.session_ttl
+                    )
+                else:
+                    pipe.delete(self.turns_key(platform, platform_user_id))
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Context cache write failed", exc_info=e)
+            # Don't leave a stale snapshot behind
+            await self.invalidate(platform, platform_user_id)
+
+    async def invalidate(self, platform: str, platform_user_id: str):
+        """Drop cached state for a user"""
+
+        client = get_redis()
+        if client is None:
+            return
+
+        try:
+            await client.delete(
+                self.user_key(platform, platform_user_id),
+                self.session_key(platform, platform_user_id),
+                self.turns_key(platform, platform_user_id)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Context cache invalidation failed", exc_info=e)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
@@ -1,57 +1,250 @@
 import structlog
-from typing import Optional
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+from sqlalchemy import select, exists, func, literal, literal_column, union_all
 
+from app.config import get_settings
 from app.database import get_db
-from app.models import User, GiftSession
+from app.models import User, GiftSession, ConversationTurn
+from app.models.gift_session import SessionStatus
 from app.services.ai_service import AIService
+from app.services.constraint_index import HardConstraints, parse_budget_hint
+from app.services.context_cache import ContextCache
+from app.services.local_nlu import LocalExtraction, extract
+from app.services.recommendation_cache import RecommendationCache
+from app.services.write_behind import write_buffer
+from app.services.prompt_builder import get_token_counter, update_summary
+from app.utils.metrics import LOCAL_NLU_TURNS, MESSAGE_ERRORS, STAGE_SECONDS, record_sample, track_stage
 
 logger = structlog.get_logger()
 
+# Upper bound on turns folded into the rolling summary per message, so old
+# sessions that predate summaries catch up without loading their full history
+SUMMARY_CATCH_UP_TURNS = 10
+
+# Opening of the message carrying the first recommendation while the rest are generated
+FIRST_IDEA_INTRO = "Here's a first idea while I look for more:"
+
+# Callback that sends a message to the user ahead of the final reply
+SendEarly = Callable[[str], Awaitable[Any]]
+
+# Column holding each platform's user identifier
+PLATFORM_ID_COLUMNS = {
+    "instagram": User.__table__.c.instagram_id,
+    "whatsapp": User.__table__.c.whatsapp_id,
+}
+
+
+def build_ingest_statement(platform_user_id: str, platform: str):
+    """Build a single statement that upserts the user and returns it with its active session
+    
+    The user is upserted with INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so
+    two first messages from the same new sender cannot trip the unique
+    constraint. The user's active session is selected, and one is
+    inserted from the same CTE chain when none exists. That insert does
+    nothing if a concurrent message opened the session first (the partial
+    unique index on active sessions), and the statement then returns no
+    row; running it again finds that session. The result maps to
+    (User, GiftSession) entities.
+    """
+    
+    if platform not in PLATFORM_ID_COLUMNS:
+        raise ValueError(f"Unsupported platform: {platform}")
+    
+    users = User.__table__
+    sessions = GiftSession.__table__
+    id_column = PLATFORM_ID_COLUMNS[platform]
+    
+    # Upsert the user; DO UPDATE (rather than DO NOTHING) so RETURNING always yields the row
+    upserted_user = (
+        pg_insert(users)
+        .values({
+            users.c.id: uuid.uuid4(),
+            id_column: platform_user_id,
+            users.c.preferences: {},
+            users.c.personality_traits: {},
+            users.c["values"]: {},
+            users.c.total_conversations: 0,
+            users.c.successful_recommendations: 0,
+            users.c.last_active: func.now(),
+        })
+        .on_conflict_do_update(index_elements=[id_column], set_={"last_active": func.now()})
+        .returning(*users.c)
+        .cte("upserted_user")
+    )
+    
+    # Newest active session for that user
+    active_session = (
+        select(*sessions.c)
+        .where(
+            sessions.c.user_id == select(upserted_user.c.id).scalar_subquery(),
+            sessions.c.status == SessionStatus.ACTIVE.value
+        )
+        .order_by(sessions.c.created_at.desc())
+        .limit(1)
+        .cte("active_session")
+    )
+    
+    # Start a session only when there is no active one
+    new_session_values = {
+        sessions.c.id: literal(uuid.uuid4(), sessions.c.id.type),
+        sessions.c.user_id: upserted_user.c.id,
+        sessions.c.status: literal(SessionStatus.ACTIVE.value, sessions.c.status.type),
+        sessions.c.platform: literal(platform, sessions.c.platform.type),
+        sessions.c.conversation_context: literal({}, sessions.c.conversation_context.type),
+        sessions.c.extracted_insights: literal({}, sessions.c.extracted_insights.type),
+        sessions.c.user_constraints: literal({}, sessions.c.user_constraints.type),
+        sessions.c.recommendations_given: literal([], sessions.c.recommendations_given.type),
+        sessions.c.user_feedback: literal({}, sessions.c.user_feedback.type),
+    }
+    new_session = (
+        pg_insert(sessions)
+        .from_select(
+            list(new_session_values.keys()),
+            select(*new_session_values.values()).where(~exists(select(active_session.c.id)))
+        )
+        .on_conflict_do_nothing(
+            index_elements=[sessions.c.user_id],
+            # Inlined rather than bound, so generic plans still infer the partial index
+            index_where=sessions.c.status == literal_column(f"'{SessionStatus.ACTIVE.value}'")
+        )
+        .returning(*sessions.c)
+        .cte("new_session")
+    )
+    
+    session_row = union_all(
+        select(*active_session.c),
+        select(*new_session.c)
+    ).cte("session_row")
+    
+    user_entity = aliased(User, upserted_user)
+    session_entity = aliased(GiftSession, session_row)
+    
+    return select(user_entity, session_entity).join(
+        session_entity, session_entity.user_id == user_entity.id
+    )
+
 
 class ConversationHandler:
     """Handles conversation flow and context management"""
     
     def __init__(self):
         self.ai_service = AIService()
+        self.context_cache = ContextCache()
+        self.recommendation_cache = RecommendationCache()
+        self.write_buffer = write_buffer
+        self.history_turns = get_settings().conversation_history_turns
+        self.summary_max_tokens = get_settings().prompt_summary_max_tokens
+        self.local_nlu_enabled = get_settings().local_nlu_enabled
+        self.local_nlu_min_coverage = get_settings().local_nlu_min_coverage
     
-    async def process_message(self, user_id: str, message: str, platform: str) -> str:
-        """Process an incoming message and return a response"""
+    async def process_message(
+        self,
+        user_id: str,
+        message: str,
+        platform: str,
+        send_early: Optional[SendEarly] = None
+    ) -> str:
+        """Process an incoming message and return a response
+        
+        With send_early, the first recommendation of a recommendation turn
+        is sent through it as soon as it has been generated, ahead of the
+        returned reply with the rest. It goes out before the turn is
+        committed.
+        """
         
         try:
-            # Get or create user
+            # Reads only: the DB session is closed, and its connection back in
+            # the pool, before any AI call. The objects stay usable detached.
+            session_context = None
             async for db in get_db():
-                user = await self.get_or_create_user(db, user_id, platform)
-                
-                # Get or create active session
-                session = await self.get_or_create_session(db, user, platform)
+                # Get or create user and active session
+                with track_stage("load_user_and_session"):
+                    user, session, cached_turns = await self.load_user_and_session(db, user_id, platform)
                 
-                # Update user activity
-                user.add_conversation()
-                
-                # Process message based on conversation state
-                response = await self.generate_response(db, user, session, message)
-                
-                # Store conversation turn
-                session.add_conversation_turn(message, response)
-                
-                # Commit changes
-                await db.commit()
-                
-                logger.info(
-                    "Message processed successfully",
-                    user_id=user_id,
-                    session_id=str(session.id),
-                    platform=platform
-                )
-                
-                return response
+                # Recent history for the AI calls
+                if session.turn_count:
+                    with track_stage("load_session_context"):
+                        session_context = await self.load_session_context(db, session, cached_turns)
+            
+            # Update user activity (after the reads, which would otherwise
+            # autoflush it into a transaction that is never committed)
+            user.add_conversation()
+            user.last_active = datetime.now(timezone.utc)
+            
+            # Process message based on conversation state
+            with track_stage("generate_response"):
+                response = await self.generate_response(user, session, message, session_context, send_early)
+            
+            # The turn, counters and session changes are committed with other
+            # messages' writes; the reply only goes out once they are durable
+            turn = session.add_conversation_turn(message, response)
+            with track_stage("db_commit"):
+                await self.write_buffer.submit(user, session, turn)
+            
+            # Refresh the cached snapshot with the committed state; the turns
+            # not yet summarized are exactly what the next message reads
+            recent_turns = [*(session_context or {}).get("turns", []), turn.to_dict()]
+            await self.context_cache.store(platform, user_id, user, session, recent_turns)
+            
+            logger.info(
+                "Message processed successfully",
+                user_id=user_id,
+                session_id=str(session.id),
+                platform=platform
+            )
+            
+            return response
         
         except Exception as e:
             logger.error("Error processing message", exc_info=e, user_id=user_id)
+            MESSAGE_ERRORS.inc()
+            await self.context_cache.invalidate(platform, user_id)
             return "I'm sorry, I'm having trouble understanding. Could you try rephrasing that? 🤖"
     
+    async def load_user_and_session(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        platform: str
+    ) -> Tuple[User, GiftSession, Optional[List[Dict]]]:
+        """Get or create the user and their active session, with any cached recent turns
+        
+        Hot conversations are served from the context cache without touching
+        the database, turns included. On a miss, PostgreSQL needs a single
+        round trip and other databases fall back to separate lookups, and
+        the turns are None.
+        """
+        
+        cached = await self.context_cache.load(db, platform, user_id)
+        if cached is not None:
+            return cached
+        
+        if db.bind.dialect.name == "postgresql":
+            with track_stage("get_or_create_user_and_session"):
+                statement = build_ingest_statement(user_id, platform)
+                row = (await db.execute(statement)).first()
+                if row is None:
+                    # A concurrent message opened the session; a new statement sees it
+                    row = (await db.execute(statement)).one()
+                user, session = row
+        else:
+            with track_stage("get_or_create_user"):
+                user = await self.get_or_create_user(db, user_id, platform)
+            with track_stage("get_or_create_session"):
+                session = await self.get_or_create_session(db, user, platform)
+        
+        # A new user or session must exist before the write-behind buffer
+        # inserts turns for it in another transaction
+        await db.commit()
+        return user, session, None
+    
     async def get_or_create_user(self, db: AsyncSession, user_id: str, platform: str) -> User:
         """Get existing user or create new one"""
         
@@ -78,8 +271,17 @@ class ConversationHandler:
                 user_data["whatsapp_id"] = user_id
             
             user = User(**user_data)
-            db.add(user)
-            await db.flush()  # Get the ID
+            
+            try:
+                # Savepoint so a concurrent insert of the same sender doesn't abort the transaction
+                async with db.begin_nested():
+                    db.add(user)
+                    await db.flush()  # Get the ID
+            except IntegrityError:
+                result = await db.execute(
+                    select(User).where(PLATFORM_ID_COLUMNS[platform] == user_id)
+                )
+                return result.scalar_one()
             
             logger.info("New user created", user_id=user_id, platform=platform, db_id=str(user.id))
         
@@ -92,8 +294,8 @@ class ConversationHandler:
         result = await db.execute(
             select(GiftSession).where(
                 GiftSession.user_id == user.id,
-                GiftSession.status == "active"
-            ).order_by(GiftSession.created_at.desc())
+                GiftSession.status == SessionStatus.ACTIVE.value
+            ).order_by(GiftSession.created_at.desc()).limit(1)
         )
         
         session = result.scalar_one_or_none()
@@ -104,34 +306,142 @@ class ConversationHandler:
                 user_id=user.id,
                 platform=platform
             )
-            db.add(session)
-            await db.flush()  # Get the ID
+            
+            try:
+                # Savepoint so a session opened concurrently for the same user doesn't abort the transaction
+                async with db.begin_nested():
+                    db.add(session)
+                    await db.flush()  # Get the ID
+            except IntegrityError:
+                result = await db.execute(
+                    select(GiftSession).where(
+                        GiftSession.user_id == user.id,
+                        GiftSession.status == SessionStatus.ACTIVE.value
+                    )
+                )
+                return result.scalar_one()
             
             logger.info("New gift session created", user_id=str(user.id), session_id=str(session.id))
         
         return session
     
-    async def generate_response(self, db: AsyncSession, user: User, session: GiftSession, message: str) -> str:
-        """Generate appropriate response based on conversation state"""
+    async def generate_response(
+        self,
+        user: User,
+        session: GiftSession,
+        message: str,
+        session_context: Optional[Dict],
+        send_early: Optional[SendEarly] = None
+    ) -> str:
+        """Generate appropriate response based on conversation state
+        
+        Runs without a database session; session_context comes from
+        load_session_context() for every turn after the first. When the
+        local extractor explains the whole message, what it found is stored
+        first, whatever the stage.
+        """
+        
+        local = self.apply_local_extraction(session, message) if self.local_nlu_enabled else None
         
         # Determine conversation stage
-        conversation_turns = len(session.conversation_context.get("turns", []))
+        conversation_turns = session.turn_count or 0
         
         # First interaction - greeting and introduction
         if conversation_turns == 0:
             return await self.handle_greeting(user, session, message)
         
         # Early conversation - gather context
-        elif conversation_turns < 3:
-            return await self.handle_context_gathering(user, session, message)
+        if conversation_turns < 3:
+            return await self.handle_context_gathering(user, session, message, session_context, local, send_early)
         
         # Ready for recommendations
         elif self.has_enough_context(session):
-            return await self.handle_recommendation_request(user, session, message)
+            return await self.handle_recommendation_request(user, session, message, session_context, send_early)
         
         # Continue gathering context
         else:
-            return await self.handle_context_gathering(user, session, message)
+            return await self.handle_context_gathering(user, session, message, session_context, local, send_early)
+    
+    def apply_local_extraction(self, session: GiftSession, message: str) -> LocalExtraction:
+        """Store the recipient, name, occasion and budget found in the message without the model
+        
+        Only a confident extraction is stored. A message with more in it,
+        e.g. one mentioning other people or past spending, may use the same
+        words about something else, so it is left to the model.
+        """
+        
+        with track_stage("local_nlu"):
+            local = extract(message)
+        
+        if not local.confident(self.local_nlu_min_coverage):
+            return local
+        
+        if local.insights():
+            session.update_insights(local.insights())
+        if local.recipient_type:
+            session.relationship_type = local.recipient_type
+        if local.recipient_name:
+            session.recipient_name = local.recipient_name
+        if local.occasion:
+            session.occasion = local.occasion
+        if local.budget_hints:
+            session.set_budget(local.budget_min, local.budget_max)
+        
+        return local
+    
+    async def load_session_context(
+        self,
+        db: AsyncSession,
+        session: GiftSession,
+        cached_turns: Optional[List[Dict]] = None
+    ) -> Dict:
+        """Load the last few turns and the session state in the shape AIService expects
+        
+        Turns that have fallen out of the history window since the last
+        message are folded into the rolling summary kept in
+        conversation_context. cached_turns from the context cache are used
+        instead of a query when they are exactly the turns it would return.
+        """
+        
+        context = dict(session.conversation_context or {})
+        summarized_through = context.get("summarized_through", 0)
+        turn_count = session.turn_count or 0
+        window_start = max(0, turn_count - self.history_turns)
+        
+        first_seq = max(summarized_through, turn_count - self.history_turns - SUMMARY_CATCH_UP_TURNS) + 1
+        if cached_turns is not None and [turn["seq"] for turn in cached_turns] == list(range(first_seq, turn_count + 1)):
+            turns = cached_turns
+        else:
+            result = await db.execute(
+                select(ConversationTurn)
+                .where(
+                    ConversationTurn.session_id == session.id,
+                    ConversationTurn.seq > summarized_through
+                )
+                .order_by(ConversationTurn.seq.desc())
+                .limit(self.history_turns + SUMMARY_CATCH_UP_TURNS)
+            )
+            turns = [turn.to_dict() for turn in reversed(result.scalars().all())]
+        
+        evicted = [turn for turn in turns if turn["seq"] <= window_start]
+        if evicted:
+            context["summary"] = update_summary(
+                context.get("summary", ""),
+                evicted,
+                get_token_counter(self.ai_service.model_for("extract_context")),
+                self.summary_max_tokens
+            )
+            context["summarized_through"] = evicted[-1]["seq"]
+            session.merge_json("conversation_context", {
+                "summary": context["summary"],
+                "summarized_through": context["summarized_through"]
+            })
+        
+        return {
+            **context,
+            "turns": [turn for turn in turns if turn["seq"] > window_start],
+            "extracted_insights": session.extracted_insights or {}
+        }
     
     async def handle_greeting(self, user: User, session: GiftSession, message: str) -> str:
         """Handle first interaction with user"""
@@ -149,39 +459,140 @@ class ConversationHandler:
                 f"Who are you shopping for and what's the occasion? 🎁"
             )
     
-    async def handle_context_gathering(self, user: User, session: GiftSession, message: str) -> str:
-        """Gather context about the gift recipient and occasion"""
+    async def handle_context_gathering(
+        self,
+        user: User,
+        session: GiftSession,
+        message: str,
+        session_context: Dict,
+        local: Optional[LocalExtraction] = None,
+        send_early: Optional[SendEarly] = None
+    ) -> str:
+        """Gather context about the gift recipient and occasion
+        
+        When the local extraction explains the whole message, the model is
+        not asked to extract it again: the conversation moves on to
+        recommendations if there is now enough context, and otherwise asks
+        for the most important missing detail.
+        """
+        
+        if local is not None and local.confident(self.local_nlu_min_coverage):
+            if self.has_enough_context(session):
+                LOCAL_NLU_TURNS.labels("recommend").inc()
+                return await self.handle_recommendation_request(user, session, message, session_context, send_early)
+            LOCAL_NLU_TURNS.labels("follow_up").inc()
+            return self.follow_up_question(session)
+        
+        LOCAL_NLU_TURNS.labels("model").inc()
         
         # Use AI to extract context and ask smart follow-up questions
         context_response = await self.ai_service.extract_context_and_respond(
             message=message,
-            session_context=session.conversation_context,
+            session_context=session_context,
             user_preferences=user.preferences
         )
         
-        # Update session with extracted insights
-        if context_response.get("extracted_insights"):
-            session.update_insights(context_response["extracted_insights"])
+        # Update session with extracted insights; nulls would erase what is already known
+        insights = {
+            key: value for key, value in (context_response.get("extracted_insights") or {}).items()
+            if value not in (None, "", [])
+        }
+        if insights:
+            session.update_insights(insights)
+            if session.budget_min is None and session.budget_max is None:
+                budget_min, budget_max = parse_budget_hint(insights.get("budget_hints"))
+                if budget_min is not None or budget_max is not None:
+                    session.set_budget(budget_min, budget_max)
         
         return context_response.get("response", "Could you tell me more about what you're looking for?")
     
-    async def handle_recommendation_request(self, user: User, session: GiftSession, message: str) -> str:
-        """Generate gift recommendations"""
+    def follow_up_question(self, session: GiftSession) -> str:
+        """Ask for the most important piece of gift context still missing"""
+        
+        insights = session.extracted_insights or {}
+        recipient_type = insights.get("recipient_type") or session.relationship_type
+        occasion = insights.get("occasion") or session.occasion
+        recipient = session.recipient_name or (f"your {recipient_type}" if recipient_type else None)
+        
+        if not recipient:
+            return "Lovely! Who are you shopping for? 🎁"
+        if not occasion:
+            return f"Got it, a gift for {recipient}. What's the occasion?"
+        if session.budget_min is None and session.budget_max is None and not insights.get("budget_hints"):
+            return f"A {occasion} gift for {recipient}, great! Do you have a budget in mind? 💰"
+        if not insights.get("interests"):
+            return f"What does {recipient} enjoy? Any hobbies or interests I should know about?"
+        return f"Is there anything else about {recipient} I should keep in mind, like things they already have?"
+    
+    async def handle_recommendation_request(
+        self,
+        user: User,
+        session: GiftSession,
+        message: str,
+        session_context: Dict,
+        send_early: Optional[SendEarly] = None
+    ) -> str:
+        """Generate gift recommendations
+        
+        Fresh recommendations are streamed when send_early is given: the
+        first one is sent on its own as soon as it is parsed, and the reply
+        carries the others.
+        """
+        
+        sent_early: List[Dict] = []
+        started = time.perf_counter()
+        
+        async def send_first(recommendation: Dict):
+            if sent_early:
+                return
+            sent_early.append(recommendation)
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.labels("first_recommendation").observe(elapsed)
+            record_sample("first_recommendation", elapsed)
+            await send_early(f"{FIRST_IDEA_INTRO}\n\n{self.format_recommendation(1, recommendation).rstrip()}")
         
         try:
-            # Generate recommendations using AI
-            recommendations = await self.ai_service.generate_recommendations(
-                session_context=session.conversation_context,
-                extracted_insights=session.extracted_insights,
-                user_preferences=user.preferences,
-                budget_range=(session.budget_min, session.budget_max)
+            # Shared cache entries are keyed on the gift context only, so sessions
+            # with the user's own shipping or values constraints bypass it, and
+            # cached sets are only used when every price fits this budget
+            constraints = HardConstraints.from_context(
+                session.extracted_insights,
+                (session.budget_min, session.budget_max),
+                session.user_constraints,
+                user.values
             )
+            shareable = not constraints.personal
+            
+            # Reuse recommendations for an equivalent gift context when we have them
+            recommendations = None
+            if shareable:
+                recommendations = await self.recommendation_cache.get(
+                    session.extracted_insights, session.budget_min, session.budget_max,
+                    accept=constraints.admits
+                )
+            
+            if recommendations is None:
+                # Generate recommendations using AI
+                recommendations = await self.ai_service.generate_recommendations(
+                    session_context=session_context,
+                    extracted_insights=session.extracted_insights,
+                    user_preferences=user.preferences,
+                    budget_range=(session.budget_min, session.budget_max),
+                    user_constraints=session.user_constraints,
+                    user_values=user.values,
+                    on_recommendation=send_first if send_early is not None else None
+                )
+                
+                if shareable and not recommendations.get("fallback") and not recommendations.get("partial"):
+                    await self.recommendation_cache.set(
+                        session.extracted_insights, session.budget_min, session.budget_max, recommendations
+                    )
             
             # Store recommendations in session
             session.add_recommendations(recommendations.get("recommendations", []))
             
             # Format response
-            return self.format_recommendations_response(recommendations)
+            return self.format_recommendations_response(recommendations, already_sent=len(sent_early))
         
         except Exception as e:
             logger.error("Error generating recommendations", exc_info=e, session_id=str(session.id))
@@ -203,25 +614,41 @@ class ConversationHandler:
             insights.get("budget_hints")
         )
         
-        return has_recipient and has_occasion and len(session.conversation_context.get("turns", [])) >= 2
+        return has_recipient and has_occasion and (session.turn_count or 0) >= 2
     
-    def format_recommendations_response(self, recommendations: dict) -> str:
-        """Format AI recommendations into user-friendly response"""
+    def format_recommendations_response(self, recommendations: dict, already_sent: int = 0) -> str:
+        """Format AI recommendations into user-friendly response
+        
+        The first already_sent recommendations were delivered on their own
+        and are left out; numbering carries on after them.
+        """
         
         if not recommendations.get("recommendations"):
             return "I'm having trouble finding good matches. Could you give me a bit more detail about their interests?"
         
-        response = "Here are some thoughtful gift ideas I found for you:\n\n"
+        remaining = recommendations["recommendations"][already_sent:3]
+        if already_sent and not remaining:
+            return "What do you think of that one? Or would you like me to explore different directions? 🎁"
+        
+        if already_sent:
+            response = "A few more ideas:\n\n"
+        else:
+            response = "Here are some thoughtful gift ideas I found for you:\n\n"
         
-        for i, rec in enumerate(recommendations["recommendations"][:3], 1):
-            response += f"{i}. **{rec.get('name', 'Gift idea')}**\n"
-            response += f"   {rec.get('description', '')}\n"
-            if rec.get('reasoning'):
-                response += f"   💡 Why this works: {rec['reasoning']}\n"
-            if rec.get('estimated_price'):
-                response += f"   💰 Around ${rec['estimated_price']}\n"
-            response += "\n"
+        for i, rec in enumerate(remaining, already_sent + 1):
+            response += self.format_recommendation(i, rec)
         
         response += "Which of these resonates with you? Or would you like me to explore different directions? 🎁"
         
-        return response
\ No newline at end of file
+        return response
+    
+    def format_recommendation(self, number: int, rec: dict) -> str:
+        """One numbered recommendation with its description, reasoning and price"""
+        
+        text = f"{number}. **{rec.get('name', 'Gift idea')}**\n"
+        text += f"   {rec.get('description', '')}\n"
+        if rec.get('reasoning'):
+            text += f"   💡 Why this works: {rec['reasoning']}\n"
+        if rec.get('estimated_price'):
+            text += f"   💰 Around ${rec['estimated_price']}\n"
+        return text + "\n"
\ No newline at end of file
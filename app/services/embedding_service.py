@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import structlog
+from openai import AsyncOpenAI
+
+from app.config import get_settings
+from app.utils.metrics import CACHE_LOOKUPS, observe_ai_call
+
+logger = structlog.get_logger()
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """Deterministic local text embedding using the hashing trick
+
+    Words and their character trigrams are hashed into signed buckets of a
+    fixed-size vector, which is then L2-normalized. There is no model to
+    download and no network call, and the same text always maps to the
+    same vector in every process. Quality is well below a learned model,
+    but related words such as "garden" and "gardening" still overlap.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a (len(texts), dimensions) float32 matrix of unit rows"""
+        return np.vstack([self.embed_one(text) for text in texts]) if texts else np.zeros((0, self.dimensions), np.float32)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+
+        for word in _WORD.findall(text.lower()):
+            self._add(vector, word, 1.0)
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                self._add(vector, padded[i:i + 3], 0.25)
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _add(self, vector: np.ndarray, feature: str, weight: float):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign * weight
+
+
+class EmbeddingStore:
+    """Persistent embedding cache in a SQLite file, keyed on a content hash
+
+    Calls block, so async callers run them in a thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        return self._conn
+
+    # Keys per SELECT, below SQLite's bound-parameter limit
+    CHUNK_SIZE = 500
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        rows = []
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), self.CHUNK_SIZE):
+                chunk = keys[start:start + self.CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+
+    def put_many(self, vectors: Dict[str, np.ndarray]):
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+            )
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class EmbeddingService:
+    """Text embeddings from the OpenAI API, micro-batched and cached
+
+    Concurrent embed() calls are collected for up to
+    embedding_batch_window_ms, or until embedding_batch_size texts are
+    waiting, and sent as one API request. Each text is keyed by a hash of
+    model and content. Vectors are looked up in an in-process LRU, then in
+    the SQLite store, so a text is only embedded once.
+
+    With embedding_provider set to "local", or no OpenAI key configured,
+    the deterministic HashingEmbedder is used instead. API errors are
+    raised rather than answered from the local model, because its vectors
+    are not comparable with the API model's.
+    """
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        settings = get_settings()
+        self.local = settings.embedding_provider == "local" or not (client or settings.openai_api_key)
+        self.local_model = HashingEmbedder(settings.embedding_dimensions)
+        self.client = client or (None if self.local else AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            max_retries=settings.openai_max_retries
+        ))
+        self.model = settings.embedding_model
+        self.dimensions = settings.embedding_dimensions
+        self.batch_size = max(1, settings.embedding_batch_size)
+        self.batch_window = settings.embedding_batch_window_ms / 1000
+        self.timeout = settings.embedding_timeout
+        self.max_entries = settings.embedding_cache_max_entries
+        self.store = EmbeddingStore(settings.embedding_cache_path) if settings.embedding_cache_path else None
+
+        # key -> vector, most recently used last
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Texts waiting for the next batch, and requests already sent, by key
+        self._pending: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+        # Stats
+        self.api_calls = 0
+        self.texts_embedded = 0
+        self.memory_hits = 0
+        self.store_hits = 0
+
+    @property
+    def name(self) -> str:
+        """Identifies the vector space; vectors from different names are not comparable"""
+        return self.local_model.name if self.local else f"{self.model}-{self.dimensions}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a (len(texts), dimensions) float32 matrix of unit rows"""
+        if self.local:
+            return await self.local_model.embed(texts)
+        if not texts:
+            return np.zeros((0, self.dimensions), np.float32)
+
+        keys = [self.key(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+
+        for key in set(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                vectors[key] = vector
+        self.memory_hits += len(vectors)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.store is not None:
+            try:
+                stored = await asyncio.to_thread(self.store.get_many, missing)
+            except Exception as e:
+                logger.warning("Embedding store read failed", exc_info=e)
+                stored = {}
+            self.store_hits += len(stored)
+            for key, vector in stored.items():
+                self._remember(key, vector)
+            vectors.update(stored)
+            missing = [key for key in missing if key not in stored]
+
+        CACHE_LOOKUPS.labels("embeddings", "hit").inc(len(set(keys)) - len(missing))
+        if missing:
+            CACHE_LOOKUPS.labels("embeddings", "miss").inc(len(missing))
+            text_for = dict(zip(keys, texts))
+            # Shielded: the futures are shared with other callers, who must
+            # not be cancelled along with this one
+            results = await asyncio.gather(*(asyncio.shield(self._request(key, text_for[key])) for key in missing))
+            vectors.update(zip(missing, results))
+
+        return np.vstack([vectors[key] for key in keys])
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "api_calls": self.api_calls,
+            "texts_embedded": self.texts_embedded,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "memory_entries": len(self._memory),
+        }
+
+    def _request(self, key: str, text: str) -> asyncio.Future:
+        """Future for a text's vector, joining a pending or in-flight request for the same key"""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.create_future()
+        self._pending[key] = text
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        """Send everything pending, batch_size texts per request"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popitem(last=False))
+            # Keep a reference so the task isn't garbage collected mid-flight
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[tuple]):
+        keys = [key for key, _ in batch]
+        started = time.monotonic()
+
+        try:
+            response = await asyncio.wait_for(
+                self.client.embeddings.create(
+                    model=self.model,
+                    input=[text for _, text in batch],
+                    extra_body={"dimensions": self.dimensions}
+                ),
+                timeout=self.timeout
+            )
+            matrix = np.array(
+                [item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+                dtype=np.float32
+            )
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+        except Exception as e:
+            observe_ai_call("embed", self.model, "error", time.monotonic() - started)
+            logger.warning("Embedding request failed", texts=len(batch), error_type=type(e).__name__)
+            for key in keys:
+                future = self._inflight.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        observe_ai_call("embed", self.model, "success", time.monotonic() - started)
+        self.api_calls += 1
+        self.texts_embedded += len(batch)
+
+        vectors = dict(zip(keys, matrix))
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+            future = self._inflight.pop(key)
+            if not future.done():
+                future.set_result(vector)
+
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.put_many, vectors)
+            except Exception as e:
+                logger.warning("Embedding store write failed", exc_info=e)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.utils.metrics import CACHE_LOOKUPS
+
+logger = structlog.get_logger()
+
+
+class LLMResponseCache:
+    """Exact-match cache of LLM completions
+
+    Keys are a hash of everything that determines the completion (model,
+    messages, temperature, max_tokens). Entries live in an in-process LRU and,
+    when enabled, in Redis so other workers and restarts can reuse them. TTLs
+    are set per AIService operation.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.enabled = settings.llm_cache_enabled
+        self.use_redis = settings.llm_cache_use_redis
+        self.max_entries = settings.llm_cache_max_entries
+        self.prefix = f"{settings.cache_key_prefix}:llm"
+        self.ttls = {
+            "extract_context": settings.llm_cache_extract_ttl,
+            "generate_recommendations": settings.llm_cache_recommend_ttl,
+        }
+        self.default_ttl = settings.llm_cache_extract_ttl
+
+        # key -> (expires_at, content)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+        # Per-operation counters
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """Stable hash of the request parameters"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, operation: str) -> int:
+        return self.ttls.get(operation, self.default_ttl)
+
+    async def get(self, operation: str, key: str) -> Optional[Any]:
+        """Look up a cached completion, checking the local tier before Redis"""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(self.hits, operation)
+                CACHE_LOOKUPS.labels("llm", "hit").inc()
+                return value
+            del self._entries[key]
+
+        value = await self._redis_get(key)
+        if value is not None:
+            # Promote to the local tier
+            self._store_local(key, value, self.ttl_for(operation))
+            self._count(self.hits, operation)
+            CACHE_LOOKUPS.labels("llm", "hit").inc()
+            return value
+
+        self._count(self.misses, operation)
+        CACHE_LOOKUPS.labels("llm", "miss").inc()
+        return None
+
+    async def set(self, operation: str, key: str, value: Any):
+        """Cache a completion for the operation's TTL"""
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_for(operation)
+        self._store_local(key, value, ttl)
+        await self._redis_set(key, value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per operation and local tier size"""
+        return {"entries": len(self._entries), "hits": dict(self.hits), "misses": dict(self.misses)}
+
+    def _store_local(self, key: str, value: Any, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _redis_get(self, key: str) -> Optional[Any]:
+        client = get_redis() if self.use_redis else None
+        if client is None:
+            return None
+
+        try:
+            raw = await client.get(f"{self.prefix}:{key}")
+        except Exception as e:
+            logger.warning("LLM cache read failed", exc_info=e)
+            return None
+
+        return json.loads(raw) if raw else None
+
+    async def _redis_set(self, key: str, value: Any, ttl: int):
+        client = get_redis() if self.use_redis else None
+        if client is None:
+            return
+
+        try:
+            await client.set(f"{self.prefix}:{key}", json.dumps(value, separators=(",", ":")), ex=ttl)
+        except Exception as e:
+            logger.warning("LLM cache write failed", exc_info=e)
+
+    @staticmethod
+    def _count(counter: Dict[str, int], operation: str):
+        counter[operation] = counter.get(operation, 0) + 1
@@ -0,0 +1,222 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.constraint_index import parse_budget_hint
+from app.services.recommendation_cache import price_amounts
+
+# Canonical relationship -> spellings that mean it
+RELATIONSHIPS = {
+    "mom": ("mom", "mother", "mum", "mommy", "mama", "momma"),
+    "dad": ("dad", "father", "daddy", "papa"),
+    "wife": ("wife",),
+    "husband": ("husband",),
+    "girlfriend": ("girlfriend", "gf"),
+    "boyfriend": ("boyfriend", "bf"),
+    "partner": ("partner", "spouse", "fiance", "fiancee", "fiancé", "fiancée"),
+    "sister": ("sister", "sis"),
+    "brother": ("brother",),
+    "grandma": ("grandma", "grandmother", "granny", "nana"),
+    "grandpa": ("grandpa", "grandfather", "granddad", "grandad"),
+    "daughter": ("daughter",),
+    "son": ("son",),
+    "aunt": ("aunt", "auntie"),
+    "uncle": ("uncle",),
+    "niece": ("niece",),
+    "nephew": ("nephew",),
+    "cousin": ("cousin",),
+    "friend": ("best friend", "friend", "bestie", "bff"),
+    "colleague": ("colleague", "coworker", "co-worker"),
+    "boss": ("boss", "manager"),
+    "teacher": ("teacher",),
+    "neighbor": ("neighbor", "neighbour"),
+}
+
+# Canonical occasion -> spellings; labels normalize onto the catalog's
+# occasion tags (see OCCASION_TAG_ALIASES)
+OCCASIONS = {
+    "birthday": ("birthday", "bday", "b-day"),
+    "anniversary": ("wedding anniversary", "anniversary"),
+    "christmas": ("christmas", "xmas"),
+    "valentines day": ("valentine's day", "valentines day", "valentine's", "valentines", "valentine"),
+    "mothers day": ("mother's day", "mothers day"),
+    "fathers day": ("father's day", "fathers day"),
+    "wedding": ("wedding",),
+    "graduation": ("graduation",),
+    "baby shower": ("baby shower",),
+    "housewarming": ("housewarming", "house warming", "new home"),
+    "retirement": ("retirement", "retiring"),
+    "apology": ("apology", "apologize", "apologise", "make it up to"),
+    "thank you": ("thank you gift", "thank-you gift", "as a thank you"),
+    "hanukkah": ("hanukkah", "chanukah"),
+    "get well": ("get well",),
+    "new job": ("new job", "promotion"),
+}
+
+# Words that carry no gift context of their own, ignored when measuring how
+# much of a message the extractor understood
+FILLER_WORDS = frozenset("""
+    a an the and or but so of in on at to for from with about this that it its is are was be
+    i i'm im me my we our you your he she they him her his them their theirs
+    gift gifts present presents something anything idea ideas get buy find looking look want need
+    would like love please hi hey hello ok okay yes yeah just some maybe really very
+    coming up next soon this week month year it's s
+""".split())
+
+_AMOUNT = r"(?<![\w.])\d+(?:,\d{3})*(?:\.\d+)?(?:\s?k\b)?"
+_CURRENCY_WORDS = r"dollars?|bucks|usd|eur(?:os?)?|pounds?|gbp"
+_SINGLE = rf"[$€£]?\s?{_AMOUNT}(?:\s?(?:{_CURRENCY_WORDS})\b)?"
+_BUDGET_SPAN = re.compile(
+    r"(?:\b(?:under|below|less than|max(?:imum)?|up to|no more than|at most|over|above|more than|"
+    r"at least|min(?:imum)?|around|about|roughly|approx(?:imately)?|between)\s+)?"
+    rf"{_SINGLE}(?:\s?(?:-|–|to|and)\s?{_SINGLE})?"
+    r"(?:\s+(?P<tail>max(?:imum)?|tops|or less|at most|min(?:imum)?|or more|and up)\b|(?P<plus>\+))?",
+    re.IGNORECASE
+)
+_UPPER_TAILS = {"max", "maximum", "tops", "or less", "at most"}
+_CURRENCY = re.compile(rf"[$€£]|\b(?:{_CURRENCY_WORDS})\b", re.IGNORECASE)
+_BUDGET_WORDS = re.compile(r"\b(?:budget|spend|spending|price|cost|afford)\b", re.IGNORECASE)
+
+
+def _alternation(spellings: Dict[str, Tuple[str, ...]]) -> Tuple[re.Pattern, Dict[str, str]]:
+    """One case-insensitive pattern over every spelling, longest first, and a spelling -> canonical map"""
+    canonical = {spelling: label for label, options in spellings.items() for spelling in options}
+    options = "|".join(re.escape(spelling) for spelling in sorted(canonical, key=len, reverse=True))
+    return re.compile(rf"\b(?:{options})(?:'s|s')?(?!\w)", re.IGNORECASE), canonical
+
+
+_OCCASION_PATTERN, _OCCASION_CANONICAL = _alternation(OCCASIONS)
+_RELATIONSHIP_PATTERN, _RELATIONSHIP_CANONICAL = _alternation(RELATIONSHIPS)
+
+# "my sister Anna", "my friend named Sam", "her name is Rosa"
+_NAME_AFTER_RELATION = re.compile(r"^(?:'s)?,?\s+(?:(?:named|called)\s+)?([A-Z][a-z]{1,30})\b")
+_NAME_PHRASE = re.compile(r"\b(?:named|called|(?:her|his|their) name is)\s+([A-Z][a-z]{1,30})\b")
+_NOT_NAMES = frozenset("""
+    I Im Monday Tuesday Wednesday Thursday Friday Saturday Sunday January February March April May June
+    July August September October November December Christmas Xmas Valentine Thanks Please Who What
+""".split())
+
+_WORD = re.compile(r"[\w$€£'-]+")
+
+
+@dataclass
+class LocalExtraction:
+    """Gift context pulled out of one message without calling the model"""
+
+    recipient_type: Optional[str] = None
+    recipient_name: Optional[str] = None
+    occasion: Optional[str] = None
+    budget_min: Optional[int] = None
+    budget_max: Optional[int] = None
+    budget_hints: Optional[str] = None
+    # Share of the message's content words explained by the fields above
+    coverage: float = 0.0
+    # Several different relationships were mentioned, so the recipient is unclear
+    ambiguous: bool = False
+
+    @property
+    def found(self) -> bool:
+        return any((self.recipient_type, self.recipient_name, self.occasion, self.budget_hints))
+
+    def confident(self, min_coverage: float) -> bool:
+        """Whether the message needs no further interpretation by the model"""
+        return self.found and not self.ambiguous and self.coverage >= min_coverage
+
+    def insights(self) -> Dict[str, Any]:
+        """The found fields in the shape of the model's extracted_insights"""
+        insights = {
+            "recipient_type": self.recipient_type,
+            "occasion": self.occasion,
+            "budget_hints": self.budget_hints,
+        }
+        return {key: value for key, value in insights.items() if value}
+
+
+def extract(message: str) -> LocalExtraction:
+    """Recipient, name, occasion and budget from dictionaries and regular expressions
+
+    Occasions are matched before relationships, so "mother's day" is not
+    read as a mention of a mother. A budget needs a currency marker, or a
+    word like "budget" or "spend" just before the number, so ages and
+    dates aren't taken for prices.
+    """
+    result = LocalExtraction()
+    spans: List[Tuple[int, int]] = []
+
+    def unclaimed(match: re.Match) -> bool:
+        return not any(start < match.end() and match.start() < end for start, end in spans)
+
+    for match in _OCCASION_PATTERN.finditer(message):
+        result.occasion = result.occasion or _OCCASION_CANONICAL[_spelling(match.group())]
+        spans.append(match.span())
+
+    relationships = set()
+    for match in _RELATIONSHIP_PATTERN.finditer(message):
+        if not unclaimed(match):
+            continue
+        relationships.add(_RELATIONSHIP_CANONICAL[_spelling(match.group())])
+        spans.append(match.span())
+        name = _NAME_AFTER_RELATION.match(message[match.end():])
+        if name and name.group(1) not in _NOT_NAMES and not result.recipient_name:
+            result.recipient_name = name.group(1)
+            spans.append((match.end() + name.start(1), match.end() + name.end(1)))
+    if len(relationships) == 1:
+        result.recipient_type = relationships.pop()
+    elif relationships:
+        result.ambiguous = True
+
+    if not result.recipient_name:
+        name = _NAME_PHRASE.search(message)
+        if name and name.group(1) not in _NOT_NAMES:
+            result.recipient_name = name.group(1)
+            spans.append(name.span())
+
+    for match in _BUDGET_SPAN.finditer(message):
+        if not unclaimed(match):
+            continue
+        # Without a currency, only a number just after "budget", "spend", ...
+        if not _CURRENCY.search(match.group()) and not _BUDGET_WORDS.search(message, max(0, match.start() - 20), match.start()):
+            continue
+        budget_min, budget_max = _budget_range(match)
+        if budget_min is None and budget_max is None:
+            continue
+        result.budget_hints = match.group().strip()
+        result.budget_min = round(budget_min) if budget_min is not None else None
+        result.budget_max = round(budget_max) if budget_max is not None else None
+        spans.append(match.span())
+        break
+
+    result.coverage = _coverage(message, spans)
+    return result
+
+
+def _budget_range(match: re.Match) -> Tuple[Optional[float], Optional[float]]:
+    """Price range of a budget span, including trailing "max" or "+" qualifiers"""
+    amounts = price_amounts(match.group())
+    tail = (match.group("tail") or "").lower()
+    if len(amounts) == 1 and tail in _UPPER_TAILS:
+        return None, amounts[0]
+    if len(amounts) == 1 and (tail or match.group("plus")):
+        return amounts[0], None
+    return parse_budget_hint(match.group())
+
+
+def _spelling(matched: str) -> str:
+    """Dictionary spelling of a match, without a trailing possessive"""
+    text = matched.lower()
+    for suffix in ("'s", "s'"):
+        if text.endswith(suffix) and text[:-len(suffix)] in _OCCASION_CANONICAL.keys() | _RELATIONSHIP_CANONICAL.keys():
+            return text[:-len(suffix)]
+    return text
+
+
+def _coverage(message: str, spans: List[Tuple[int, int]]) -> float:
+    """Share of the content words in the message that fall inside a matched span"""
+    content = covered = 0
+    for word in _WORD.finditer(message):
+        inside = any(start <= word.start() < end for start, end in spans)
+        if not inside and word.group().lower().strip("'") in FILLER_WORDS:
+            continue
+        content += 1
+        covered += inside
+    return covered / content if content else 0.0
@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import structlog
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.utils.metrics import DUPLICATE_MESSAGES
+
+logger = structlog.get_logger()
+
+
+class MessageDeduplicator:
+    """Remembers Instagram message IDs so redelivered webhooks are dropped
+
+    IDs are kept in a bounded in-process LRU and, when enabled, claimed in
+    Redis with SET NX so redeliveries that land on another worker are caught
+    too. Redis errors fall back to the local tier rather than dropping
+    messages.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.enabled = settings.dedup_enabled
+        self.use_redis = settings.dedup_use_redis
+        self.max_entries = settings.dedup_max_entries
+        self.ttl = settings.dedup_ttl
+        self.prefix = f"{settings.cache_key_prefix}:mid"
+
+        # mid -> expires_at
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+        # Stats
+        self.suppressed: Dict[str, int] = {"local": 0, "redis": 0}
+        self.errors = 0
+
+    async def claim(self, mid: Optional[str]) -> bool:
+        """Record a message ID, returning False when it was already seen
+
+        Events without an ID are always processed.
+        """
+        if not self.enabled or not mid:
+            return True
+
+        now = time.monotonic()
+        expires_at = self._seen.get(mid)
+        if expires_at is not None and expires_at > now:
+            self._suppress("local")
+            return False
+
+        self._remember(mid, now)
+
+        client = get_redis() if self.use_redis else None
+        if client is None:
+            return True
+
+        try:
+            claimed = await client.set(f"{self.prefix}:{mid}", 1, nx=True, ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Message dedup lookup failed", exc_info=e)
+            return True
+
+        if not claimed:
+            self._suppress("redis")
+            return False
+
+        return True
+
+    async def release(self, mid: Optional[str]):
+        """Forget a message ID, e.g. when its event was rejected and will be redelivered"""
+        if not self.enabled or not mid:
+            return
+
+        self._seen.pop(mid, None)
+
+        client = get_redis() if self.use_redis else None
+        if client is None:
+            return
+
+        try:
+            await client.delete(f"{self.prefix}:{mid}")
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Message dedup release failed", exc_info=e)
+
+    def stats(self) -> Dict[str, int]:
+        """Suppressed duplicates per tier and local tier size"""
+        return {
+            "entries": len(self._seen),
+            "suppressed_local": self.suppressed["local"],
+            "suppressed_redis": self.suppressed["redis"],
+            "errors": self.errors,
+        }
+
+    def _remember(self, mid: str, now: float):
+        self._seen[mid] = now + self.ttl
+        self._seen.move_to_end(mid)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def _suppress(self, tier: str):
+        self.suppressed[tier] += 1
+        DUPLICATE_MESSAGES.labels(tier).inc()
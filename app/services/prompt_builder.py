@@ -0,0 +1,161 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import structlog
+import tiktoken
+
+logger = structlog.get_logger()
+
+# Roughly four characters per token for English text, used when no encoding is available
+APPROX_CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TokenCounter:
+    """Counts and truncates text in model tokens
+
+    Uses the model's tiktoken encoding. If the encoding cannot be loaded
+    (tiktoken downloads it on first use, which fails offline), falls back to
+    a character-based estimate so prompt assembly keeps working.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = self._load("cl100k_base")
+        except Exception as e:
+            logger.warning("tiktoken encoding unavailable, estimating token counts", model=model, error=str(e))
+            self.encoding = None
+
+    @staticmethod
+    def _load(name: str):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception as e:
+            logger.warning("tiktoken encoding unavailable, estimating token counts", encoding=name, error=str(e))
+            return None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is None:
+            return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, marking the cut with an ellipsis"""
+        if max_tokens <= 0 or not text:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        if self.encoding is None:
+            return text[:max(0, max_tokens * APPROX_CHARS_PER_TOKEN - 1)].rstrip() + "…"
+
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max(0, max_tokens - 1)]).rstrip() + "…"
+
+
+@lru_cache(maxsize=16)
+def get_token_counter(model: str) -> TokenCounter:
+    """Shared token counter per model (loading an encoding is expensive)"""
+    return TokenCounter(model)
+
+
+class PromptBuilder:
+    """Assembles prompt sections within a fixed input-token budget
+
+    Fixed parts (system prompt, template) are reserved first. Each variable
+    section is then fitted into what remains, in the caller's priority order,
+    and truncated if needed. The prompt can never exceed the budget, however
+    long the session runs.
+    """
+
+    def __init__(self, model: str, budget: int):
+        self.counter = get_token_counter(model)
+        self.budget = budget
+        self.used = 0
+        self.sections: Dict[str, int] = {}
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.budget - self.used)
+
+    def reserve(self, name: str, text: str) -> str:
+        """Charge a section that must be sent in full"""
+        tokens = self.counter.count(text)
+        self.used += tokens
+        self.sections[name] = tokens
+        return text
+
+    def fit(self, name: str, text: str, max_tokens: Optional[int] = None) -> str:
+        """Fit a section into the remaining budget, truncating it if needed"""
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        fitted = self.counter.truncate(text, limit)
+        tokens = self.counter.count(fitted)
+        self.used += tokens
+        self.sections[name] = tokens
+        return fitted
+
+    def fit_turns(self, name: str, turns: List[Dict], max_tokens: Optional[int] = None, per_turn_tokens: int = 200) -> str:
+        """Fit as many of the most recent turns as the budget allows, oldest first in the output"""
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        lines: List[str] = []
+        used = 0
+
+        for turn in reversed(turns):
+            text = "\n".join([
+                f"User: {self.counter.truncate(turn.get('user_message', ''), per_turn_tokens)}",
+                f"Assistant: {self.counter.truncate(turn.get('bot_response', ''), per_turn_tokens)}",
+            ])
+            tokens = self.counter.count(text)
+            if used + tokens > limit:
+                break
+            lines.insert(0, text)
+            used += tokens
+
+        self.used += used
+        self.sections[name] = used
+        return "\n".join(lines)
+
+    def report(self) -> Dict[str, int]:
+        """Tokens used per section, for logging"""
+        return {**self.sections, "total": self.used, "budget": self.budget}
+
+
+def compact_insights(insights: Dict) -> str:
+    """Render only the populated insight fields, one per line"""
+    lines = []
+    for key, value in (insights or {}).items():
+        if value in (None, "", [], {}):
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value)
+        lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+def update_summary(summary: str, turns: List[Dict], counter: TokenCounter, max_tokens: int) -> str:
+    """Fold turns that left the history window into a rolling summary
+
+    The summary is extractive, with no extra LLM call: the first sentence of
+    each evicted user message is appended. When the summary exceeds
+    max_tokens, its oldest lines are dropped.
+    """
+    lines = [line for line in (summary or "").split("\n") if line]
+
+    for turn in turns:
+        message = " ".join((turn.get("user_message") or "").split())
+        if not message:
+            continue
+        first_sentence = _SENTENCE_END.split(message, maxsplit=1)[0]
+        lines.append(f"- User said: {counter.truncate(first_sentence, 60)}")
+
+    while lines and counter.count("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+
+    return "\n".join(lines)
@@ -0,0 +1,293 @@
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.utils.metrics import CACHE_LOOKUPS
+
+logger = structlog.get_logger()
+
+# Budget bands as (upper bound, label); the last band is open-ended
+BUDGET_BANDS = [
+    (25, "under_25"),
+    (50, "25_50"),
+    (100, "50_100"),
+    (200, "100_200"),
+    (500, "200_500"),
+    (None, "500_plus"),
+]
+
+# Common spellings folded onto one canonical value
+RECIPIENT_ALIASES = {
+    "mother": "mom", "mum": "mom", "mommy": "mom", "mama": "mom",
+    "father": "dad", "daddy": "dad", "papa": "dad",
+    "husband": "partner", "wife": "partner", "boyfriend": "partner", "girlfriend": "partner",
+    "spouse": "partner", "fiance": "partner", "fiancee": "partner",
+    "coworker": "colleague", "co-worker": "colleague",
+    "best friend": "friend", "bff": "friend",
+}
+OCCASION_ALIASES = {
+    "bday": "birthday", "b-day": "birthday",
+    "xmas": "christmas",
+    "wedding anniversary": "anniversary",
+    "sorry": "apology",
+    "thanks": "thank_you", "thank you": "thank_you",
+}
+
+_PRICE_PATTERN = re.compile(r"\$?\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(k\b)?", re.IGNORECASE)
+
+
+def normalize_label(value: Any, aliases: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Lowercase, whitespace-collapsed label with possessives dropped and aliases applied"""
+    if not value or not isinstance(value, str):
+        return None
+    text = " ".join(value.lower().replace("'s", "").split())
+    if aliases:
+        text = aliases.get(text, text)
+    return text or None
+
+
+def price_amounts(text: str) -> List[float]:
+    """Dollar amounts mentioned in free text, with "k" read as thousands"""
+    amounts = []
+    for number, thousands in _PRICE_PATTERN.findall(text):
+        amount = float(number.replace(",", ""))
+        amounts.append(amount * 1000 if thousands else amount)
+    return amounts
+
+
+def budget_band(budget_min: Optional[int], budget_max: Optional[int], budget_hints: Optional[str] = None) -> str:
+    """Map an explicit budget, or prices mentioned in free text, onto a coarse band"""
+
+    if budget_min is None and budget_max is None and isinstance(budget_hints, str):
+        amounts = price_amounts(budget_hints)
+        if amounts:
+            budget_min, budget_max = min(amounts), max(amounts)
+
+    if budget_min is None and budget_max is None:
+        return "unknown"
+
+    # Band on the top of the range, which is what constrains the gift
+    reference = budget_max if budget_max is not None else budget_min
+    for upper, label in BUDGET_BANDS:
+        if upper is None or reference <= upper:
+            return label
+    return BUDGET_BANDS[-1][1]
+
+
+def canonical_gift_context(
+    extracted_insights: Dict,
+    budget_min: Optional[int] = None,
+    budget_max: Optional[int] = None
+) -> Dict[str, Any]:
+    """Reduce extracted insights to the fields that determine a recommendation set"""
+
+    insights = extracted_insights or {}
+    interests = insights.get("interests") or []
+    if isinstance(interests, str):
+        interests = [interests]
+
+    return {
+        "recipient_type": normalize_label(insights.get("recipient_type"), RECIPIENT_ALIASES),
+        "occasion": normalize_label(insights.get("occasion"), OCCASION_ALIASES),
+        "interests": sorted({i for i in (normalize_label(x) for x in interests) if i}),
+        "budget_band": budget_band(budget_min, budget_max, insights.get("budget_hints")),
+        "emotional_context": normalize_label(insights.get("emotional_context")),
+    }
+
+
+def jaccard(a: List[str], b: List[str]) -> float:
+    """Overlap between two interest sets"""
+    set_a, set_b = set(a), set(b)
+    if not set_a and not set_b:
+        return 1.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+class RecommendationCache:
+    """Cache of recommendation sets keyed on a canonical gift context
+
+    Contexts with the same recipient, occasion, budget band and emotional
+    context share a bucket. Within a bucket, a lookup matches the entry whose
+    interests are most similar (Jaccard), provided the similarity clears the
+    configured threshold, so close contexts can reuse a recommendation set.
+    Entries live in-process and, when enabled, in Redis (one hash per bucket).
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.enabled = settings.recommendation_cache_enabled
+        self.use_redis = settings.recommendation_cache_use_redis
+        self.ttl = settings.recommendation_cache_ttl
+        self.min_similarity = settings.recommendation_cache_min_similarity
+        self.max_buckets = settings.recommendation_cache_max_buckets
+        self.prefix = f"{settings.cache_key_prefix}:recs"
+
+        # bucket key -> {interest signature: entry}
+        self._buckets: "OrderedDict[str, Dict[str, Dict]]" = OrderedDict()
+
+        # Per-bucket hit rates and freshness
+        self.key_stats: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def bucket_key(context: Dict[str, Any]) -> str:
+        return "|".join(
+            context.get(field) or "-"
+            for field in ("recipient_type", "occasion", "budget_band", "emotional_context")
+        )
+
+    @staticmethod
+    def cacheable(context: Dict[str, Any]) -> bool:
+        """Only cache once the basic gift context is known"""
+        return bool(context.get("recipient_type") and context.get("occasion"))
+
+    async def get(
+        self,
+        extracted_insights: Dict,
+        budget_min: Optional[int] = None,
+        budget_max: Optional[int] = None,
+        accept: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached recommendation set for this or a near-identical context
+
+        Buckets only use a coarse budget band, so callers pass accept to
+        rule out sets that break the session's exact constraints.
+        """
+
+        context = canonical_gift_context(extracted_insights, budget_min, budget_max)
+        if not self.enabled or not self.cacheable(context):
+            return None
+
+        key = self.bucket_key(context)
+        entries = self._buckets.get(key)
+        if entries is None:
+            entries = await self._redis_load(key)
+            if entries:
+                self._remember_bucket(key, entries)
+
+        match, similarity = self._best_match(entries or {}, context["interests"], accept)
+        stats = self._stats_for(key)
+
+        if match is None:
+            stats["misses"] += 1
+            CACHE_LOOKUPS.labels("recommendations", "miss").inc()
+            return None
+
+        stats["hits"] += 1
+        CACHE_LOOKUPS.labels("recommendations", "hit").inc()
+        stats["last_hit_at"] = time.time()
+        self._buckets.move_to_end(key)
+
+        logger.info(
+            "Recommendation cache hit",
+            bucket=key,
+            similarity=round(similarity, 2),
+            age_seconds=round(time.time() - match["stored_at"])
+        )
+        return match["result"]
+
+    async def set(
+        self,
+        extracted_insights: Dict,
+        budget_min: Optional[int],
+        budget_max: Optional[int],
+        result: Dict[str, Any]
+    ):
+        """Store a freshly generated recommendation set"""
+
+        context = canonical_gift_context(extracted_insights, budget_min, budget_max)
+        if not self.enabled or not self.cacheable(context):
+            return
+
+        key = self.bucket_key(context)
+        signature = ",".join(context["interests"])
+        entry = {"interests": context["interests"], "result": result, "stored_at": time.time()}
+
+        entries = self._buckets.get(key, {})
+        entries[signature] = entry
+        self._remember_bucket(key, entries)
+
+        stats = self._stats_for(key)
+        stats["stored_at"] = entry["stored_at"]
+
+        await self._redis_store(key, signature, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and freshness per bucket"""
+        now = time.time()
+        report = {}
+        for key, stats in self.key_stats.items():
+            lookups = stats["hits"] + stats["misses"]
+            report[key] = {
+                **stats,
+                "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+                "age_seconds": round(now - stats["stored_at"]) if stats["stored_at"] else None,
+            }
+        return report
+
+    def _stats_for(self, key: str) -> Dict[str, Any]:
+        if key not in self.key_stats:
+            # Bounded like the buckets; drop the oldest tracked key
+            if len(self.key_stats) >= self.max_buckets:
+                self.key_stats.pop(next(iter(self.key_stats)))
+            self.key_stats[key] = {"hits": 0, "misses": 0, "stored_at": None, "last_hit_at": None}
+        return self.key_stats[key]
+
+    def _best_match(
+        self,
+        entries: Dict[str, Dict],
+        interests: List[str],
+        accept: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Tuple[Optional[Dict], float]:
+        """Most similar fresh, acceptable entry above the similarity threshold"""
+        now = time.time()
+        best, best_score = None, 0.0
+
+        for signature, entry in list(entries.items()):
+            if now - entry["stored_at"] > self.ttl:
+                del entries[signature]
+                continue
+            score = jaccard(entry["interests"], interests)
+            if score < self.min_similarity or score <= best_score:
+                continue
+            if accept is None or accept(entry["result"]):
+                best, best_score = entry, score
+
+        return best, best_score
+
+    def _remember_bucket(self, key: str, entries: Dict[str, Dict]):
+        self._buckets[key] = entries
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+
+    async def _redis_load(self, key: str) -> Dict[str, Dict]:
+        client = get_redis() if self.use_redis else None
+        if client is None:
+            return {}
+
+        try:
+            raw = await client.hgetall(f"{self.prefix}:{key}")
+        except Exception as e:
+            logger.warning("Recommendation cache read failed", exc_info=e)
+            return {}
+
+        return {signature: json.loads(value) for signature, value in raw.items()}
+
+    async def _redis_store(self, key: str, signature: str, entry: Dict):
+        client = get_redis() if self.use_redis else None
+        if client is None:
+            return
+
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hset(f"{self.prefix}:{key}", signature, json.dumps(entry, separators=(",", ":")))
+                pipe.expire(f"{self.prefix}:{key}", self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Recommendation cache write failed", exc_info=e)
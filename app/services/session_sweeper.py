@@ -0,0 +1,115 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+import structlog
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import get_settings
+from app.models import GiftSession
+from app.models.gift_session import SessionStatus
+from app.utils.metrics import SESSIONS_ABANDONED
+
+logger = structlog.get_logger()
+
+
+class SessionSweeper:
+    """Background task that abandons sessions left idle
+
+    Every session_sweep_interval seconds, active sessions with no activity
+    (updated_at, else created_at) for session_idle_timeout seconds are
+    marked abandoned. Each batch of up to session_sweep_batch_size rows is
+    one UPDATE in its own transaction, so row locks stay short. Rows are
+    claimed with FOR UPDATE SKIP LOCKED, so sweepers on several instances
+    split the work instead of waiting on each other. A message that
+    arrives afterwards starts a fresh session.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], AsyncSession]] = None):
+        settings = get_settings()
+        self.enabled = settings.session_sweep_enabled
+        self.idle_timeout = settings.session_idle_timeout
+        self.interval = settings.session_sweep_interval
+        self.batch_size = max(1, settings.session_sweep_batch_size)
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+
+        # Stats
+        self.runs = 0
+        self.abandoned = 0
+        self.errors = 0
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the loop; an interrupted batch is rolled back"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sweep(self, now: Optional[datetime] = None) -> int:
+        """Abandon every session idle since before now - idle_timeout, returning how many"""
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=self.idle_timeout)
+        factory = self._session_factory or database.async_session
+        total = 0
+
+        while True:
+            async with factory() as db:
+                result = await db.execute(self._abandon_statement(cutoff))
+                await db.commit()
+            count = result.rowcount or 0
+            total += count
+            if count < self.batch_size:
+                break
+
+        self.runs += 1
+        self.abandoned += total
+        if total:
+            SESSIONS_ABANDONED.inc(total)
+            logger.info("Idle sessions abandoned", count=total, cutoff=cutoff.isoformat())
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        return {"runs": self.runs, "abandoned": self.abandoned, "errors": self.errors}
+
+    def _abandon_statement(self, cutoff: datetime):
+        sessions = GiftSession.__table__
+        active = sessions.c.status == SessionStatus.ACTIVE.value
+        idle = func.coalesce(sessions.c.updated_at, sessions.c.created_at) < cutoff
+
+        batch = (
+            select(sessions.c.id)
+            .where(active, idle)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        # Conditions repeated so a session touched since the batch was chosen is left alone
+        return (
+            update(sessions)
+            .where(sessions.c.id.in_(batch), active, idle)
+            .values(status=SessionStatus.ABANDONED.value, completed_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _run(self):
+        while True:
+            # Jitter keeps instances started together from sweeping in lockstep
+            await asyncio.sleep(self.interval * random.uniform(0.9, 1.1))
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                logger.error("Session sweep failed", exc_info=e)
+
+
+session_sweeper = SessionSweeper()
@@ -0,0 +1,236 @@
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import bindparam, inspect, insert, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql.elements import ClauseElement
+
+from app import database
+from app.config import get_settings
+from app.utils.metrics import track_stage
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class _Write:
+    """Rows captured from one submit() call"""
+
+    # table -> rows to insert
+    inserts: Dict[Any, List[Dict[str, Any]]]
+    # (table, primary key, changed column values)
+    updates: List[Tuple[Any, Dict[str, Any], Dict[str, Any]]]
+    future: asyncio.Future
+
+
+def capture(obj: Any) -> Tuple[str, Dict[str, Any]]:
+    """The INSERT row or UPDATE values for a mapped object, then mark it clean
+
+    New objects become an INSERT of their set columns. Objects already in
+    the database become an UPDATE of the columns changed since they were
+    loaded, using the server-side expressions (JSON merges, counter
+    increments) staged by JSONDocumentMixin where there are any. Afterwards the object looks as
+    if it had been flushed and committed.
+    """
+    state = inspect(obj)
+    columns = state.mapper.column_attrs
+
+    if not state.has_identity:
+        row = {attr.key: state.dict[attr.key] for attr in columns if attr.key in state.dict}
+        make_transient_to_detached(obj)
+        return "insert", row
+
+    staged = obj.__dict__.pop("_json_pending", {})
+    values = {}
+    for attr in columns:
+        key = attr.key
+        if not state.attrs[key].history.has_changes():
+            continue
+        value = state.dict.get(key)
+        values[key] = staged[key][0] if key in staged and staged[key][1] is value else value
+        set_committed_value(obj, key, value)
+    return "update", values
+
+
+class WriteBehindBuffer:
+    """Group commit of ORM changes made outside a database session
+
+    submit() captures the rows to insert and the columns to update from
+    the given objects, then waits until they are committed. Submissions
+    arriving within write_batch_window_ms of each other, up to
+    write_batch_max_records, are written in one transaction: inserts as
+    multi-row INSERTs, and updates with the same columns as one
+    executemany. A connection is only taken for the flush itself.
+
+    A reply should only go out after submit() returns. If a batch fails,
+    its submissions are retried one transaction each, so a bad record
+    fails only its own caller. stop() flushes whatever is pending.
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine] = None):
+        settings = get_settings()
+        self.window = settings.write_batch_window_ms / 1000
+        self.max_records = max(1, settings.write_batch_max_records)
+        self._engine = engine
+
+        self._pending: List[_Write] = []
+        self._pending_records = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self._running = False
+
+        # Stats
+        self.batches = 0
+        self.records = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def start(self):
+        self._running = True
+
+    async def stop(self):
+        """Write everything pending and wait for in-flight batches"""
+        self._running = False
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, *objects: Any):
+        """Queue the objects' changes and return once they are committed
+
+        Raises RuntimeError when the buffer isn't running, or the database
+        error if the write fails.
+        """
+        if not self._running:
+            raise RuntimeError("Write-behind buffer is not running")
+
+        inserts: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        updates = []
+        for obj in objects:
+            table = inspect(obj).mapper.local_table
+            kind, values = capture(obj)
+            if kind == "insert":
+                inserts[table].append(values)
+            elif values:
+                identity = {column.key: getattr(obj, column.key) for column in table.primary_key}
+                updates.append((table, identity, values))
+
+        records = sum(len(rows) for rows in inserts.values()) + len(updates)
+        if not records:
+            return
+
+        write = _Write(inserts, updates, asyncio.get_running_loop().create_future())
+        self._pending.append(write)
+        self._pending_records += records
+
+        if self._pending_records >= self.max_records:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        await write.future
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "records": self.records,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch, self._pending, self._pending_records = self._pending, [], 0
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.create_task(self._write(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, batch: List[_Write]):
+        try:
+            with track_stage("write_batch"):
+                await self._commit(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+            logger.warning("Write batch failed, retrying individually", submissions=len(batch), exc_info=e)
+            for write in batch:
+                self.retried += 1
+                try:
+                    await self._commit([write])
+                except Exception as e:
+                    self._fail(write, e)
+                else:
+                    self._done([write])
+            return
+        self._done(batch)
+
+    async def _commit(self, batch: List[_Write]):
+        engine = self._engine or database.engine
+        async with engine.begin() as conn:
+            await self._execute_updates(conn, [item for write in batch for item in write.updates])
+
+            rows_by_table: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+            for write in batch:
+                for table, rows in write.inserts.items():
+                    rows_by_table[table].extend(rows)
+            for table, rows in rows_by_table.items():
+                for group in _group_by_keys(rows).values():
+                    # One multi-row INSERT ... VALUES (...), (...) per column set
+                    await conn.execute(insert(table).values(group))
+
+    async def _execute_updates(self, conn: AsyncConnection, updates: List[Tuple[Any, Dict, Dict]]):
+        # Updates with plain values and the same columns share one executemany;
+        # those with SQL expressions (JSON merges) are executed one by one
+        groups: Dict[Tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for table, identity, values in updates:
+            if any(isinstance(value, ClauseElement) for value in values.values()):
+                where = [table.c[key] == value for key, value in identity.items()]
+                await conn.execute(update(table).where(*where).values(values))
+                continue
+            params = {f"pk_{key}": value for key, value in identity.items()}
+            params.update({f"v_{key}": value for key, value in values.items()})
+            groups[(table, tuple(identity), tuple(values))].append(params)
+
+        for (table, identity_keys, value_keys), params in groups.items():
+            statement = (
+                update(table)
+                .where(*[table.c[key] == bindparam(f"pk_{key}") for key in identity_keys])
+                .values({key: bindparam(f"v_{key}", type_=table.c[key].type) for key in value_keys})
+            )
+            await conn.execute(statement, params)
+
+    def _done(self, batch: List[_Write]):
+        self.batches += 1
+        for write in batch:
+            self.records += sum(len(rows) for rows in write.inserts.values()) + len(write.updates)
+            if not write.future.done():
+                write.future.set_result(None)
+
+    def _fail(self, write: _Write, error: Exception):
+        self.failed += 1
+        logger.error("Write-behind submission failed", exc_info=error)
+        if not write.future.done():
+            write.future.set_exception(error)
+
+
+def _group_by_keys(rows: List[Dict[str, Any]]) -> Dict[Tuple[str, ...], List[Dict[str, Any]]]:
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        groups[tuple(sorted(row))].append(row)
+    return groups
+
+
+write_buffer = WriteBehindBuffer()
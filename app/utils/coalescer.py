@@ -0,0 +1,148 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+
+from app.utils.metrics import COALESCED_MESSAGES
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class _Burst:
+    """Items buffered for one key, waiting for the window to close"""
+
+    items: List[Any] = field(default_factory=list)
+    first_at: float = 0.0
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MessageCoalescer:
+    """Debounces bursts of items per key into one merged item
+
+    An item is held until no further item for its key has arrived for
+    window seconds, then everything buffered for that key is merged and
+    handed to the sink. A burst is flushed early once it reaches
+    max_items or has been waiting max_wait seconds, so a steady stream
+    still gets answered. Bursts for different keys are independent.
+
+    The sink is called synchronously and may raise asyncio.QueueFull, in
+    which case the burst stays buffered and is retried a window later.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sink: Callable[[str, Any], None],
+        merge: Callable[[List[Any]], Any],
+        window: float = 1.5,
+        max_wait: float = 5.0,
+        max_items: int = 10,
+        max_keys: int = 1000
+    ):
+        self.name = name
+        self.sink = sink
+        self.merge = merge
+        self.window = window
+        self.max_wait = max(window, max_wait)
+        self.max_items = max(1, max_items)
+        self.max_keys = max(1, max_keys)
+
+        self._bursts: Dict[str, _Burst] = {}
+        self._running = False
+
+        # Stats
+        self.received = 0
+        self.flushed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def pending(self) -> int:
+        """Number of keys with a burst waiting to be flushed"""
+        return len(self._bursts)
+
+    async def start(self):
+        self._running = True
+        logger.info("Message coalescer started", coalescer=self.name, window=self.window, max_wait=self.max_wait)
+
+    async def stop(self):
+        """Flush every pending burst to the sink and stop accepting items"""
+        self._running = False
+        for key in list(self._bursts):
+            self._flush(key, retry=False)
+
+        logger.info("Message coalescer stopped", coalescer=self.name, flushed=self.flushed)
+
+    def add(self, key: str, item: Any):
+        """Buffer an item for its key
+
+        Raises RuntimeError if the coalescer is not running and
+        asyncio.QueueFull if max_keys bursts are already pending.
+        """
+        if not self._running:
+            raise RuntimeError(f"Message coalescer {self.name} is not running")
+
+        burst = self._bursts.get(key)
+        if burst is None:
+            if len(self._bursts) >= self.max_keys:
+                self.rejected += 1
+                raise asyncio.QueueFull()
+            burst = self._bursts[key] = _Burst(first_at=time.monotonic())
+
+        burst.items.append(item)
+        self.received += 1
+
+        if len(burst.items) >= self.max_items:
+            self._flush(key)
+            return
+
+        # Debounce: push the deadline back, but never past first_at + max_wait
+        delay = min(self.window, burst.first_at + self.max_wait - time.monotonic())
+        self._schedule(key, burst, delay)
+
+    def flush(self, key: str):
+        """Hand the key's pending burst to the sink now, e.g. before an item that can't be merged"""
+        if key in self._bursts:
+            self._flush(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "received": self.received,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+        }
+
+    def _schedule(self, key: str, burst: _Burst, delay: float):
+        if burst.timer is not None:
+            burst.timer.cancel()
+        burst.timer = asyncio.get_running_loop().call_later(max(0.0, delay), self._flush, key)
+
+    def _flush(self, key: str, retry: bool = True):
+        burst = self._bursts.get(key)
+        if burst is None:
+            return
+        if burst.timer is not None:
+            burst.timer.cancel()
+            burst.timer = None
+
+        try:
+            self.sink(key, self.merge(burst.items))
+        except (asyncio.QueueFull, RuntimeError) as e:
+            if retry and self._running:
+                logger.warning("Coalesced burst not accepted, retrying", coalescer=self.name, items=len(burst.items))
+                self._schedule(key, burst, self.window)
+            else:
+                del self._bursts[key]
+                logger.error("Coalesced burst dropped", coalescer=self.name, items=len(burst.items), exc_info=e)
+            return
+
+        del self._bursts[key]
+        self.flushed += 1
+        COALESCED_MESSAGES.labels(self.name).inc(len(burst.items) - 1)
@@ -0,0 +1,79 @@
+import json
+from typing import Any, List, Optional
+
+
+class JSONArrayStream:
+    """Yields the elements of one array in a JSON document as it streams in
+
+    Feed the document in arbitrary chunks. The objects in the array under
+    key in the top-level object are returned by feed() as soon as each
+    one's closing brace arrives, so earlier elements survive a document
+    that is cut short or goes bad later on. Scalar elements and anything
+    outside that array are skipped; the caller can still parse the whole
+    text once it is complete.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+        # Scanner state
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string: List[str] = []
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._in_array = False
+        # Characters of the element being read, None between elements
+        self._element: Optional[List[str]] = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Scan a chunk, returning the elements it completed"""
+        completed = []
+        for char in chunk:
+            if self._element is not None:
+                self._element.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = "".join(self._string)
+                elif self._depth == 1:
+                    self._string.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string = []
+            elif self._depth == 1 and char == ":":
+                self._current_key = self._last_string
+            elif self._depth == 1 and char == ",":
+                self._current_key = None
+            elif char in "{[":
+                if self._depth == 1 and char == "[" and self._current_key == self.key:
+                    self._in_array = True
+                elif self._in_array and self._depth == 2 and char == "{":
+                    self._element = [char]
+                self._depth += 1
+            elif char in "}]":
+                self._depth = max(0, self._depth - 1)
+                if self._in_array and self._depth == 2 and self._element is not None:
+                    element = self._parse("".join(self._element))
+                    if element is not None:
+                        completed.append(element)
+                    self._element = None
+                elif self._in_array and self._depth < 2:
+                    self._in_array = False
+        return completed
+
+    @staticmethod
+    def _parse(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
@@ -0,0 +1,327 @@
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+import structlog
+
+from app.config import Settings
+from app.utils.metrics import LOG_RECORDS_DROPPED
+
+REDACTED = "[redacted]"
+
+# Never truncated; these are already-rendered tracebacks
+_PRESERVED_KEYS = {"event", "exception", "stack"}
+
+_STOP = object()
+
+_writer: Optional["LogWriter"] = None
+
+
+class EventSampler:
+    """structlog processor that keeps a configured fraction of high-volume events
+
+    Rates are per event name (the log message). Only debug and info events are
+    sampled; warnings and errors are always kept. Kept events record their
+    sample_rate, so counts can be scaled back up.
+    """
+
+    SAMPLED_METHODS = {"debug", "info"}
+
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = dict(rates)
+        self._dropped = LOG_RECORDS_DROPPED.labels("sampled")
+
+    def __call__(self, logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        if method_name not in self.SAMPLED_METHODS:
+            return event_dict
+
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is None or rate >= 1.0:
+            return event_dict
+
+        if rate <= 0.0 or random.random() >= rate:
+            self._dropped.inc()
+            raise structlog.DropEvent
+
+        event_dict["sample_rate"] = rate
+        return event_dict
+
+
+class PayloadLimiter:
+    """structlog processor that redacts secrets and bounds the size of logged values
+
+    Values under a redacted key are replaced. Long strings are cut to
+    max_chars. Containers are cut to max_items entries and to max_depth
+    levels, so logging a webhook payload or API response stays cheap to
+    render and ship.
+    """
+
+    def __init__(self, redact_keys: Iterable[str], max_chars: int = 512, max_items: int = 20, max_depth: int = 3):
+        self.redact_keys = {key.lower() for key in redact_keys}
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.max_depth = max_depth
+
+    def __call__(self, logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        for key, value in event_dict.items():
+            if key in _PRESERVED_KEYS:
+                continue
+            # Fast path: most values are scalars or short strings
+            if key.lower() in self.redact_keys:
+                event_dict[key] = REDACTED
+            elif isinstance(value, str):
+                if len(value) > self.max_chars:
+                    event_dict[key] = self._limit(key, value, 0)
+            elif isinstance(value, (dict, list, tuple)):
+                event_dict[key] = self._limit(key, value, 0)
+        return event_dict
+
+    def _limit(self, key: Any, value: Any, depth: int) -> Any:
+        if isinstance(key, str) and key.lower() in self.redact_keys:
+            return REDACTED
+
+        if isinstance(value, str):
+            if len(value) > self.max_chars:
+                return f"{value[:self.max_chars]}…(+{len(value) - self.max_chars} chars)"
+            return value
+
+        if isinstance(value, dict):
+            if depth >= self.max_depth:
+                return f"<dict with {len(value)} keys>"
+            limited = {}
+            for i, (k, v) in enumerate(value.items()):
+                if i >= self.max_items:
+                    limited["…"] = f"+{len(value) - self.max_items} keys"
+                    break
+                limited[k] = self._limit(k, v, depth + 1)
+            return limited
+
+        if isinstance(value, (list, tuple)):
+            if depth >= self.max_depth:
+                return f"<list with {len(value)} items>"
+            limited = [self._limit(None, v, depth + 1) for v in value[:self.max_items]]
+            if len(value) > self.max_items:
+                limited.append(f"…(+{len(value) - self.max_items} items)")
+            return limited
+
+        return value
+
+
+class LogWriter:
+    """Renders event dicts as JSON lines and writes them to a stream
+
+    When asynchronous, events are put on a bounded queue and a daemon thread
+    renders and writes them in batches, so callers never wait on I/O. If
+    the queue is full, events are dropped and counted rather than blocking
+    the event loop.
+    """
+
+    def __init__(self, stream: TextIO, asynchronous: bool = True, queue_size: int = 10000, batch_size: int = 256):
+        self.stream = stream
+        self.asynchronous = asynchronous
+        self.batch_size = batch_size
+        self.render = structlog.processors.JSONRenderer()
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        # Serializes synchronous writes, and the switch to them in stop()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.asynchronous and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Write everything still queued and stop the thread
+
+        Waits up to timeout seconds for the thread to finish. Events
+        submitted from then on are written synchronously, after anything
+        left in the queue, so loggers that structlog cached with this writer
+        keep working after shutdown and records stay in order.
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+        with self._lock:
+            self.asynchronous = False
+            self._write(self._take_queued())
+
+    def submit(self, event_dict: Dict[str, Any]):
+        if self.asynchronous:
+            try:
+                self._queue.put_nowait(event_dict)
+            except queue.Full:
+                LOG_RECORDS_DROPPED.labels("queue_full").inc()
+                return
+            if self.asynchronous:
+                return
+            # Stopped meanwhile, so nothing reads the queue any more; the
+            # event is written below with whatever else was left in it
+            event_dict = None
+
+        with self._lock:
+            batch = self._take_queued()
+            if event_dict is not None:
+                batch.append(event_dict)
+            self._write(batch)
+
+    def _take_queued(self) -> List[Dict[str, Any]]:
+        """Remove and return the events still in the queue, oldest first"""
+        events = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return events
+            if item is not _STOP:
+                events.append(item)
+
+    def _run(self):
+        while True:
+            batch: List[Dict[str, Any]] = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = any(item is _STOP for item in batch)
+            self._write([item for item in batch if item is not _STOP])
+            if stopping:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            lines = [self.render(None, None, event_dict) for event_dict in batch]
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            # Logging must never take the process down
+            LOG_RECORDS_DROPPED.labels("write_error").inc()
+
+
+class QueueLogger:
+    """structlog logger that hands the processed event dict to the LogWriter"""
+
+    def __init__(self, writer: LogWriter, name: Optional[str] = None):
+        self._writer = writer
+        self.name = name
+
+    def msg(self, event_dict: Dict[str, Any]):
+        self._writer.submit(event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = failure = err = msg
+
+
+class QueueLoggerFactory:
+    """Creates QueueLoggers named after the calling module, as the stdlib factory does
+
+    The name is looked up once, when a logger is first used, not on every call.
+    """
+
+    def __init__(self, writer: LogWriter):
+        self.writer = writer
+
+    def __call__(self, *args: Any) -> QueueLogger:
+        return QueueLogger(self.writer, args[0] if args else _caller_module())
+
+
+def _caller_module() -> Optional[str]:
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(("structlog", __name__)):
+        frame = frame.f_back
+    return frame.f_globals.get("__name__") if frame is not None else None
+
+
+class ForwardingHandler(logging.Handler):
+    """stdlib handler that sends records from third-party loggers (uvicorn, sqlalchemy) to the LogWriter"""
+
+    def __init__(self, writer: LogWriter, limiter: PayloadLimiter):
+        super().__init__()
+        self.writer = writer
+        self.limiter = limiter
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            event_dict = {
+                "event": record.getMessage(),
+                "logger": record.name,
+                "level": record.levelname.lower(),
+                "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat().replace("+00:00", "Z"),
+            }
+            if record.exc_info:
+                event_dict["exception"] = logging.Formatter().formatException(record.exc_info)
+            self.writer.submit(self.limiter(None, record.levelname.lower(), event_dict))
+        except Exception:
+            self.handleError(record)
+
+
+def _to_writer(logger: Any, method_name: str, event_dict: Dict[str, Any]):
+    # QueueLogger methods take the event dict as their single argument
+    return (event_dict,), {}
+
+
+def build_processors(settings: Settings) -> list:
+    """structlog processor chain: sampling first, JSON rendering left to the LogWriter"""
+    return [
+        EventSampler(settings.log_sample_rates),
+        structlog.stdlib.add_logger_name,
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+        structlog.processors.format_exc_info,
+        PayloadLimiter(settings.log_redact_keys, settings.log_max_value_chars, settings.log_max_items),
+        structlog.processors.UnicodeDecoder(),
+        _to_writer,
+    ]
+
+
+def configure_logging(settings: Settings, stream: Optional[TextIO] = None):
+    """Route structlog and stdlib logging through a single JSON-lines writer
+
+    Events below log_level are discarded by the bound logger before any
+    processing. With log_async, the remaining events are rendered and
+    written by a background thread.
+    """
+    global _writer
+
+    shutdown_logging()
+
+    _writer = LogWriter(stream or sys.stdout, asynchronous=settings.log_async, queue_size=settings.log_queue_size)
+    _writer.start()
+
+    level = logging.getLevelName(settings.log_level.upper())
+
+    root = logging.getLogger()
+    root.handlers = [ForwardingHandler(_writer, PayloadLimiter(settings.log_redact_keys, settings.log_max_value_chars, settings.log_max_items))]
+    root.setLevel(level)
+
+    structlog.configure(
+        processors=build_processors(settings),
+        context_class=dict,
+        logger_factory=QueueLoggerFactory(_writer),
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        cache_logger_on_first_use=True,
+    )
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread
+
+    Records logged afterwards are written synchronously by the stopped
+    writer.
+    """
+    global _writer
+
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
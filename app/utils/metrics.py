@@ -0,0 +1,148 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Webhook stages run from milliseconds (cache hits) to tens of seconds (LLM calls)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, float("inf"))
+
+STAGE_SECONDS = Histogram(
+    "present_agent_stage_seconds",
+    "Time spent in each stage of the message pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+AI_CALL_SECONDS = Histogram(
+    "present_agent_ai_call_seconds",
+    "OpenAI call latency per operation, model and outcome",
+    ["operation", "model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+AI_FALLBACKS = Counter(
+    "present_agent_ai_fallbacks_total",
+    "AI fallbacks: 'tier' when a later model tier is tried, 'canned' when a fixed response is returned",
+    ["operation", "kind"],
+)
+
+MESSAGE_ERRORS = Counter(
+    "present_agent_message_errors_total",
+    "Messages answered with the generic error reply because processing failed",
+)
+
+LOCAL_NLU_TURNS = Counter(
+    "present_agent_local_nlu_turns_total",
+    "Context-gathering turns by how they were handled: 'recommend' or 'follow_up' without the model, or 'model'",
+    ["outcome"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "present_agent_cache_lookups_total",
+    "Cache lookups per cache and result",
+    ["cache", "result"],
+)
+
+OUTBOUND_MESSAGES = Counter(
+    "present_agent_outbound_messages_total",
+    "Outbound Instagram messages by delivery result",
+    ["result"],
+)
+
+OUTBOUND_WAIT_SECONDS = Histogram(
+    "present_agent_outbound_wait_seconds",
+    "Time outbound messages wait between being queued and their first send, by priority",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+
+OUTBOUND_DELIVERY_SECONDS = Histogram(
+    "present_agent_outbound_delivery_seconds",
+    "Time from queueing an outbound message to its successful delivery, including retries, by priority",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GRAPH_API_USAGE = Gauge(
+    "present_agent_graph_api_usage_percent",
+    "Highest rate-limit usage percentage reported by the Graph API usage headers",
+)
+
+DUPLICATE_MESSAGES = Counter(
+    "present_agent_duplicate_messages_total",
+    "Redelivered Instagram messages dropped by message ID, by the tier that caught them",
+    ["tier"],
+)
+
+COALESCED_MESSAGES = Counter(
+    "present_agent_coalesced_messages_total",
+    "Messages merged into an earlier message from the same sender instead of getting their own turn",
+    ["coalescer"],
+)
+
+SESSIONS_ABANDONED = Counter(
+    "present_agent_sessions_abandoned_total",
+    "Active gift sessions marked abandoned by the idle-session sweeper",
+)
+
+QUEUE_DEPTH = Gauge(
+    "present_agent_queue_depth",
+    "Items waiting in a worker pool, read at scrape time",
+    ["pool"],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "present_agent_log_records_dropped_total",
+    "Log records not written, by reason ('sampled' or 'queue_full')",
+    ["reason"],
+)
+
+QUEUE_LAG_SECONDS = Histogram(
+    "present_agent_queue_lag_seconds",
+    "Time items wait in a worker pool before a worker picks them up",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Optional receiver of raw (name, seconds) samples, used by the load-test
+# harness for exact percentiles; None in production
+_sample_hook: Optional[Callable[[str, float], None]] = None
+
+
+def set_sample_hook(hook: Optional[Callable[[str, float], None]]):
+    global _sample_hook
+    _sample_hook = hook
+
+
+def record_sample(name: str, seconds: float):
+    if _sample_hook is not None:
+        _sample_hook(name, seconds)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Observe the duration of a pipeline stage, including failed runs"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        record_sample(stage, elapsed)
+
+
+def observe_ai_call(operation: str, model: str, outcome: str, seconds: float):
+    AI_CALL_SECONDS.labels(operation, model, outcome).observe(seconds)
+    record_sample(f"ai.{operation}.{outcome}", seconds)
+
+
+def watch_queue_depth(pool):
+    """Report a worker pool's depth as a gauge evaluated at scrape time (no hot-path cost)"""
+    QUEUE_DEPTH.labels(pool.name).set_function(lambda: pool.depth)
+
+
+def render_metrics():
+    """Exposition body and content type for the /metrics endpoint"""
+    return generate_latest(), CONTENT_TYPE_LATEST
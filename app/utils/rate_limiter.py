@@ -0,0 +1,109 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class TokenBucket:
+    """Async token bucket that serves waiters by priority, then arrival order
+
+    Tokens refill at rate per second up to burst. acquire() returns at
+    once while tokens are available and nobody is waiting. Otherwise the
+    caller queues, and each new token goes to the waiter with the lowest
+    priority number. The rate can be changed at any time, and pause()
+    withholds tokens for a while, e.g. after the server reports a limit.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Stats
+        self.acquired = 0
+        self.waited = 0
+
+    async def acquire(self, priority: int = 0) -> float:
+        """Take one token, returning the seconds spent waiting for it"""
+        if not self._waiters and self._take():
+            self.acquired += 1
+            return 0.0
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        self._grant()
+
+        await future
+        self.acquired += 1
+        self.waited += 1
+        return time.monotonic() - started
+
+    def set_rate(self, rate: float):
+        """Change the refill rate; tokens already earned are kept"""
+        self._refill()
+        self.rate = max(rate, 1e-6)
+        self._grant()
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for the next seconds, and start empty afterwards"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._grant()
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def stats(self) -> Dict[str, float]:
+        self._refill()
+        return {
+            "rate": round(self.rate, 3),
+            "tokens": round(self._tokens, 3),
+            "waiting": len(self._waiters),
+            "paused_for": round(self.paused_for, 3),
+            "acquired": self.acquired,
+            "waited": self.waited,
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        if now >= self._paused_until:
+            since = max(self._updated, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + (now - since) * self.rate)
+        self._updated = now
+
+    def _take(self) -> bool:
+        self._refill()
+        if time.monotonic() < self._paused_until or self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _grant(self):
+        """Hand tokens to waiters in priority order, then sleep until the next one is due"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take():
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+        if self._waiters:
+            delay = max(self.paused_for, (1 - self._tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._grant)
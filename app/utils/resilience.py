@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a rolling window of recent calls
+
+    Closed: calls flow and outcomes are recorded. Once the window holds at
+    least min_calls outcomes and the error rate reaches the threshold, the
+    breaker opens. Open: calls are refused for cooldown seconds. Half-open:
+    one probe call is let through. Success closes the breaker, failure
+    re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 10, error_threshold: float = 0.5, cooldown: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+
+        self.state = self.CLOSED
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+        # Stats
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may proceed right now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_started_at = None
+
+        if self.state == self.HALF_OPEN:
+            # One probe at a time; a probe that never reported back (e.g. was
+            # cancelled) is given up on after another cooldown
+            now = time.monotonic()
+            if self._probe_started_at is not None and now - self._probe_started_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self._probe_started_at = now
+
+        return True
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            logger.info("Circuit breaker closed", breaker=self.name)
+            self.state = self.CLOSED
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.error_rate >= self.error_threshold:
+            self._trip()
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started_at = None
+        self.trips += 1
+        logger.warning("Circuit breaker opened", breaker=self.name, error_rate=round(self.error_rate, 2))
+
+    def stats(self) -> dict:
+        return {"state": self.state, "error_rate": round(self.error_rate, 3), "trips": self.trips, "rejected": self.rejected}
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies for percentile estimates"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """Latency at the quantile, or None until enough samples are collected"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(quantile * len(ordered)))
+        return ordered[index]
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float]) -> Tuple[Any, bool]:
+    """Run call(), starting a second identical attempt if the first is slower than delay
+
+    Returns (result, hedge_started), with the first successful result. The
+    losing attempt is cancelled. If every attempt fails, the last error is
+    raised. With delay=None the call runs once, unhedged.
+    """
+    tasks = [asyncio.ensure_future(call())]
+
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(call()))
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), len(tasks) > 1
+                error = task.exception()
+
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from app.utils.metrics import QUEUE_LAG_SECONDS, record_sample, watch_queue_depth
+
+logger = structlog.get_logger()
+
+
+class KeyedWorkerPool:
+    """Bounded pool of async workers that preserves ordering per key
+
+    Each key has its own queue and is handled by at most one worker at a
+    time, so everything submitted for the same key is handled sequentially
+    and in order. Any idle worker takes the next key with work waiting, so
+    a slow item (a multi-second LLM call) only holds up later items for its
+    own key, never other keys. Keys are served by the priority number of
+    their next item, lowest first, then by submission order; within a key,
+    items with a lower priority number are taken first as well.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int = 8,
+        queue_size: int = 1000
+    ):
+        self.name = name
+        self.handler = handler
+        self.num_workers = max(1, workers)
+        # Bound on items waiting across all keys
+        self.queue_size = max(1, queue_size)
+
+        # key -> heap of (priority, seq, enqueued_at, item) waiting for that key
+        self._pending: Dict[str, List[Tuple[int, int, float, Any]]] = {}
+        # (priority, seq, key) for keys whose next item can start; an entry
+        # is stale once it no longer matches _scheduled[key]
+        self._ready: Optional[asyncio.PriorityQueue] = None
+        self._scheduled: Dict[str, Tuple[int, int]] = {}
+        # Keys a worker is handling right now
+        self._active: Set[str] = set()
+        self._queued = 0
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._order = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+
+        # Stats
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+        self._lag_histogram = QUEUE_LAG_SECONDS.labels(name)
+        self._lag_sample_name = f"queue_lag.{name}"
+        watch_queue_depth(self)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Start the worker tasks"""
+        if self.running:
+            return
+
+        self._pending.clear()
+        self._scheduled.clear()
+        self._active.clear()
+        self._queued = self._unfinished = 0
+        self._idle.set()
+        self._ready = asyncio.PriorityQueue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+
+        logger.info("Worker pool started", pool=self.name, workers=self.num_workers, queue_size=self.queue_size)
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Drain queued items (up to drain_timeout seconds) and stop the workers"""
+        if not self.running:
+            return
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Worker pool stopped with items still queued", pool=self.name, depth=self.depth)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        logger.info("Worker pool stopped", pool=self.name, processed=self.processed)
+
+    def submit(self, key: str, item: Any, priority: int = 0):
+        """Queue an item for processing without waiting
+
+        Raises RuntimeError if the pool is not running and asyncio.QueueFull
+        if queue_size items are already waiting.
+        """
+        if not self.running:
+            raise RuntimeError(f"Worker pool {self.name} is not running")
+
+        if self._queued >= self.queue_size:
+            self.rejected += 1
+            raise asyncio.QueueFull
+
+        # The sequence number keeps FIFO order within a priority and
+        # means items themselves are never compared
+        heapq.heappush(self._pending.setdefault(key, []), (priority, next(self._order), time.monotonic(), item))
+        self._queued += 1
+        self._unfinished += 1
+        self._idle.clear()
+        self.submitted += 1
+        self._schedule(key)
+
+    @property
+    def depth(self) -> int:
+        """Total number of items waiting across all keys"""
+        return self._queued
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, lag and throughput counters"""
+        now = time.monotonic()
+        oldest = min((entry[2] for entries in self._pending.values() for entry in entries), default=now)
+        return {
+            "workers": self.num_workers,
+            "depth": self.depth,
+            "busy_keys": len(self._active),
+            "waiting_keys": sum(1 for entries in self._pending.values() if entries),
+            "oldest_wait_seconds": round(now - oldest, 4),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "last_lag_seconds": round(self.last_lag, 4),
+            "max_lag_seconds": round(self.max_lag, 4),
+        }
+
+    def _schedule(self, key: str):
+        """Make the key's next item available to workers, unless its current one is still running"""
+        if key in self._active:
+            return
+        priority, seq, _, _ = self._pending[key][0]
+        scheduled = self._scheduled.get(key)
+        # Re-queue the key only when its next item now comes earlier
+        if scheduled is None or (priority, seq) < scheduled:
+            self._scheduled[key] = (priority, seq)
+            self._ready.put_nowait((priority, seq, key))
+
+    async def _worker(self):
+        """Handle one item at a time from whichever key is next"""
+        while True:
+            priority, seq, key = await self._ready.get()
+            if self._scheduled.get(key) != (priority, seq):
+                continue
+            del self._scheduled[key]
+
+            _, _, enqueued_at, item = heapq.heappop(self._pending[key])
+            self._queued -= 1
+            self._active.add(key)
+
+            lag = time.monotonic() - enqueued_at
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._lag_histogram.observe(lag)
+            record_sample(self._lag_sample_name, lag)
+
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("Worker pool handler failed", pool=self.name, exc_info=e)
+            finally:
+                self._active.discard(key)
+                if self._pending[key]:
+                    self._schedule(key)
+                else:
+                    del self._pending[key]
+                self._unfinished -= 1
+                if not self._unfinished:
+                    self._idle.set()
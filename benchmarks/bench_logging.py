@@ -0,0 +1,164 @@
+"""Logging cost per webhook request, before and after the non-blocking pipeline
+
+Replays the log calls one Instagram message produces (middleware, webhook,
+worker) and measures the time spent on the calling thread, which in the app
+is the event loop. Output goes to a real file so write() cost is included.
+
+"before" is the original configuration: JSONRenderer in the structlog chain,
+a synchronous stdlib StreamHandler, two middleware lines and the full
+webhook body. "after" is app.utils.log_pipeline with the current call
+pattern, both synchronous and queued. --sink-latency-ms adds a delay to every
+flush, simulating stdout piped to a slow log collector.
+
+    python -m benchmarks.bench_logging [--requests 20000] [--sink-latency-ms 0.2]
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+import structlog
+
+from app.config import get_settings
+from app.utils.log_pipeline import configure_logging, shutdown_logging
+
+MESSAGE = "My mom's birthday is next week and she loves gardening, jazz and cooking. " * 8
+
+
+class SlowStream:
+    """File wrapper whose flush() blocks, like a pipe with a slow reader"""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str):
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+        if self.latency:
+            time.sleep(self.latency)
+
+    def tell(self) -> int:
+        return self.stream.tell()
+
+
+def webhook_body(sender_id: str) -> dict:
+    return {
+        "object": "instagram",
+        "entry": [{
+            "id": "page-1",
+            "time": 1700000000,
+            "messaging": [{
+                "sender": {"id": sender_id},
+                "recipient": {"id": "page-1"},
+                "timestamp": 1700000000,
+                "message": {"mid": f"mid.{sender_id}", "text": MESSAGE},
+            }],
+        }],
+    }
+
+
+def configure_legacy(stream):
+    """The logging setup app/main.py shipped with, writing at INFO"""
+    handler = logging.StreamHandler(stream)
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+    structlog.reset_defaults()
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+
+def legacy_request(logger, i: int):
+    sender_id = str(i % 500)
+    logger.info("Request started", method="POST", url="http://testserver/webhook/instagram", client="10.0.0.1")
+    logger.info("Instagram webhook received", data=webhook_body(sender_id))
+    logger.info("Request completed", method="POST", url="http://testserver/webhook/instagram", status_code=200, process_time=0.001)
+    logger.info("Processing message", sender_id=sender_id, message=MESSAGE[:100] + "...")
+    logger.info("Message processed successfully", user_id=sender_id, session_id="a" * 36, platform="instagram")
+    logger.info("Message sent successfully", recipient_id=sender_id, attempts=1, message_preview=MESSAGE[:50] + "...")
+
+
+def current_request(logger, i: int):
+    sender_id = str(i % 500)
+    logger.info("Instagram webhook received", object="instagram", entries=1, queued=1)
+    logger.info("Request completed", method="POST", path="/webhook/instagram", client="10.0.0.1", status_code=200, process_time=0.001)
+    logger.info("Processing message", sender_id=sender_id, message=MESSAGE[:100] + "...")
+    logger.info("Message processed successfully", user_id=sender_id, session_id="a" * 36, platform="instagram")
+    logger.info("Message sent successfully", recipient_id=sender_id, attempts=1, message_preview=MESSAGE[:50] + "...")
+
+
+def measure(label: str, setup, replay, requests: int, sink_latency: float, teardown=None):
+    with tempfile.TemporaryFile("w+") as file:
+        stream = SlowStream(file, sink_latency)
+        setup(stream)
+        logger = structlog.get_logger("bench")
+        warmup = min(1000, requests)
+        for i in range(warmup):
+            replay(logger, i)
+
+        started = time.perf_counter()
+        for i in range(requests):
+            replay(logger, i)
+        elapsed = time.perf_counter() - started
+
+        drain_started = time.perf_counter()
+        if teardown:
+            teardown()
+        drained = time.perf_counter() - drain_started
+
+        stream.flush()
+        size = stream.tell()
+
+    print(
+        f"{label:<28} {elapsed / requests * 1e6:8.1f} us/request on caller"
+        f"  (+{drained:.2f}s background drain, {size / (warmup + requests):7.0f} bytes/request)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sink-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    sink_latency = args.sink_latency_ms / 1000
+
+    settings = get_settings()
+
+    measure("before (sync, full body)", configure_legacy, legacy_request, args.requests, sink_latency)
+    measure(
+        "after, sync",
+        lambda stream: configure_logging(settings.model_copy(update={"log_async": False}), stream=stream),
+        current_request,
+        args.requests,
+        sink_latency
+    )
+    measure(
+        "after, queued + sampled",
+        lambda stream: configure_logging(settings.model_copy(update={"log_async": True}), stream=stream),
+        current_request,
+        args.requests,
+        sink_latency,
+        teardown=shutdown_logging
+    )
+
+
+if __name__ == "__main__":
+    main()
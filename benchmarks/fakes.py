@@ -0,0 +1,251 @@
+"""Local stand-ins for the OpenAI chat completions API and the Instagram Graph API
+
+Both are httpx transports, so the real AsyncOpenAI and GraphAPIClient code
+paths (request building, response parsing, streaming, retries, timeouts) run
+unchanged without any network. Latency is log-normal around a configurable median.
+Errors and stalls are drawn independently per request from a seeded RNG, so
+runs are reproducible.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+
+RECIPIENTS = ["mom", "dad", "partner", "friend", "colleague", "sister", "brother", "grandma"]
+OCCASIONS = ["birthday", "anniversary", "christmas", "graduation", "apology", "thank_you"]
+INTERESTS = [
+    "gardening", "jazz", "cooking", "hiking", "photography", "board games", "yoga", "coffee",
+    "running", "painting", "wine", "cycling", "reading", "travel", "baking", "gaming",
+]
+
+_LATEST_MESSAGE = re.compile(r'Latest message: "(.*)"', re.DOTALL)
+_CANDIDATE = re.compile(r"^- (\S+) \| ", re.MULTILINE)
+
+
+@dataclass
+class LatencyProfile:
+    """Log-normal latency with occasional errors and stalls"""
+
+    median_ms: float = 100.0
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    error_status: int = 500
+    stall_rate: float = 0.0
+    stall_ms: float = 30000.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.stall_rate and rng.random() < self.stall_rate:
+            return self.stall_ms / 1000
+        return rng.lognormvariate(math.log(max(self.median_ms, 0.001) / 1000), self.sigma)
+
+    def fails(self, rng: random.Random) -> bool:
+        return bool(self.error_rate) and rng.random() < self.error_rate
+
+
+class FakeOpenAI:
+    """Chat completions endpoint answering extraction and recommendation prompts
+
+    Embedding requests get a pseudo-random vector seeded by the text.
+    Extraction replies pick recipient, occasion, interests and budget out of
+    the latest user message by keyword, so conversations move through the
+    same stages as with the real model. Streamed requests get the same body
+    as server-sent chunks, the first after 30% of the sampled latency.
+    """
+
+    def __init__(self, profile: LatencyProfile, seed: int = 1):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.errors = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        delay = self.profile.sample(self.rng)
+        fails = self.profile.fails(self.rng)
+        self.calls[body["model"]] += 1
+
+        if request.url.path.endswith("/embeddings"):
+            # Embeddings are much faster than completions
+            await asyncio.sleep(delay / 10)
+            return self._embeddings(body)
+
+        streamed = bool(body.get("stream")) and not fails
+        await asyncio.sleep(delay * 0.3 if streamed else delay)
+
+        if fails:
+            self.errors += 1
+            return httpx.Response(
+                self.profile.error_status,
+                json={"error": {"message": "simulated failure", "type": "server_error"}}
+            )
+
+        system_prompt = body["messages"][0]["content"]
+        user_prompt = body["messages"][-1]["content"]
+        if "recommend 3-5 specific" in system_prompt:
+            content = self._recommendations(_CANDIDATE.findall(user_prompt))
+        else:
+            content = self._extraction(user_prompt)
+
+        if streamed:
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=self._stream(body["model"], json.dumps(content), delay * 0.7)
+            )
+
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        completion_tokens = len(json.dumps(content)) // 4
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-{self.rng.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(content)},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    async def _stream(self, model: str, content: str, duration: float, pieces: int = 8):
+        """The completion as chat.completion.chunk events spread over duration"""
+        chunk_id = f"chatcmpl-{self.rng.getrandbits(32):08x}"
+        size = max(1, math.ceil(len(content) / pieces))
+        for start in range(0, len(content), size):
+            if start:
+                await asyncio.sleep(duration / pieces)
+            event = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(event)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+    def _embeddings(self, body: Dict) -> httpx.Response:
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions", 256)
+        data = []
+        for index, text in enumerate(texts):
+            rng = random.Random(text)
+            data.append({"object": "embedding", "index": index, "embedding": [rng.gauss(0, 1) for _ in range(dimensions)]})
+        return httpx.Response(200, json={
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    def _extraction(self, user_prompt: str) -> Dict:
+        match = _LATEST_MESSAGE.search(user_prompt)
+        message = (match.group(1) if match else user_prompt).lower()
+
+        budget = re.search(r"\$(\d+)", message)
+        insights = {
+            "recipient_type": next((r for r in RECIPIENTS if r in message), None),
+            "occasion": next((o.replace("_", " ") for o in OCCASIONS if o.replace("_", " ") in message), None),
+            "interests": [i for i in INTERESTS if i in message],
+            "budget_hints": f"around ${budget.group(1)}" if budget else None,
+            "emotional_context": None,
+        }
+        return {
+            "extracted_insights": insights,
+            "response": "That's lovely! What kinds of things do they enjoy doing in their free time?",
+        }
+
+    def _recommendations(self, candidate_ids: List[str]) -> Dict:
+        if candidate_ids:
+            return {
+                "recommendations": [
+                    {"product_id": product_id, "reasoning": "A good fit for their interests."}
+                    for product_id in candidate_ids[:3]
+                ],
+                "explanation": "Ranked the candidates by fit.",
+            }
+
+        picks = self.rng.sample(INTERESTS, 3)
+        return {
+            "recommendations": [
+                {
+                    "name": f"{interest.title()} starter kit",
+                    "description": f"A curated kit for getting more out of {interest}.",
+                    "reasoning": f"Builds on their love of {interest}.",
+                    "estimated_price": self.rng.randint(20, 150),
+                    "where_to_find": "Online specialty retailers",
+                }
+                for interest in picks
+            ],
+            "explanation": "Picked around their stated interests.",
+        }
+
+
+class FakeGraphAPI:
+    """Send API endpoint recording every delivered message per recipient
+
+    Tests and the load harness can await replies with wait_for_reply().
+    """
+
+    def __init__(self, profile: LatencyProfile, seed: int = 2):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.sent = 0
+        self.errors = 0
+        self._replies: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        delay = self.profile.sample(self.rng)
+        fails = self.profile.fails(self.rng)
+
+        await asyncio.sleep(delay)
+
+        if fails:
+            self.errors += 1
+            return httpx.Response(self.profile.error_status, json={"error": {"message": "simulated failure", "code": 2}})
+
+        recipient_id = body["recipient"]["id"]
+        self.sent += 1
+        self._replies[recipient_id].put_nowait((time.perf_counter(), body["message"]["text"]))
+        return httpx.Response(200, json={"recipient_id": recipient_id, "message_id": f"m_{self.sent}"})
+
+    async def wait_for_reply(self, recipient_id: str, timeout: float) -> Optional[tuple]:
+        """(delivered_at, text) of the next reply to recipient_id, or None on timeout"""
+        try:
+            return await asyncio.wait_for(self._replies[recipient_id].get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def conversation_script(rng: random.Random, turns: int) -> List[str]:
+    """Messages one synthetic user sends: a greeting, the gift context, then asks for ideas"""
+    recipient = rng.choice(RECIPIENTS)
+    occasion = rng.choice(OCCASIONS).replace("_", " ")
+    interests = rng.sample(INTERESTS, 3)
+    budget = rng.choice([25, 40, 75, 120, 250])
+
+    script = [
+        "Hi! I need help finding a gift",
+        f"It's for my {recipient}, for their {occasion} next week",
+        f"They really love {interests[0]} and {interests[1]}, and lately they've been into {interests[2]}",
+        f"I'd like to spend about ${budget}",
+        "What would you suggest?",
+        "Those sound great, anything a bit more personal?",
+        f"Maybe something related to {interests[1]}?",
+    ]
+    while len(script) < turns:
+        script.append(f"Any other ideas around {rng.choice(interests)}?")
+    return script[:turns]
@@ -0,0 +1,385 @@
+"""End-to-end load test of the Instagram message pipeline
+
+Replays synthetic Instagram conversations against the FastAPI app in-process
+over the ASGI transport. Everything real runs: the webhook route, the event
+workers, the conversation handler, AIService and the send outbox. OpenAI and
+the Graph API are replaced by the fakes in benchmarks.fakes. The database is
+a throwaway SQLite file by default, or a PostgreSQL database given with
+--database-url (tables are created if missing; use a scratch database).
+
+Each virtual user sends its script one message at a time and waits for the
+reply to reach the fake Graph API (closed loop). --concurrency users are
+active at once. The run reports throughput and p50/p95/p99 per pipeline
+stage, taken from the raw samples behind the /metrics histograms. Results can
+be saved as a baseline, and later runs compared against it:
+
+    python -m benchmarks.load_test --users 200 --concurrency 50
+    python -m benchmarks.load_test --save benchmarks/results/baseline-sqlite.json
+    python -m benchmarks.load_test --compare benchmarks/results/baseline-sqlite.json
+
+--compare exits with status 1 when a stage's p95, or the throughput, is
+worse than the baseline by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from prometheus_client import REGISTRY
+
+from benchmarks.fakes import FakeGraphAPI, FakeOpenAI, LatencyProfile, conversation_script
+
+# Shown first, in this order; other stages follow alphabetically
+STAGE_ORDER = [
+    "end_to_end",
+    "first_reply",
+    "webhook_ack",
+    "queue_lag.instagram-events",
+    "process_message",
+    "load_user_and_session",
+    "get_or_create_user_and_session",
+    "get_or_create_user",
+    "get_or_create_session",
+    "generate_response",
+    "first_recommendation",
+    "db_commit",
+    "write_batch",
+    "queue_lag.instagram-outbox",
+    "send_instagram_message",
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_argument_group("load")
+    load.add_argument("--users", type=int, default=100, help="virtual users, each running one conversation")
+    load.add_argument("--concurrency", type=int, default=25, help="users active at once")
+    load.add_argument("--turns", type=int, default=5, help="messages per conversation")
+    load.add_argument("--think-time-ms", type=float, default=0.0, help="pause between a reply and the next message")
+    load.add_argument("--reply-timeout", type=float, default=60.0, help="seconds to wait for each reply")
+    load.add_argument("--seed", type=int, default=1)
+
+    fakes = parser.add_argument_group("fake dependencies")
+    fakes.add_argument("--openai-latency-ms", type=float, default=300.0, help="median completion latency")
+    fakes.add_argument("--openai-sigma", type=float, default=0.5, help="log-normal spread of completion latency")
+    fakes.add_argument("--openai-error-rate", type=float, default=0.0)
+    fakes.add_argument("--openai-error-status", type=int, default=500)
+    fakes.add_argument("--openai-stall-rate", type=float, default=0.0, help="fraction of calls that hang")
+    fakes.add_argument("--openai-stall-ms", type=float, default=60000.0)
+    fakes.add_argument("--graph-latency-ms", type=float, default=50.0)
+    fakes.add_argument("--graph-sigma", type=float, default=0.3)
+    fakes.add_argument("--graph-error-rate", type=float, default=0.0)
+
+    env = parser.add_argument_group("environment")
+    env.add_argument("--database-url", help="async SQLAlchemy URL; defaults to a temporary SQLite file")
+    env.add_argument("--redis-url", help="enable the Redis caches against this server")
+    env.add_argument("--webhook-workers", type=int, help="override WEBHOOK_WORKERS")
+    env.add_argument(
+        "--coalesce-window-ms", type=int, default=0,
+        help="WEBHOOK_COALESCE_WINDOW_MS; off by default since closed-loop users never send bursts"
+    )
+    env.add_argument("--log-level", default="CRITICAL", help="app log level; failures are counted either way")
+
+    results = parser.add_argument_group("results")
+    results.add_argument("--save", help="write results JSON to this path")
+    results.add_argument("--compare", help="baseline results JSON to compare against")
+    results.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, scratch_dir: str):
+    """Settings are read at import time, so this runs before any app module is imported"""
+    database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(scratch_dir, 'load_test.db')}"
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "DEBUG": "false",
+        "LOG_LEVEL": args.log_level,
+        "OPENAI_API_KEY": "load-test",
+        "INSTAGRAM_ACCESS_TOKEN": "load-test",
+        "CACHE_ENABLED": "true" if args.redis_url else "false",
+        "EMBEDDING_CACHE_PATH": os.path.join(scratch_dir, "embeddings.sqlite"),
+        "CATALOG_INDEX_DIR": os.path.join(scratch_dir, "catalog_index"),
+        "WEBHOOK_COALESCE_WINDOW_MS": str(args.coalesce_window_ms),
+    })
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    if args.webhook_workers:
+        os.environ["WEBHOOK_WORKERS"] = str(args.webhook_workers)
+
+
+def webhook_payload(sender_id: str, text: str, turn: int) -> Dict:
+    now = int(time.time() * 1000)
+    return {
+        "object": "instagram",
+        "entry": [{
+            "id": "load-test-page",
+            "time": now,
+            "messaging": [{
+                "sender": {"id": sender_id},
+                "recipient": {"id": "load-test-page"},
+                "timestamp": now,
+                "message": {"mid": f"mid.{sender_id}.{turn}", "text": text},
+            }],
+        }],
+    }
+
+
+def percentile(ordered: List[float], quantile: float) -> float:
+    """Nearest-rank percentile of pre-sorted samples"""
+    index = min(len(ordered) - 1, max(0, int(round(quantile * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    from openai import AsyncOpenAI
+
+    from app.cache import close_cache, init_cache
+    from app.config import get_settings
+    from app import database
+    from app.integrations.graph_api import GraphAPIClient, send_outbox
+    from app.integrations.instagram import conversation_handler, event_dispatcher, message_coalescer
+    from app.services.conversation_handler import FIRST_IDEA_INTRO
+    from app.services.write_behind import write_buffer
+    from app.main import app
+    from app.utils import metrics
+    from app.utils.log_pipeline import shutdown_logging
+
+    settings = get_settings()
+    errors_before = REGISTRY.get_sample_value("present_agent_message_errors_total") or 0.0
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    metrics.set_sample_hook(lambda name, seconds: samples[name].append(seconds))
+
+    await database.init_db()
+    await database.create_tables()
+    await init_cache()
+
+    fake_openai = FakeOpenAI(LatencyProfile(
+        median_ms=args.openai_latency_ms,
+        sigma=args.openai_sigma,
+        error_rate=args.openai_error_rate,
+        error_status=args.openai_error_status,
+        stall_rate=args.openai_stall_rate,
+        stall_ms=args.openai_stall_ms,
+    ), seed=args.seed)
+    fake_graph = FakeGraphAPI(LatencyProfile(
+        median_ms=args.graph_latency_ms,
+        sigma=args.graph_sigma,
+        error_rate=args.graph_error_rate,
+    ), seed=args.seed + 1)
+
+    ai_service = conversation_handler.ai_service
+    ai_service.client = AsyncOpenAI(
+        api_key="load-test",
+        base_url="http://fake-openai.local/v1",
+        max_retries=settings.openai_max_retries,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(fake_openai))
+    )
+    ai_service.embeddings.client = ai_service.client
+    graph_client = GraphAPIClient(settings, transport=httpx.MockTransport(fake_graph))
+    await send_outbox.start(graph_client)
+    await write_buffer.start()
+    await event_dispatcher.start()
+    await message_coalescer.start()
+
+    counters: Dict[str, int] = defaultdict(int)
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def virtual_user(client: httpx.AsyncClient, index: int):
+        rng = random.Random(args.seed * 100003 + index)
+        # Unique per run, so a reused database starts every user fresh
+        sender_id = f"load-{run_id}-{index}"
+
+        async with semaphore:
+            for turn, text in enumerate(conversation_script(rng, args.turns)):
+                started = time.perf_counter()
+                response = await client.post("/webhook/instagram", json=webhook_payload(sender_id, text, turn))
+                samples["webhook_ack"].append(time.perf_counter() - started)
+
+                if response.status_code != 200:
+                    counters["rejected"] += 1
+                    continue
+
+                reply = await fake_graph.wait_for_reply(sender_id, args.reply_timeout)
+                if reply is None:
+                    # Later replies could no longer be matched to their messages
+                    counters["timeouts"] += 1
+                    return
+
+                delivered_at, text = reply
+                samples["first_reply"].append(delivered_at - started)
+                if text.startswith(FIRST_IDEA_INTRO):
+                    # The first recommendation went ahead; the turn ends with the rest
+                    reply = await fake_graph.wait_for_reply(sender_id, args.reply_timeout)
+                    if reply is None:
+                        counters["timeouts"] += 1
+                        return
+                    delivered_at, _ = reply
+                samples["end_to_end"].append(delivered_at - started)
+                counters["messages"] += 1
+
+                if args.think_time_ms:
+                    await asyncio.sleep(args.think_time_ms / 1000)
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_user(client, i) for i in range(args.users)))
+            duration = time.perf_counter() - started
+    finally:
+        metrics.set_sample_hook(None)
+        await message_coalescer.stop()
+        await event_dispatcher.stop(drain_timeout=5)
+        await write_buffer.stop()
+        await send_outbox.stop(drain_timeout=5)
+        await graph_client.close()
+        await ai_service.client.close()
+        await close_cache()
+        await database.engine.dispose()
+        shutdown_logging()
+
+    errors = (REGISTRY.get_sample_value("present_agent_message_errors_total") or 0.0) - errors_before
+
+    return {
+        "run": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "database": database.engine.dialect.name,
+            "redis": bool(args.redis_url),
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "turns": args.turns,
+            "think_time_ms": args.think_time_ms,
+            "webhook_workers": settings.webhook_workers,
+            "coalesce_window_ms": settings.webhook_coalesce_window_ms,
+            "openai": {"latency_ms": args.openai_latency_ms, "sigma": args.openai_sigma, "error_rate": args.openai_error_rate, "stall_rate": args.openai_stall_rate},
+            "graph": {"latency_ms": args.graph_latency_ms, "sigma": args.graph_sigma, "error_rate": args.graph_error_rate},
+        },
+        "duration_seconds": duration,
+        "throughput_messages_per_second": counters["messages"] / duration if duration else 0.0,
+        "messages": counters["messages"],
+        "rejected": counters["rejected"],
+        "timeouts": counters["timeouts"],
+        "processing_errors": int(errors),
+        "openai_calls": dict(fake_openai.calls),
+        "openai_errors": fake_openai.errors,
+        "graph_errors": fake_graph.errors,
+        "ai_fallbacks": {operation: count for operation, count in ai_service.fallbacks.items()},
+        "stages": {name: summarize(values) for name, values in samples.items() if values},
+    }
+
+
+def ordered_stages(stages: Dict) -> List[str]:
+    known = [name for name in STAGE_ORDER if name in stages]
+    return known + sorted(name for name in stages if name not in STAGE_ORDER)
+
+
+def print_report(results: Dict):
+    run = results["run"]
+    print(
+        f"\n{results['messages']} messages from {run['users']} users (concurrency {run['concurrency']}, "
+        f"{run['database']}) in {results['duration_seconds']:.1f}s: "
+        f"{results['throughput_messages_per_second']:.1f} msg/s, "
+        f"{results['rejected']} rejected, {results['timeouts']} timed out, "
+        f"{results['processing_errors']} answered with the error reply"
+    )
+    print(f"OpenAI calls {results['openai_calls']}, errors {results['openai_errors']}, fallbacks {results['ai_fallbacks']}\n")
+
+    print(f"{'stage':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name in ordered_stages(results["stages"]):
+        stats = results["stages"][name]
+        print(
+            f"{name:<40} {stats['count']:>7} {stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} "
+            f"{stats['p99'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}"
+        )
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print p95 and throughput deltas against the baseline and return the regressions"""
+    regressions = []
+
+    print(f"\n{'stage':<40} {'base p95':>9} {'p95':>9} {'change':>8}")
+    for name in ordered_stages(results["stages"]):
+        if name not in baseline.get("stages", {}):
+            continue
+        before = baseline["stages"][name]["p95"]
+        after = results["stages"][name]["p95"]
+        change = (after - before) / before if before else 0.0
+        # Ignore sub-millisecond movements; they are scheduler noise
+        regressed = change > tolerance and after - before > 0.001
+        if regressed:
+            regressions.append(f"{name} p95 {before * 1000:.1f}ms -> {after * 1000:.1f}ms")
+        print(f"{name:<40} {before * 1000:>9.1f} {after * 1000:>9.1f} {change:>+8.0%}{'  REGRESSED' if regressed else ''}")
+
+    before = baseline["throughput_messages_per_second"]
+    after = results["throughput_messages_per_second"]
+    change = (after - before) / before if before else 0.0
+    if change < -tolerance:
+        regressions.append(f"throughput {before:.1f} -> {after:.1f} msg/s")
+    print(f"{'throughput (msg/s)':<40} {before:>9.1f} {after:>9.1f} {change:>+8.0%}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="present-agent-load-") as scratch_dir:
+        configure_environment(args, scratch_dir)
+        results = asyncio.run(run(args))
+
+    print_report(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.config import ModelRoute
+from app.services.ai_service import AIService
+
+
+class FakeOpenAI:
+    """Local stand-in for the chat completions API, scripted per model"""
+
+    def __init__(self, behaviour):
+        # model -> status code, or a dict to return as the JSON completion body
+        # (or a string to stream as the raw completion)
+        self.behaviour = behaviour
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.calls.append(body["model"])
+        outcome = self.behaviour[body["model"]]
+
+        if isinstance(outcome, int):
+            return httpx.Response(outcome, json={"error": {"message": "boom", "type": "server_error"}})
+
+        if body.get("stream"):
+            # A string outcome is streamed verbatim, so it can be malformed JSON
+            content = outcome if isinstance(outcome, str) else json.dumps(outcome)
+            events = "".join(
+                "data: " + json.dumps({
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + 7]}, "finish_reason": None}]
+                }) + "\n\n"
+                for i in range(0, len(content), 7)
+            )
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, text=events + "data: [DONE]\n\n")
+
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(outcome)}
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+        })
+
+
+def make_service(fake: FakeOpenAI) -> AIService:
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://fake-openai.local/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    )
+    service = AIService(client=client)
+    service.response_cache.enabled = False
+    service.catalog.enabled = False
+    service.routes = {
+        "extract_context": [
+            ModelRoute(model="fast", max_tokens=500, timeout=5),
+            ModelRoute(model="strong", max_tokens=500, timeout=5),
+        ],
+        "generate_recommendations": [ModelRoute(model="strong", max_tokens=1000, timeout=5)],
+    }
+    return service
+
+
+@pytest.mark.asyncio
+async def test_extraction_routes_to_fast_model():
+    """Context extraction uses the first tier and records its usage"""
+    fake = FakeOpenAI({"fast": {"extracted_insights": {"occasion": "birthday"}, "response": "Who is it for?"}})
+    service = make_service(fake)
+
+    result = await service.extract_context_and_respond("it's her birthday", {"turns": []}, {})
+
+    assert result["response"] == "Who is it for?"
+    assert fake.calls == ["fast"]
+    stats = service.stats()["extract_context"]["models"]["fast"]
+    assert stats["calls"] == 1
+    assert stats["prompt_tokens"] == 100
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_next_tier_on_error():
+    """A failing tier falls through to the next one"""
+    fake = FakeOpenAI({"fast": 500, "strong": {"extracted_insights": {}, "response": "Tell me more"}})
+    service = make_service(fake)
+
+    result = await service.extract_context_and_respond("hi", {"turns": []}, {})
+
+    assert result["response"] == "Tell me more"
+    assert fake.calls == ["fast", "strong"]
+    assert service.stats()["extract_context"]["fallbacks"] == 1
+    assert service.stats()["extract_context"]["models"]["fast"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_returns_fallback_response_when_all_tiers_fail():
+    """When every tier fails the canned fallback is returned"""
+    fake = FakeOpenAI({"strong": 503})
+    service = make_service(fake)
+
+    result = await service.generate_recommendations({"turns": []}, {"occasion": "birthday"}, {})
+
+    assert result["fallback"] is True
+    assert result["recommendations"][0]["name"] == "Personalized photo book"
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_api_and_returns_fallback():
+    """Once the error rate trips the breaker, calls go straight to the canned fallback"""
+    fake = FakeOpenAI({"strong": 503})
+    service = make_service(fake)
+    service.settings = service.settings.model_copy(update={"ai_breaker_min_calls": 2, "ai_breaker_cooldown": 60})
+
+    for _ in range(2):
+        await service.generate_recommendations({"turns": []}, {}, {})
+    assert len(fake.calls) == 2
+
+    result = await service.generate_recommendations({"turns": []}, {}, {})
+
+    assert result["fallback"] is True
+    assert len(fake.calls) == 2
+    assert service.stats()["generate_recommendations"]["breaker"]["state"] == "open"
+
+
+@pytest.mark.asyncio
+async def test_recommendations_rank_catalog_candidates(tmp_path):
+    """With a catalog the model only picks candidate IDs; details come from the catalog"""
+    fake = FakeOpenAI({"strong": {
+        "recommendations": [
+            {"product_id": "p001", "reasoning": "She loves gardening"},
+            {"product_id": "made-up", "reasoning": "Not offered"},
+        ],
+        "explanation": "Picked from the list"
+    }})
+    service = make_service(fake)
+    service.catalog.enabled = True
+    service.catalog.index_dir = str(tmp_path)
+
+    result = await service.generate_recommendations(
+        {"turns": []}, {"recipient_type": "mom", "occasion": "birthday", "interests": ["gardening"]}, {}
+    )
+
+    assert [rec["product_id"] for rec in result["recommendations"]] == ["p001"]
+    assert result["recommendations"][0]["name"] == "Heirloom herb garden kit"
+    assert result["recommendations"][0]["estimated_price"] == 32
+    assert result["recommendations"][0]["reasoning"] == "She loves gardening"
+
+
+class FailingEmbedder:
+    name = "failing"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def embed(self, texts):
+        self.calls += 1
+        raise ConnectionError("embeddings API unreachable")
+
+
+@pytest.mark.asyncio
+async def test_recommendations_fall_back_when_catalog_embeddings_fail(tmp_path):
+    """An embeddings outage skips the catalog, and the load isn't retried until the backoff passes"""
+    fake = FakeOpenAI({"strong": 503})
+    service = make_service(fake)
+    service.catalog.enabled = True
+    service.catalog.index_dir = str(tmp_path)
+    service.catalog.embedder = embedder = FailingEmbedder()
+    insights = {"recipient_type": "mom", "interests": ["gardening"]}
+
+    result = await service.generate_recommendations({"turns": []}, insights, {})
+    again = await service.generate_recommendations({"turns": []}, insights, {})
+
+    assert result["fallback"] is True
+    assert again["fallback"] is True
+    assert embedder.calls == 1
+    assert not service.catalog.loaded
+
+
+@pytest.mark.asyncio
+async def test_streamed_recommendations_are_handed_over_as_they_close():
+    """Each recommendation reaches the callback on its own, and a broken tail keeps the earlier ones"""
+    recommendations = [{"name": f"Idea {n}", "description": "d", "reasoning": "r"} for n in range(3)]
+    fake = FakeOpenAI({"strong": {"recommendations": recommendations, "explanation": "e"}})
+    service = make_service(fake)
+    received = []
+
+    async def on_recommendation(recommendation):
+        received.append(recommendation["name"])
+
+    result = await service.generate_recommendations({"turns": []}, {}, {}, on_recommendation=on_recommendation)
+
+    assert received == ["Idea 0", "Idea 1", "Idea 2"]
+    assert result["explanation"] == "e"
+
+    fake.behaviour["strong"] = '{"recommendations": [{"name": "Idea 0"}, {"name": "Idea 1"}, {"name": "Ide'
+    received.clear()
+
+    result = await service.generate_recommendations({"turns": []}, {}, {}, on_recommendation=on_recommendation)
+
+    assert received == ["Idea 0", "Idea 1"]
+    assert result["partial"] is True
+    assert [rec["name"] for rec in result["recommendations"]] == ["Idea 0", "Idea 1"]
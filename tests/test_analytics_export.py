@@ -0,0 +1,88 @@
+import uuid
+from datetime import datetime, timezone
+
+import pyarrow.dataset as ds
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.analytics import export as analytics_export
+from app.database import Base
+from app.models import GiftSession, User
+
+
+async def seed(url):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        user_id = uuid.uuid4()
+        await conn.execute(User.__table__.insert().values(
+            id=user_id, instagram_id="ig-1", name="Sam", email="sam@example.com",
+            values={"sustainability": True}, created_at=datetime(2024, 5, 30, tzinfo=timezone.utc)
+        ))
+        await conn.execute(GiftSession.__table__.insert(), [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "platform": "instagram",
+                # One active session per user; the others are finished
+                "status": "active" if i == 4 else "completed",
+                "extracted_insights": {"recipient_type": "mom", "interests": ["gardening"]},
+                "recommendations_given": [{"name": "Seed kit", "product_id": "p1", "estimated_price": "25"}],
+                "user_constraints": {"international_shipping": True},
+                "created_at": datetime(2024, 5 + i % 2, 1 + i, tzinfo=timezone.utc),
+            }
+            for i in range(5)
+        ])
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_export_flattens_json_into_partitioned_parquet(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    await seed(url)
+    output = tmp_path / "export"
+
+    totals = await analytics_export.export(str(output), list(analytics_export.EXPORTS), batch_size=2, database_url=url)
+
+    assert totals == {"gift_sessions": 5, "users": 1}
+    assert {p.name for p in (output / "gift_sessions").iterdir()} == {"created_month=2024-05", "created_month=2024-06"}
+
+    sessions = ds.dataset(output / "gift_sessions", format="parquet", partitioning="hive").to_table().to_pylist()
+    assert len(sessions) == 5
+    assert sessions[0]["insight_interests"] == ["gardening"]
+    assert sessions[0]["recommended_product_ids"] == ["p1"]
+    assert sessions[0]["recommended_prices"] == [25.0]
+    assert sessions[0]["constraint_international_shipping"] is True
+
+    users = ds.dataset(output / "users", format="parquet", partitioning="hive").to_table()
+    assert "email" not in users.column_names and "name" not in users.column_names
+    assert users.column("values_sustainability").to_pylist() == [True]
+
+
+@pytest.mark.asyncio
+async def test_export_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """An interrupted export continues after the last written batch without duplicates"""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    await seed(url)
+    output = tmp_path / "export"
+
+    write_batch = analytics_export.write_batch
+
+    def failing_write(output_dir, name, batch_number, rows, schema):
+        if batch_number == 1:
+            raise OSError("disk full")
+        write_batch(output_dir, name, batch_number, rows, schema)
+
+    monkeypatch.setattr(analytics_export, "write_batch", failing_write)
+    with pytest.raises(OSError):
+        await analytics_export.export(str(output), ["gift_sessions"], batch_size=2, database_url=url)
+
+    checkpoint = analytics_export.Checkpoint(str(output)).table("gift_sessions")
+    assert (checkpoint["batches"], checkpoint["rows"], checkpoint["done"]) == (1, 2, False)
+
+    monkeypatch.setattr(analytics_export, "write_batch", write_batch)
+    totals = await analytics_export.export(str(output), ["gift_sessions"], batch_size=2, database_url=url)
+
+    assert totals == {"gift_sessions": 5}
+    ids = ds.dataset(output / "gift_sessions", format="parquet", partitioning="hive").to_table().column("id").to_pylist()
+    assert len(ids) == len(set(ids)) == 5
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.services.catalog import ProductCatalog, VectorIndex
+from app.services.embedding_service import HashingEmbedder
+
+
+def test_vector_index_returns_top_k_best_first():
+    """Search returns the k most similar rows in descending order, honouring the mask"""
+    vectors = np.eye(4, dtype=np.float32)
+    index = VectorIndex(vectors)
+    query = np.array([0.1, 0.9, 0.5, 0.0], dtype=np.float32)
+
+    assert [row for row, _ in index.search(query, 2)] == [1, 2]
+    assert [row for row, _ in index.search(query, 2, mask=np.array([True, False, True, False]))] == [2, 0]
+    assert index.search(query, 3, mask=np.zeros(4, dtype=bool)) == []
+
+
+@pytest.mark.asyncio
+async def test_hashing_embedder_is_deterministic_and_normalized():
+    """Same text, same unit vector; related words overlap"""
+    embedder = HashingEmbedder(dimensions=128)
+    vectors = await embedder.embed(["gardening lover", "gardening lover", "garden", "video games"])
+
+    assert vectors.shape == (4, 128)
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[2] > vectors[0] @ vectors[3]
+
+
+@pytest.mark.asyncio
+async def test_catalog_search_and_persisted_index(tmp_path):
+    """Queries find matching products, and the saved index is memory-mapped on reload"""
+    catalog = ProductCatalog()
+    catalog.index_dir = str(tmp_path)
+
+    results = await catalog.search("jazz records music", k=3)
+
+    assert len(results) == 3
+    assert "jazz" in results[0][0].interests
+    assert len(list(tmp_path.glob("catalog-*.npy"))) == 1
+
+    reloaded = ProductCatalog()
+    reloaded.index_dir = str(tmp_path)
+    await reloaded.load()
+    assert isinstance(reloaded.index.vectors, np.memmap)
+    assert reloaded.get(results[0][0].id) == results[0][0]
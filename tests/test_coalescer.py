@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.integrations.instagram import merge_messaging_events
+from app.utils.coalescer import MessageCoalescer
+
+
+def make_coalescer(sink, **overrides) -> MessageCoalescer:
+    options = dict(window=0.05, max_wait=1.0, max_items=10, max_keys=10)
+    options.update(overrides)
+    return MessageCoalescer("test", sink=lambda key, item: sink.append((key, item)), merge=list, **options)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_merges_burst_per_key():
+    """Items arriving within the window are flushed together, per key"""
+    flushed = []
+    coalescer = make_coalescer(flushed)
+    await coalescer.start()
+
+    for n in range(3):
+        coalescer.add("alice", n)
+        await asyncio.sleep(0.01)
+    coalescer.add("bob", 0)
+    assert flushed == []
+
+    await asyncio.sleep(0.1)
+    assert sorted(flushed) == [("alice", [0, 1, 2]), ("bob", [0])]
+    assert coalescer.stats()["pending"] == 0
+    await coalescer.stop()
+
+
+@pytest.mark.asyncio
+async def test_coalescer_flushes_at_max_wait_and_max_items():
+    """A steady stream is cut by max_wait, and a long burst by max_items"""
+    flushed = []
+    coalescer = make_coalescer(flushed, window=0.05, max_wait=0.12, max_items=3)
+    await coalescer.start()
+
+    for n in range(5):
+        coalescer.add("alice", n)
+        await asyncio.sleep(0.04)
+    assert flushed[0] == ("alice", [0, 1, 2])
+
+    coalescer.add("bob", "a")
+    coalescer.add("bob", "b")
+    coalescer.add("bob", "c")
+    assert flushed[-1] == ("bob", ["a", "b", "c"])
+    await coalescer.stop()
+
+
+@pytest.mark.asyncio
+async def test_coalescer_stop_flushes_pending():
+    """Stopping hands pending bursts to the sink instead of dropping them"""
+    flushed = []
+    coalescer = make_coalescer(flushed, window=10.0, max_wait=10.0)
+    await coalescer.start()
+    coalescer.add("alice", 1)
+    await coalescer.stop()
+
+    assert flushed == [("alice", [1])]
+    with pytest.raises(RuntimeError):
+        coalescer.add("alice", 2)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_retries_when_sink_full():
+    """A burst the sink rejects stays buffered and is retried"""
+    flushed = []
+    full = [True]
+
+    def sink(key, item):
+        if full[0]:
+            raise asyncio.QueueFull()
+        flushed.append((key, item))
+
+    coalescer = MessageCoalescer("test", sink=sink, merge=list, window=0.02, max_wait=0.02)
+    await coalescer.start()
+    coalescer.add("alice", 1)
+    await asyncio.sleep(0.03)
+    assert flushed == [] and coalescer.pending == 1
+
+    full[0] = False
+    await asyncio.sleep(0.05)
+    assert flushed == [("alice", [1])]
+    await coalescer.stop()
+
+
+def test_merge_messaging_events():
+    """Texts are joined in order and the message IDs kept"""
+    events = [
+        {"sender": {"id": "u1"}, "timestamp": n, "message": {"mid": f"m{n}", "text": text}}
+        for n, text in enumerate(["it's for my mom ", "her birthday", "she loves plants"])
+    ]
+
+    merged = merge_messaging_events(events)
+
+    assert merged["timestamp"] == 2
+    assert merged["message"]["text"] == "it's for my mom\nher birthday\nshe loves plants"
+    assert merged["message"]["coalesced_mids"] == ["m0", "m1", "m2"]
+    assert merge_messaging_events(events[:1]) is events[0]
@@ -0,0 +1,78 @@
+import pytest
+
+from app.services.catalog import Product, ProductCatalog
+from app.services.constraint_index import ConstraintIndex, HardConstraints, parse_budget_hint
+
+
+def make_products():
+    return [
+        Product(id="a", name="Herb kit", description="", price=30, occasions=["birthday"], relationships=["mom"],
+                sustainable=True, ships_international=True, delivery_days=4),
+        Product(id="b", name="Jazz night", description="", price=140, occasions=["anniversary"], relationships=["partner"],
+                delivery_days=1),
+        Product(id="c", name="Candles", description="", price=36, occasions=["any"], relationships=["any"],
+                sustainable=True, delivery_days=3),
+    ]
+
+
+def ids(index: ConstraintIndex, constraints: HardConstraints):
+    return ["abc"[row] for row in index.mask(constraints).nonzero()[0]]
+
+
+@pytest.mark.parametrize("hint, expected", [
+    ("under $50", (None, 50.0)),
+    ("at least $100", (100.0, None)),
+    ("$30-60", (30.0, 60.0)),
+    ("around $100", (60.0, 120.0)),
+    ("not sure", (None, None)),
+    (None, (None, None)),
+])
+def test_parse_budget_hint(hint, expected):
+    """Budget hints become a price range"""
+    assert parse_budget_hint(hint) == expected
+
+
+def test_constraints_from_context():
+    """Explicit budget wins over hints; aliases map onto catalog tags"""
+    constraints = HardConstraints.from_context(
+        {"recipient_type": "Mother", "occasion": "Mother's Day", "budget_hints": "under $20"},
+        (None, 80),
+        {"international_shipping": True, "max_delivery_days": "5"},
+        {"sustainability": True}
+    )
+
+    assert (constraints.budget_min, constraints.budget_max) == (None, 80)
+    assert constraints.relationship == "mom"
+    assert constraints.occasion == "mothers_day"
+    assert constraints.max_delivery_days == 5
+    assert constraints.personal
+
+
+def test_mask_intersects_every_constraint():
+    """Each constraint narrows the mask; 'any' tags and unknown tags never exclude"""
+    index = ConstraintIndex(make_products())
+
+    assert ids(index, HardConstraints()) == ["a", "b", "c"]
+    assert ids(index, HardConstraints(budget_max=50)) == ["a", "c"]
+    assert ids(index, HardConstraints(budget_min=100)) == ["b"]
+    assert ids(index, HardConstraints(relationship="mom")) == ["a", "c"]
+    assert ids(index, HardConstraints(occasion="anniversary")) == ["b", "c"]
+    assert ids(index, HardConstraints(occasion="bar mitzvah")) == ["a", "b", "c"]
+    assert ids(index, HardConstraints(international_shipping=True)) == ["a"]
+    assert ids(index, HardConstraints(sustainable_only=True, max_delivery_days=3)) == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_catalog_search_respects_constraints(tmp_path):
+    """Constrained search only returns products within budget, relaxing tag fit if nothing matches"""
+    catalog = ProductCatalog()
+    catalog.index_dir = str(tmp_path)
+    await catalog.load()
+
+    mask = catalog.mask_for(HardConstraints(budget_max=40, relationship="mom"))
+    results = await catalog.search("gardening cooking", k=5, mask=mask)
+    assert results and all(product.price <= 40 for product, _ in results)
+
+    relaxed = catalog.mask_for(HardConstraints(budget_max=25, occasion="wedding", relationship="child"))
+    assert relaxed.any()
+    assert all(catalog.products[row].price <= 25 for row in relaxed.nonzero()[0])
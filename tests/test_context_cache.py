@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect
+
+from app.models import User, GiftSession
+from app.services.context_cache import restore, snapshot
+
+
+def test_snapshot_round_trip_restores_clean_detached_objects():
+    """Snapshots restore typed values with no pending changes"""
+    user = User(
+        id=uuid.uuid4(),
+        instagram_id="ig-1",
+        preferences={"style": "practical"},
+        total_conversations=3,
+        last_active=datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+    )
+
+    restored = restore(User, snapshot(user))
+    state = inspect(restored)
+
+    assert state.detached
+    assert not state.modified
+    assert restored.id == user.id
+    assert restored.last_active == user.last_active
+    assert restored.preferences == {"style": "practical"}
+    # Columns absent from the snapshot are None, never expired
+    assert restored.name is None
+    assert not state.expired_attributes
+
+
+def test_restored_session_tracks_later_changes():
+    """Changes after restore are flushed as normal updates"""
+    session = GiftSession(id=uuid.uuid4(), user_id=uuid.uuid4(), platform="instagram", status="active")
+
+    restored = restore(GiftSession, snapshot(session))
+    restored.occasion = "birthday"
+
+    assert inspect(restored).attrs.occasion.history.added == ["birthday"]
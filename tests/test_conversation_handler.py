@@ -0,0 +1,152 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base, async_database_url
+from app.models import GiftSession, User
+from app.services.conversation_handler import FIRST_IDEA_INTRO, ConversationHandler, build_ingest_statement
+
+# Scratch PostgreSQL database for the ingest upsert tests; its tables are
+# dropped and recreated, so never point this at real data
+POSTGRES_URL = os.environ.get("TEST_DATABASE_URL")
+requires_postgres = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_DATABASE_URL is not set")
+
+
+async def make_engine(url):
+    engine = create_async_engine(async_database_url(url))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+def test_ingest_statement_is_single_upsert_with_session():
+    """User upsert and active session lookup compile into one statement"""
+    sql = str(build_ingest_statement("ig-123", "instagram").compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO users") == 1
+    assert "ON CONFLICT (instagram_id) DO UPDATE" in sql
+    assert "INSERT INTO gift_sessions" in sql
+    assert "RETURNING" in sql
+
+
+def test_ingest_statement_rejects_unknown_platform():
+    """Unsupported platforms are refused"""
+    with pytest.raises(ValueError):
+        build_ingest_statement("123", "sms")
+
+
+@requires_postgres
+@pytest.mark.asyncio
+async def test_ingest_statement_returns_user_and_session():
+    """The upsert maps to (User, GiftSession) and reuses both on the next message"""
+    engine = await make_engine(POSTGRES_URL)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with factory() as db:
+        user, session = (await db.execute(build_ingest_statement("ig-123", "instagram"))).one()
+        await db.commit()
+    async with factory() as db:
+        same_user, same_session = (await db.execute(build_ingest_statement("ig-123", "instagram"))).one()
+        await db.commit()
+
+    assert isinstance(user, User) and isinstance(session, GiftSession)
+    assert user.instagram_id == "ig-123"
+    assert session.user_id == user.id and session.status == "active"
+    assert (same_user.id, same_session.id) == (user.id, session.id)
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [
+    "sqlite",
+    pytest.param("postgresql", marks=requires_postgres),
+])
+async def test_concurrent_first_messages_from_one_sender_both_succeed(backend, tmp_path):
+    """First messages racing to create the same user end up with one user and one active session"""
+    url = POSTGRES_URL if backend == "postgresql" else f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    engine = await make_engine(url)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    handler = ConversationHandler()
+
+    async def first_message(sender):
+        async with factory() as db:
+            return await handler.load_user_and_session(db, sender, "instagram")
+
+    # Enough senders that PostgreSQL switches the statement to a generic plan
+    for sender in ("ig-a", "ig-b", "ig-c"):
+        results = await asyncio.gather(*(first_message(sender) for _ in range(5)))
+
+        assert len({user.id for user, _, _ in results}) == 1
+        assert len({session.id for _, session, _ in results}) == 1
+
+    async with factory() as db:
+        active = (await db.execute(
+            select(GiftSession.user_id, func.count()).where(GiftSession.status == "active").group_by(GiftSession.user_id)
+        )).all()
+    assert [count for _, count in active] == [1, 1, 1]
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cached_turns_replace_the_history_query():
+    """Turns from the context cache are used as is when they are the ones the query would return"""
+    handler = ConversationHandler()
+    handler.history_turns = 2
+    session = GiftSession(id=uuid.uuid4(), turn_count=3, conversation_context={"summarized_through": 0})
+    turns = [{"seq": seq, "user_message": f"m{seq}", "bot_response": f"r{seq}"} for seq in (1, 2, 3)]
+
+    # No database: a query would fail
+    context = await handler.load_session_context(None, session, turns)
+
+    assert [turn["seq"] for turn in context["turns"]] == [2, 3]
+    assert context["summarized_through"] == 1
+    assert "m1" in context["summary"]
+
+    # The summary moved on, so the same turns now start too early and the query runs
+    with pytest.raises(AttributeError):
+        await handler.load_session_context(None, session, turns)
+
+
+class StreamingAIService:
+    """Hands each recommendation to the callback before returning them all"""
+
+    def __init__(self, recommendations):
+        self.recommendations = recommendations
+
+    async def generate_recommendations(self, on_recommendation=None, **kwargs):
+        if on_recommendation is not None:
+            for recommendation in self.recommendations:
+                await on_recommendation(recommendation)
+        return {"recommendations": self.recommendations}
+
+
+@pytest.mark.asyncio
+async def test_first_recommendation_is_sent_ahead_of_the_reply():
+    """With send_early the first idea goes out alone and the reply carries on from the second"""
+    handler = ConversationHandler()
+    handler.recommendation_cache.enabled = False
+    handler.ai_service = StreamingAIService([
+        {"name": f"Idea {n}", "description": "d", "reasoning": "r"} for n in range(1, 4)
+    ])
+    user = User(instagram_id="ig-1", preferences={}, values={})
+    session = GiftSession(platform="instagram", turn_count=3, extracted_insights={"occasion": "birthday"})
+    sent = []
+
+    async def send_early(text):
+        sent.append(text)
+
+    response = await handler.handle_recommendation_request(user, session, "ideas?", {}, send_early)
+
+    assert len(sent) == 1
+    assert sent[0].startswith(FIRST_IDEA_INTRO)
+    assert "1. **Idea 1**" in sent[0]
+    assert "Idea 1" not in response
+    assert "2. **Idea 2**" in response and "3. **Idea 3**" in response
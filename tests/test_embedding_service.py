@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import httpx
+import numpy as np
+import pytest
+from openai import AsyncOpenAI
+
+from app.services.embedding_service import EmbeddingService, EmbeddingStore
+
+
+class FakeEmbeddingsAPI:
+    """Local stand-in for the embeddings endpoint that records each request's inputs"""
+
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body["input"])
+        if self.status != 200:
+            return httpx.Response(self.status, json={"error": {"message": "boom", "type": "server_error"}})
+        return httpx.Response(200, json={
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [float(len(text)), 1.0, 0.0]}
+                for i, text in enumerate(body["input"])
+            ],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1}
+        })
+
+
+def make_service(fake: FakeEmbeddingsAPI, store_path=None) -> EmbeddingService:
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://fake-openai.local/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    )
+    service = EmbeddingService(client=client)
+    service.store = EmbeddingStore(str(store_path)) if store_path else None
+    return service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    """Concurrent embed() calls become a single API request with each text once"""
+    fake = FakeEmbeddingsAPI()
+    service = make_service(fake)
+
+    results = await asyncio.gather(
+        service.embed(["gardening"]),
+        service.embed(["jazz", "gardening"]),
+        service.embed(["cooking"]),
+    )
+
+    assert len(fake.requests) == 1
+    assert sorted(fake.requests[0]) == ["cooking", "gardening", "jazz"]
+    assert np.allclose(results[0][0], results[1][1])
+    assert np.allclose(np.linalg.norm(results[1], axis=1), 1.0)
+
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_at_batch_size():
+    """More texts than batch_size are split across requests"""
+    fake = FakeEmbeddingsAPI()
+    service = make_service(fake)
+    service.batch_size = 2
+
+    vectors = await service.embed(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert vectors.shape == (5, 3)
+    assert [len(batch) for batch in fake.requests] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_persistent_cache_avoids_reembedding(tmp_path):
+    """Texts are embedded once, then served from memory or the SQLite store"""
+    fake = FakeEmbeddingsAPI()
+    service = make_service(fake, tmp_path / "embeddings.sqlite")
+    first = await service.embed(["gardening", "jazz"])
+    await service.embed(["jazz"])
+    assert len(fake.requests) == 1
+    assert service.stats()["memory_hits"] == 1
+    # The store is written in the background after callers get their vectors
+    await asyncio.gather(*service._tasks)
+
+    restarted = make_service(fake, tmp_path / "embeddings.sqlite")
+    again = await restarted.embed(["gardening", "jazz"])
+
+    assert len(fake.requests) == 1
+    assert restarted.stats()["store_hits"] == 2
+    assert np.allclose(first, again)
+
+
+@pytest.mark.asyncio
+async def test_api_errors_propagate_to_every_waiter():
+    """A failed batch fails each caller rather than returning vectors from another model"""
+    service = make_service(FakeEmbeddingsAPI(status=500))
+
+    results = await asyncio.gather(service.embed(["a"]), service.embed(["b"]), return_exceptions=True)
+
+    assert all(isinstance(result, Exception) for result in results)
+    assert service._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_local_provider_without_api_key():
+    """Without a client or API key the deterministic local model is used"""
+    service = EmbeddingService()
+
+    assert service.local
+    vectors = await service.embed(["gardening", "gardening"])
+    assert vectors.shape == (2, service.dimensions)
+    assert np.allclose(vectors[0], vectors[1])
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_leaves_shared_request_to_the_others():
+    """Cancelling one of two callers waiting on the same text doesn't cancel the other"""
+    fake = FakeEmbeddingsAPI()
+    service = make_service(fake)
+    service.batch_window = 0.05
+
+    cancelled = asyncio.create_task(service.embed(["gardening"]))
+    waiting = asyncio.create_task(service.embed(["gardening"]))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    vectors = await waiting
+
+    assert cancelled.cancelled()
+    assert vectors.shape == (1, 3)
+    assert len(fake.requests) == 1
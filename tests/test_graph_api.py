@@ -0,0 +1,147 @@
+import json
+import time
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.integrations.graph_api import GraphAPIClient, MessagePriority, SendOutbox, parse_usage
+
+
+def make_settings(**overrides) -> Settings:
+    defaults = dict(
+        instagram_access_token="test-token",
+        graph_api_http2=False,
+        outbox_workers=2,
+        outbox_max_attempts=3,
+        outbox_backoff_base=0.001,
+        outbox_backoff_max=0.002,
+        outbox_throttle_backoff_max=0.002
+    )
+    defaults.update(overrides)
+    return Settings(**defaults)
+
+
+class FakeGraphAPI:
+    """Local stand-in for graph.facebook.com that replays scripted status codes"""
+
+    def __init__(self, statuses, headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = {"message_id": "m1"} if status == 200 else {"error": {}}
+        return httpx.Response(status, json=body, headers=self.headers)
+
+
+async def run_outbox(fake: FakeGraphAPI, settings: Settings, messages):
+    client = GraphAPIClient(settings, transport=httpx.MockTransport(fake))
+    outbox = SendOutbox(settings)
+    await outbox.start(client)
+    for recipient_id, text, *priority in messages:
+        outbox.enqueue(recipient_id, text, *priority)
+    await outbox.stop()
+    await client.close()
+    return outbox
+
+
+@pytest.mark.asyncio
+async def test_outbox_retries_transient_errors():
+    """5xx responses are retried until the send succeeds"""
+    fake = FakeGraphAPI([503, 502, 200])
+    outbox = await run_outbox(fake, make_settings(), [("user-1", "hello")])
+
+    assert len(fake.requests) == 3
+    assert outbox.sent == 1
+    assert outbox.retried == 2
+    assert fake.requests[0].headers["Authorization"] == "Bearer test-token"
+    assert fake.requests[0].url.path.endswith("/me/messages")
+
+
+@pytest.mark.asyncio
+async def test_outbox_does_not_retry_client_errors():
+    """4xx responses are dropped without retrying"""
+    fake = FakeGraphAPI([400])
+    outbox = await run_outbox(fake, make_settings(), [("user-1", "hello")])
+
+    assert len(fake.requests) == 1
+    assert outbox.sent == 0
+    assert outbox.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_outbox_gives_up_after_max_attempts():
+    """Persistent 5xx responses stop after the configured attempts"""
+    fake = FakeGraphAPI([500, 500, 500, 500])
+    outbox = await run_outbox(fake, make_settings(), [("user-1", "hello")])
+
+    assert len(fake.requests) == 3
+    assert outbox.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_outbox_keeps_order_per_recipient():
+    """Messages to the same recipient are delivered in order"""
+    fake = FakeGraphAPI([503])
+    messages = [("user-1", f"message {n}") for n in range(4)]
+    await run_outbox(fake, make_settings(), messages)
+
+    sent_texts = [request.read().decode() for request in fake.requests[1:]]
+    assert [f"message {n}" in text for n, text in enumerate(sent_texts)] == [True] * 4
+
+
+@pytest.mark.asyncio
+async def test_outbox_retries_rate_limited_sends():
+    """429s and rate-limit error codes are retried without using up attempts"""
+    fake = FakeGraphAPI([429, 429, 429])
+    outbox = await run_outbox(fake, make_settings(outbox_max_attempts=1), [("user-1", "hello")])
+
+    assert len(fake.requests) == 4
+    assert outbox.sent == 1
+    assert outbox.throttled == 3
+
+    # Graph API also reports rate limits as a 400 with a throttling error code
+    responses = [httpx.Response(400, json={"error": {"code": 613, "message": "Calls exceeded"}})]
+    outbox = await run_outbox(
+        lambda request: responses.pop(0) if responses else httpx.Response(200, json={"message_id": "m1"}),
+        make_settings(),
+        [("user-1", "hello")]
+    )
+    assert outbox.throttled == 1
+    assert outbox.sent == 1
+
+
+@pytest.mark.asyncio
+async def test_outbox_sends_replies_before_notices():
+    """Queued replies jump ahead of canned notices for other recipients"""
+    fake = FakeGraphAPI([])
+    messages = [(f"user-{n}", f"notice {n}", MessagePriority.NOTICE) for n in range(3)]
+    messages += [(f"user-{n}", f"reply {n}") for n in range(3, 6)]
+    await run_outbox(fake, make_settings(outbox_workers=1), messages)
+
+    sent = [json.loads(request.read())["message"]["text"] for request in fake.requests]
+    assert sent == ["reply 3", "reply 4", "reply 5", "notice 0", "notice 1", "notice 2"]
+
+
+@pytest.mark.asyncio
+async def test_outbox_slows_down_on_usage_headers():
+    """High reported usage lowers the send rate and a regain estimate pauses sending"""
+    usage = {"123": [{"type": "instagram", "call_count": 95, "total_time": 20, "estimated_time_to_regain_access": 0}]}
+    fake = FakeGraphAPI([], headers={"X-Business-Use-Case-Usage": json.dumps(usage)})
+    settings = make_settings(outbox_rate_limit=100.0, outbox_throttle_usage=75.0, outbox_min_rate_fraction=0.1)
+    outbox = await run_outbox(fake, settings, [("user-1", "hello")])
+
+    # 95% is four fifths of the way from the 75% threshold to the limit
+    assert outbox.limiter.rate == pytest.approx(20.0)
+
+    headers = httpx.Headers({"X-App-Usage": json.dumps({"call_count": 100, "estimated_time_to_regain_access": 2})})
+    assert parse_usage(headers) == (100.0, 120.0)
+    assert parse_usage(httpx.Headers({})) == (None, 0.0)
+
+    started = time.monotonic()
+    outbox.limiter.pause(0.05)
+    await outbox.limiter.acquire()
+    assert time.monotonic() - started >= 0.045
@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models import GiftSession, User
+from app.models.json_document import json_append, json_merge, json_set_key
+
+
+def test_partial_updates_compile_to_jsonb_operators():
+    """On PostgreSQL the helpers are || merges and jsonb_set, not whole-document writes"""
+    def compile_values(expression):
+        statement = update(GiftSession).values(extracted_insights=expression)
+        return str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "COALESCE(gift_sessions.extracted_insights, '{}'::jsonb) ||" in compile_values(
+        json_merge(GiftSession.extracted_insights, {"occasion": "birthday"})
+    )
+    assert "jsonb_set(" in compile_values(json_set_key(GiftSession.extracted_insights, "occasion", "birthday"))
+    assert "|| jsonb_build_array(" in compile_values(json_append(GiftSession.extracted_insights, [{"name": "Mug"}]))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_partial_updates_keep_each_others_keys(tmp_path):
+    """Two writers holding stale copies of a session each change only their own keys"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    user_id, session_id = uuid.uuid4(), uuid.uuid4()
+    async with factory() as db:
+        db.add(User(id=user_id, instagram_id="ig-1"))
+        session = GiftSession(id=session_id, user_id=user_id, platform="instagram")
+        # Not inserted yet: applied in memory and written by the INSERT
+        session.update_insights({"recipient_type": "mom"})
+        db.add(session)
+        await db.commit()
+
+    async with factory() as first_db, factory() as second_db:
+        first = await first_db.get(GiftSession, session_id)
+        second = await second_db.get(GiftSession, session_id)
+
+        first.update_insights({"occasion": "birthday"})
+        first.add_recommendations([{"name": "Mug"}])
+        await first_db.commit()
+
+        # Two changes to one column are written as one nested expression
+        second.set_json_key("extracted_insights", "interests", ["gardening"])
+        second.update_insights({"budget_hints": "under $40"})
+        second.add_recommendations([{"name": "Seeds"}, {"name": "Gloves"}])
+        await second_db.commit()
+
+        # The in-memory copy stays loaded and reflects only this writer's view
+        assert second.extracted_insights == {
+            "recipient_type": "mom", "interests": ["gardening"], "budget_hints": "under $40"
+        }
+
+    async with factory() as db:
+        row = (await db.execute(
+            select(GiftSession.extracted_insights, GiftSession.recommendations_given)
+            .where(GiftSession.id == session_id)
+        )).one()
+
+    assert row.extracted_insights == {
+        "recipient_type": "mom", "occasion": "birthday", "interests": ["gardening"], "budget_hints": "under $40"
+    }
+    assert [rec["name"] for rec in row.recommendations_given] == ["Mug", "Seeds", "Gloves"]
+
+    await engine.dispose()
@@ -0,0 +1,33 @@
+import json
+
+from app.utils.json_stream import JSONArrayStream
+
+
+def feed_in_chunks(document: str, size: int, key: str = "recommendations"):
+    parser = JSONArrayStream(key)
+    completed = []
+    for start in range(0, len(document), size):
+        completed.extend(parser.feed(document[start:start + size]))
+    return completed
+
+
+def test_array_elements_are_returned_whatever_the_chunking():
+    """Objects in the keyed array come out whole, ignoring braces in strings and other keys"""
+    document = json.dumps({
+        "explanation": "brackets [ { in text",
+        "recommendations": [{"name": 'Mug "}" set', "tags": [1, {"x": 2}]}, 3, {"name": "Seeds"}],
+        "other": [{"name": "skipped"}],
+    })
+
+    for size in (1, 5, len(document)):
+        assert feed_in_chunks(document, size) == [
+            {"name": 'Mug "}" set', "tags": [1, {"x": 2}]},
+            {"name": "Seeds"},
+        ]
+
+
+def test_truncated_document_keeps_completed_elements():
+    """Elements closed before the stream broke off are still returned"""
+    document = '{"recommendations": [{"name": "Mug"}, {"name": "Seeds", "description": "unterminat'
+
+    assert feed_in_chunks(document, 4) == [{"name": "Mug"}]
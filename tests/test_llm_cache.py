@@ -0,0 +1,48 @@
+import pytest
+
+from app.services.llm_cache import LLMResponseCache
+
+
+def test_cache_key_depends_on_all_parameters():
+    """Any change to model, messages or sampling parameters changes the key"""
+    messages = [{"role": "user", "content": "gift for mom"}]
+    key = LLMResponseCache.make_key("gpt-4-turbo", messages, 0.7, 500)
+
+    assert key == LLMResponseCache.make_key("gpt-4-turbo", list(messages), 0.7, 500)
+    assert key != LLMResponseCache.make_key("gpt-4-turbo", messages, 0.8, 500)
+    assert key != LLMResponseCache.make_key("gpt-4-turbo", messages, 0.7, 1000)
+    assert key != LLMResponseCache.make_key("gpt-3.5-turbo", messages, 0.7, 500)
+
+
+@pytest.mark.asyncio
+async def test_cache_counts_hits_and_misses_per_operation():
+    """Lookups are counted per operation"""
+    cache = LLMResponseCache()
+    cache.use_redis = False
+
+    assert await cache.get("extract_context", "k") is None
+    await cache.set("extract_context", "k", {"response": "hi"})
+    assert await cache.get("extract_context", "k") == {"response": "hi"}
+
+    assert cache.stats()["hits"] == {"extract_context": 1}
+    assert cache.stats()["misses"] == {"extract_context": 1}
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used_and_expired():
+    """The local tier is bounded and honours TTLs"""
+    cache = LLMResponseCache()
+    cache.use_redis = False
+    cache.max_entries = 2
+
+    await cache.set("extract_context", "a", 1)
+    await cache.set("extract_context", "b", 2)
+    await cache.get("extract_context", "a")
+    await cache.set("extract_context", "c", 3)
+
+    assert await cache.get("extract_context", "b") is None
+    assert await cache.get("extract_context", "a") == 1
+
+    cache.ttls["extract_context"] = -1
+    await cache.set("extract_context", "d", 4)
+    assert await cache.get("extract_context", "d") is None
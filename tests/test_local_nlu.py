@@ -0,0 +1,123 @@
+import pytest
+
+from app.models import GiftSession, User
+from app.services.conversation_handler import ConversationHandler
+from app.services.local_nlu import extract
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("my mom's birthday, under $50", dict(recipient_type="mom", occasion="birthday", budget_min=None, budget_max=50)),
+    ("Gift for my sister Anna's graduation, between $20 and $40",
+     dict(recipient_type="sister", recipient_name="Anna", occasion="graduation", budget_min=20, budget_max=40)),
+    ("Christmas present for my coworker, $20-30", dict(recipient_type="colleague", occasion="christmas", budget_max=30)),
+    ("anniversary gift for my husband, $1.5k max", dict(recipient_type="husband", budget_min=None, budget_max=1500)),
+    ("$100+ for my boss", dict(recipient_type="boss", budget_min=100, budget_max=None)),
+    ("something for my friend around 30 bucks", dict(recipient_type="friend", budget_min=18, budget_max=36)),
+])
+def test_extract_recipient_occasion_and_budget(message, expected):
+    """Relationships, occasions, names and budgets come out of plain messages"""
+    result = extract(message)
+
+    for field, value in expected.items():
+        assert getattr(result, field) == value, field
+    assert result.confident(0.8)
+
+
+def test_extract_avoids_false_matches():
+    """Occasion names, ages and several recipients don't produce wrong fields"""
+    mothers_day = extract("mother's day for my wife")
+    assert (mothers_day.occasion, mothers_day.recipient_type) == ("mothers day", "wife")
+
+    # An age is not a budget; the number after "budget" is
+    ages = extract("my dad turns 70 next month, budget 100")
+    assert (ages.budget_min, ages.budget_max) == (60, 120)
+    assert not ages.confident(0.8)
+
+    assert extract("my mom and my sister").ambiguous
+    assert not extract("she loves gardening and jazz").found
+
+
+class FakeAIService:
+    def __init__(self, insights=None):
+        self.insights = insights or {}
+        self.calls = 0
+
+    async def extract_context_and_respond(self, message, session_context, user_preferences):
+        self.calls += 1
+        return {"extracted_insights": self.insights, "response": "What do they enjoy?"}
+
+
+def make_conversation(turn_count, insights=None):
+    user = User(instagram_id="ig-1", preferences={}, total_conversations=1)
+    session = GiftSession(platform="instagram", turn_count=turn_count, extracted_insights=insights or {})
+    return user, session
+
+
+@pytest.mark.asyncio
+async def test_confident_extraction_skips_the_model():
+    """A fully understood message is answered with a follow-up question, without the model"""
+    handler = ConversationHandler()
+    handler.ai_service = FakeAIService()
+    user, session = make_conversation(turn_count=1)
+
+    response = await handler.generate_response(user, session, "my mom's birthday, under $50", {})
+
+    assert handler.ai_service.calls == 0
+    assert response.startswith("What does your mom enjoy?")
+    assert (session.relationship_type, session.occasion) == ("mom", "birthday")
+    assert (session.budget_min, session.budget_max) == (None, 50)
+    assert session.extracted_insights["budget_hints"] == "under $50"
+
+
+@pytest.mark.asyncio
+async def test_confident_extraction_goes_to_recommendations():
+    """Once there is enough context, a confident turn moves straight to recommendations"""
+    handler = ConversationHandler()
+    handler.ai_service = FakeAIService()
+
+    async def recommend(user, session, message, session_context, send_early=None):
+        return "recommendations"
+
+    handler.handle_recommendation_request = recommend
+    user, session = make_conversation(turn_count=2, insights={"recipient_type": "mom"})
+
+    assert await handler.generate_response(user, session, "it's for her birthday", {}) == "recommendations"
+    assert handler.ai_service.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_model_extraction_fills_budget_and_keeps_known_fields():
+    """Messages the extractor can't explain go to the model, whose budget hints set the budget"""
+    handler = ConversationHandler()
+    handler.ai_service = FakeAIService({"recipient_type": None, "interests": ["gardening"], "budget_hints": "around $40"})
+    user, session = make_conversation(turn_count=1, insights={"recipient_type": "dad"})
+
+    await handler.generate_response(user, session, "he spends every weekend gardening", {})
+
+    assert handler.ai_service.calls == 1
+    assert session.extracted_insights["recipient_type"] == "dad"
+    assert session.extracted_insights["interests"] == ["gardening"]
+    assert (session.budget_min, session.budget_max) == (24, 48)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("message", [
+    "She loves cooking with my dad on weekends",
+    "her friend Anna got her a scarf",
+    "I spent $200 last year on her, want something cheaper",
+    "she's turning 40, budget 30",
+])
+async def test_follow_up_mentions_do_not_overwrite_session_context(message):
+    """Other people and past spending in a longer message are left to the model"""
+    handler = ConversationHandler()
+    handler.ai_service = FakeAIService()
+    user, session = make_conversation(turn_count=1, insights={"recipient_type": "mom"})
+    session.relationship_type = "mom"
+    session.set_budget(None, 50)
+
+    await handler.generate_response(user, session, message, {})
+
+    assert handler.ai_service.calls == 1
+    assert session.extracted_insights == {"recipient_type": "mom"}
+    assert (session.relationship_type, session.recipient_name) == ("mom", None)
+    assert (session.budget_min, session.budget_max) == (None, 50)
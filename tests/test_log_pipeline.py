@@ -0,0 +1,117 @@
+import io
+import json
+import logging
+import threading
+import time
+
+import pytest
+import structlog
+
+from app.config import get_settings
+from app.utils.log_pipeline import (
+    REDACTED, EventSampler, LogWriter, PayloadLimiter, configure_logging, shutdown_logging
+)
+
+
+def test_sampler_drops_sampled_info_events_but_keeps_warnings():
+    sampler = EventSampler({"Request completed": 0.0, "Processing message": 1.0})
+
+    with pytest.raises(structlog.DropEvent):
+        sampler(None, "info", {"event": "Request completed"})
+
+    assert sampler(None, "warning", {"event": "Request completed"}) == {"event": "Request completed"}
+    assert sampler(None, "info", {"event": "Processing message"}) == {"event": "Processing message"}
+    assert sampler(None, "info", {"event": "Unlisted"}) == {"event": "Unlisted"}
+
+
+def test_sampler_marks_kept_events_with_rate():
+    sampler = EventSampler({"Request completed": 0.999999})
+    assert sampler(None, "info", {"event": "Request completed"})["sample_rate"] == 0.999999
+
+
+def test_limiter_redacts_and_truncates_nested_payloads():
+    limiter = PayloadLimiter(["access_token"], max_chars=10, max_items=3, max_depth=2)
+
+    event = limiter(None, "info", {
+        "event": "Webhook received",
+        "access_token": "secret",
+        "data": {"Access_Token": "secret", "text": "x" * 50, "entry": [[1, 2], 3, 4, 5, 6]},
+        "count": 3,
+    })
+
+    assert event["access_token"] == REDACTED
+    assert event["data"]["Access_Token"] == REDACTED
+    assert event["data"]["text"] == "x" * 10 + "…(+40 chars)"
+    assert event["data"]["entry"] == ["<list with 2 items>", 3, 4, "…(+2 items)"]
+    assert event["count"] == 3
+
+
+def test_writer_renders_json_lines_from_background_thread():
+    stream = io.StringIO()
+    writer = LogWriter(stream, asynchronous=True, queue_size=10)
+    writer.start()
+
+    for i in range(3):
+        writer.submit({"event": "hello", "i": i})
+    writer.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["i"] for line in lines] == [0, 1, 2]
+
+
+def test_writer_drops_instead_of_blocking_when_full():
+    stream = io.StringIO()
+    writer = LogWriter(stream, asynchronous=True, queue_size=2)
+
+    # Not started, so nothing drains the queue
+    for i in range(5):
+        writer.submit({"event": "hello", "i": i})
+
+    writer.start()
+    writer.stop()
+    assert len(stream.getvalue().splitlines()) == 2
+
+
+def test_records_logged_after_shutdown_are_still_written():
+    stream = io.StringIO()
+    settings = get_settings().model_copy(update={"log_async": True, "log_level": "INFO", "log_sample_rates": {}})
+    root = logging.getLogger()
+    root_handlers, root_level = root.handlers, root.level
+    configure_logging(settings, stream)
+    try:
+        logger = structlog.get_logger()
+        logger.info("Before shutdown")
+        shutdown_logging()
+        logger.info("After shutdown")
+    finally:
+        shutdown_logging()
+        structlog.reset_defaults()
+        root.handlers = root_handlers
+        root.setLevel(root_level)
+
+    events = [json.loads(line)["event"] for line in stream.getvalue().splitlines()]
+    assert events == ["Before shutdown", "After shutdown"]
+
+
+def test_records_stay_in_order_across_writer_shutdown():
+    class SlowStream(io.StringIO):
+        def write(self, text):
+            time.sleep(0.001)
+            return super().write(text)
+
+    stream = SlowStream()
+    writer = LogWriter(stream, asynchronous=True, queue_size=1000, batch_size=1)
+    writer.start()
+
+    for i in range(50):
+        writer.submit({"event": "hello", "i": i})
+    # Records keep arriving while the queue is drained and after the switch
+    stopping = threading.Thread(target=writer.stop)
+    stopping.start()
+    for i in range(50, 100):
+        writer.submit({"event": "hello", "i": i})
+    stopping.join()
+    for i in range(100, 110):
+        writer.submit({"event": "hello", "i": i})
+
+    assert [json.loads(line)["i"] for line in stream.getvalue().splitlines()] == list(range(110))
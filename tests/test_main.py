@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.integrations.instagram import conversation_handler
 
 client = TestClient(app)
 
@@ -26,4 +27,63 @@ def test_instagram_webhook_verification():
         "/webhook/instagram?hub.mode=subscribe&hub.challenge=test&hub.verify_token=invalid"
     )
     # Expecting 403 because we don't have valid tokens in test
-    assert response.status_code == 403
\ No newline at end of file
+    assert response.status_code == 403
+
+def test_instagram_webhook_rejects_invalid_payload():
+    """Test Instagram webhook payload validation"""
+    response = client.post("/webhook/instagram", json=["not", "an", "object"])
+    assert response.status_code == 400
+
+
+def test_instagram_webhook_acknowledges_without_events():
+    """Test Instagram webhook acknowledges payloads with nothing to queue"""
+    response = client.post("/webhook/instagram", json={"object": "instagram", "entry": []})
+    assert response.status_code == 200
+    assert response.json()["queued"] == 0
+
+
+def test_metrics_endpoint():
+    """Test Prometheus metrics exposition"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "present_agent_stage_seconds" in response.text
+    assert 'present_agent_queue_depth{pool="instagram-events"}' in response.text
+
+
+def test_stage_samples_reach_hook():
+    """Raw stage durations go to the sample hook used by the load test"""
+    from app.utils import metrics
+
+    samples = []
+    metrics.set_sample_hook(lambda name, seconds: samples.append((name, seconds)))
+    try:
+        with metrics.track_stage("test_stage"):
+            pass
+    finally:
+        metrics.set_sample_hook(None)
+
+    assert [name for name, _ in samples] == ["test_stage"]
+    assert samples[0][1] >= 0
+
+
+def test_instagram_stats_report_context_cache():
+    """The stats endpoint includes the context cache counters"""
+    response = client.get("/webhook/instagram/stats")
+    assert response.status_code == 200
+    assert set(response.json()["context_cache"]) == {"hits", "misses", "errors"}
+
+
+def test_instagram_stats_report_llm_cache():
+    """The stats endpoint includes the LLM response cache counters"""
+    response = client.get("/webhook/instagram/stats")
+    assert response.status_code == 200
+    assert set(response.json()["llm_cache"]) == {"entries", "hits", "misses"}
+
+
+def test_instagram_stats_report_recommendation_cache():
+    """The stats endpoint includes per-key recommendation cache hit rates and freshness"""
+    conversation_handler.recommendation_cache._stats_for("mom|birthday")["misses"] += 1
+    response = client.get("/webhook/instagram/stats")
+    assert response.status_code == 200
+    assert response.json()["recommendation_cache"]["mom|birthday"]["hit_rate"] == 0.0
@@ -0,0 +1,65 @@
+import pytest
+
+from app.services import message_dedup
+from app.services.message_dedup import MessageDeduplicator
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for SET NX and DELETE"""
+
+    def __init__(self):
+        self.keys = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.keys.pop(key, None)
+
+
+@pytest.mark.asyncio
+async def test_dedup_suppresses_repeated_mid():
+    """A message ID is processed once; events without one always pass"""
+    dedup = MessageDeduplicator()
+    dedup.use_redis = False
+
+    assert await dedup.claim("m1") is True
+    assert await dedup.claim("m1") is False
+    assert await dedup.claim("m2") is True
+    assert await dedup.claim(None) is True
+    assert await dedup.claim(None) is True
+
+    assert dedup.stats()["suppressed_local"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dedup_local_tier_is_bounded():
+    """The oldest IDs are forgotten once max_entries is reached"""
+    dedup = MessageDeduplicator()
+    dedup.use_redis = False
+    dedup.max_entries = 2
+
+    for mid in ("m1", "m2", "m3"):
+        await dedup.claim(mid)
+
+    assert dedup.stats()["entries"] == 2
+    assert await dedup.claim("m1") is True
+
+
+@pytest.mark.asyncio
+async def test_dedup_shares_claims_through_redis(monkeypatch):
+    """A redelivery to another worker is caught by the Redis claim"""
+    redis = FakeRedis()
+    monkeypatch.setattr(message_dedup, "get_redis", lambda: redis)
+    first, second = MessageDeduplicator(), MessageDeduplicator()
+
+    assert await first.claim("m1") is True
+    assert await second.claim("m1") is False
+    assert second.stats()["suppressed_redis"] == 1
+
+    await first.release("m1")
+    assert await first.claim("m1") is True
@@ -0,0 +1,16 @@
+import uuid
+
+from app.models import GiftSession
+
+
+def test_add_conversation_turn_assigns_sequential_rows():
+    """Each turn becomes its own row with the next sequence number"""
+    session = GiftSession(id=uuid.uuid4(), platform="instagram")
+
+    first = session.add_conversation_turn("hi", "hello!")
+    second = session.add_conversation_turn("for my mom", "what's the occasion?")
+
+    assert (first.seq, second.seq) == (1, 2)
+    assert first.session_id == second.session_id == session.id
+    assert session.turn_count == 2
+    assert second.to_dict()["user_message"] == "for my mom"
@@ -0,0 +1,47 @@
+from app.services.prompt_builder import PromptBuilder, TokenCounter, compact_insights, update_summary
+
+
+def test_builder_never_exceeds_budget():
+    """Sections are truncated so the assembled prompt stays within budget"""
+    builder = PromptBuilder("gpt-4-turbo", budget=120)
+    builder.reserve("system", "You are a thoughtful gift advisor.")
+    builder.fit("message", "word " * 500, max_tokens=40)
+    turns = [{"user_message": "she likes plants " * 10, "bot_response": "lovely! " * 10} for _ in range(20)]
+    history = builder.fit_turns("history", turns)
+
+    report = builder.report()
+    assert report["total"] <= 120
+    assert report["message"] <= 40
+    assert history.count("User:") < 20
+
+
+def test_fit_turns_keeps_most_recent_in_order():
+    """When turns don't all fit, the newest ones are kept, oldest first"""
+    builder = PromptBuilder("gpt-4-turbo", budget=1000)
+    turns = [{"user_message": f"message {n}", "bot_response": f"reply {n}"} for n in range(5)]
+
+    history = builder.fit_turns("history", turns, max_tokens=25)
+
+    assert "message 4" in history
+    assert "message 0" not in history
+    assert history.index("message 3") < history.index("message 4")
+
+
+def test_rolling_summary_is_incremental_and_bounded():
+    """Evicted turns are appended to the summary, dropping the oldest lines past the cap"""
+    counter = TokenCounter("gpt-4-turbo")
+    summary = update_summary("", [{"user_message": "It's for my mom. She turns 60."}], counter, max_tokens=50)
+    assert summary == "- User said: It's for my mom."
+
+    for n in range(30):
+        summary = update_summary(summary, [{"user_message": f"Detail number {n} about her hobbies."}], counter, 50)
+
+    assert counter.count(summary) <= 50
+    assert "Detail number 29" in summary
+    assert "my mom" not in summary
+
+
+def test_compact_insights_skips_empty_fields():
+    """Only populated insight fields are rendered"""
+    text = compact_insights({"recipient_type": "mom", "occasion": None, "interests": ["tea", "plants"], "budget_hints": ""})
+    assert text == "recipient_type: mom\ninterests: tea, plants"
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.rate_limiter import TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_serves_waiters_by_priority():
+    """Once the burst is spent, lower priority numbers get the next tokens"""
+    bucket = TokenBucket(rate=100, burst=1)
+    await bucket.acquire()
+
+    order = []
+
+    async def take(priority, name):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(take(1, f"notice-{n}")) for n in range(2)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(take(0, f"reply-{n}")) for n in range(2)]
+    await asyncio.gather(*tasks)
+
+    assert order == ["reply-0", "reply-1", "notice-0", "notice-1"]
+    assert bucket.stats()["waited"] == 4
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_pause_and_rate_change():
+    """pause() withholds tokens and set_rate() changes how fast they refill"""
+    bucket = TokenBucket(rate=1000, burst=1)
+
+    bucket.pause(0.05)
+    started = time.monotonic()
+    await bucket.acquire()
+    assert time.monotonic() - started >= 0.045
+
+    bucket.set_rate(20)
+    started = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire()
+    # At most one token was saved up, so the other two take 2 / 20 seconds
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_skips_cancelled_waiters():
+    """A waiter cancelled while queued does not use up a token"""
+    bucket = TokenBucket(rate=50, burst=1)
+    await bucket.acquire()
+
+    cancelled = asyncio.create_task(bucket.acquire(0))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    await asyncio.wait_for(bucket.acquire(1), timeout=1)
+    assert bucket.stats()["waiting"] == 0
@@ -0,0 +1,107 @@
+import pytest
+
+from app.services import recommendation_cache
+from app.services.constraint_index import HardConstraints
+from app.services.recommendation_cache import RecommendationCache, budget_band, canonical_gift_context
+
+
+def test_canonical_context_normalizes_equivalent_insights():
+    """Differently phrased but equivalent insights share a canonical form"""
+    a = canonical_gift_context({
+        "recipient_type": "Mother",
+        "occasion": "bday",
+        "interests": ["Gardening", "reading", "gardening"],
+        "budget_hints": "around $60 to $90",
+    })
+    b = canonical_gift_context({
+        "recipient_type": "mom",
+        "occasion": "birthday",
+        "interests": ["reading", "gardening"],
+    }, budget_min=50, budget_max=100)
+
+    assert a == b
+    assert a["interests"] == ["gardening", "reading"]
+    assert a["budget_band"] == "50_100"
+
+
+def test_budget_band_handles_open_ranges_and_hints():
+    """Budget bands come from explicit bounds first, then free-text hints"""
+    assert budget_band(None, 20) == "under_25"
+    assert budget_band(150, None) == "100_200"
+    assert budget_band(None, None, "under 1k") == "500_plus"
+    assert budget_band(None, None, "not sure yet") == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_cache_matches_near_neighbor_interests():
+    """A close interest set in the same bucket reuses the stored recommendations"""
+    cache = RecommendationCache()
+    cache.use_redis = False
+    result = {"recommendations": [{"name": "Herb garden kit"}]}
+
+    stored = {"recipient_type": "mom", "occasion": "birthday", "interests": ["gardening", "cooking", "tea"]}
+    await cache.set(stored, 50, 100, result)
+
+    near = {"recipient_type": "mother", "occasion": "birthday", "interests": ["gardening", "cooking"]}
+    far = {"recipient_type": "mom", "occasion": "birthday", "interests": ["gaming"]}
+    other_bucket = {"recipient_type": "mom", "occasion": "anniversary", "interests": ["gardening", "cooking", "tea"]}
+
+    assert await cache.get(near, 50, 100) == result
+    assert await cache.get(far, 50, 100) is None
+    assert await cache.get(other_bucket, 50, 100) is None
+
+    stats = cache.stats()["mom|birthday|50_100|-"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_skips_incomplete_contexts():
+    """Contexts without a recipient and occasion are never cached"""
+    cache = RecommendationCache()
+    cache.use_redis = False
+
+    await cache.set({"interests": ["tea"]}, None, None, {"recommendations": []})
+    assert await cache.get({"interests": ["tea"]}) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_skips_sets_outside_a_different_budget():
+    """A set cached for one budget isn't served to a session whose budget it breaks"""
+    cache = RecommendationCache()
+    cache.use_redis = False
+    insights = {"recipient_type": "mom", "occasion": "birthday", "interests": ["gardening"]}
+    result = {"recommendations": [
+        {"name": "Herb garden kit", "estimated_price": 35},
+        {"name": "Greenhouse cabinet", "estimated_price": 95},
+    ]}
+    await cache.set(insights, None, 100, result)
+
+    def lookup(budget_min, budget_max):
+        constraints = HardConstraints.from_context(insights, (budget_min, budget_max))
+        return cache.get(insights, budget_min, budget_max, accept=constraints.admits)
+
+    # All three budgets fall in the same 50_100 band
+    assert await lookup(None, 100) == result
+    assert await lookup(None, 60) is None
+    assert await lookup(80, 100) is None
+    assert cache.stats()["mom|birthday|50_100|-"]["misses"] == 2
+
+
+def test_admits_price_reads_numbers_and_ranges():
+    """Prices are checked against both ends of the budget; unreadable prices pass"""
+    constraints = HardConstraints(budget_min=20, budget_max=50)
+
+    assert constraints.admits_price(35)
+    assert not constraints.admits_price(60)
+    assert not constraints.admits_price("$10-30")
+    assert constraints.admits_price("varies")
+
+
+def test_redis_tier_has_its_own_switch(monkeypatch):
+    """Turning Redis off for LLM responses leaves it on for recommendation sets"""
+    settings = recommendation_cache.get_settings().model_copy(
+        update={"llm_cache_use_redis": False, "recommendation_cache_use_redis": True}
+    )
+    monkeypatch.setattr(recommendation_cache, "get_settings", lambda: settings)
+
+    assert RecommendationCache().use_redis is True
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app.utils.resilience import CircuitBreaker, LatencyTracker, hedged
+
+
+def test_breaker_opens_on_error_rate_and_recovers_after_probe():
+    """The breaker trips past the threshold and closes again after a successful probe"""
+    breaker = CircuitBreaker("test", window=10, min_calls=4, error_threshold=0.5, cooldown=0)
+
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Cooldown elapsed: one probe is let through, concurrent calls are refused
+    assert breaker.allow() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.cooldown = 60
+    assert breaker.allow() is False
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() is True
+
+
+def test_breaker_refuses_calls_while_open():
+    breaker = CircuitBreaker("test", window=4, min_calls=2, error_threshold=0.5, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.allow() is False
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["trips"] == 1
+
+
+def test_latency_percentile_needs_min_samples():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for i in range(9):
+        tracker.record(i / 10)
+    assert tracker.percentile(0.95) is None
+
+    tracker.record(5.0)
+    assert tracker.percentile(0.95) == 5.0
+    assert tracker.percentile(0.5) == 0.5
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_returns_faster_attempt():
+    """A slow first attempt is raced by a second one and cancelled when it loses"""
+    delays = [1.0, 0.01]
+    cancelled = []
+
+    async def call():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    result, hedge_started = await hedged(call, delay=0.02)
+    await asyncio.sleep(0)
+
+    assert result == 0.01
+    assert hedge_started is True
+    assert cancelled == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_unhedged_call_raises_error():
+    async def call():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await hedged(call, delay=None)
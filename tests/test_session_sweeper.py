@@ -0,0 +1,74 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models import GiftSession, User
+from app.models.gift_session import SessionStatus
+from app.services.session_sweeper import SessionSweeper
+
+NOW = datetime(2024, 6, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def days_ago(days):
+    return NOW - timedelta(days=days)
+
+
+@pytest.mark.asyncio
+async def test_sweep_abandons_only_idle_active_sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    sessions = {
+        "idle": dict(created_at=days_ago(10)),
+        "idle_updated": dict(created_at=days_ago(10), updated_at=days_ago(5)),
+        "recently_updated": dict(created_at=days_ago(10), updated_at=days_ago(0.5)),
+        "new": dict(created_at=days_ago(0.1)),
+        "completed": dict(created_at=days_ago(10), status=SessionStatus.COMPLETED.value),
+    }
+    ids = {name: uuid.uuid4() for name in sessions}
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        # A user per session, as each user has at most one active session
+        for name, columns in sessions.items():
+            user_id = uuid.uuid4()
+            db.add(User(id=user_id, instagram_id=f"ig-{name}"))
+            db.add(GiftSession(id=ids[name], user_id=user_id, platform="instagram", **{"status": "active", **columns}))
+        await db.commit()
+
+    sweeper = SessionSweeper(session_factory=factory)
+    sweeper.idle_timeout = 2 * 86400
+    sweeper.batch_size = 1
+
+    assert await sweeper.sweep(now=NOW) == 2
+    assert await sweeper.sweep(now=NOW) == 0
+
+    async with factory() as db:
+        status = dict((await db.execute(select(GiftSession.id, GiftSession.status))).all())
+    assert status[ids["idle"]] == status[ids["idle_updated"]] == SessionStatus.ABANDONED.value
+    assert status[ids["recently_updated"]] == status[ids["new"]] == SessionStatus.ACTIVE.value
+    assert status[ids["completed"]] == SessionStatus.COMPLETED.value
+    assert sweeper.stats()["abandoned"] == 2
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sweep_batch_is_served_by_the_last_activity_index(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        statement = SessionSweeper()._abandon_statement(NOW).compile(engine.sync_engine)
+        plan = await conn.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", tuple(statement.params[name] for name in statement.positiontup)
+        )
+        details = [row[-1] for row in plan]
+
+    assert any("ix_gift_sessions_active_last_activity" in detail for detail in details)
+
+    await engine.dispose()
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.utils.worker_pool import KeyedWorkerPool
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_preserves_order_per_key():
+    """Items for the same key are handled in submission order"""
+    handled = []
+
+    async def handler(item):
+        key, n = item
+        # Later items finish faster, so only sequential handling keeps order
+        await asyncio.sleep(0.01 * (5 - n))
+        handled.append(item)
+
+    pool = KeyedWorkerPool("test", handler, workers=4, queue_size=100)
+    await pool.start()
+    for n in range(5):
+        pool.submit("alice", ("alice", n))
+        pool.submit("bob", ("bob", n))
+    await pool.stop()
+
+    assert [n for key, n in handled if key == "alice"] == list(range(5))
+    assert [n for key, n in handled if key == "bob"] == list(range(5))
+    assert pool.stats()["processed"] == 10
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_rejects_when_full():
+    """Submitting to a full pool raises QueueFull and is counted"""
+    release = asyncio.Event()
+
+    async def handler(item):
+        await release.wait()
+
+    pool = KeyedWorkerPool("test", handler, workers=1, queue_size=1)
+    await pool.start()
+    pool.submit("alice", 1)
+    await asyncio.sleep(0)  # worker picks up the first item
+    pool.submit("alice", 2)
+
+    with pytest.raises(asyncio.QueueFull):
+        pool.submit("alice", 3)
+
+    assert pool.stats()["rejected"] == 1
+    release.set()
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_requires_start():
+    """Submitting before start raises"""
+    async def handler(item):
+        pass
+
+    pool = KeyedWorkerPool("test", handler)
+    with pytest.raises(RuntimeError):
+        pool.submit("alice", 1)
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_takes_lower_priority_numbers_first():
+    """Queued items with a lower priority number overtake earlier ones"""
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(item):
+        await release.wait()
+        handled.append(item)
+
+    pool = KeyedWorkerPool("test", handler, workers=1, queue_size=10)
+    await pool.start()
+    pool.submit("a", "first")
+    await asyncio.sleep(0)
+    pool.submit("a", "low-1", priority=1)
+    pool.submit("b", "high-1", priority=0)
+    pool.submit("a", "low-2", priority=1)
+    pool.submit("b", "high-2", priority=0)
+    release.set()
+    await pool.stop()
+
+    assert handled == ["first", "high-1", "high-2", "low-1", "low-2"]
+
+
+@pytest.mark.asyncio
+async def test_slow_key_does_not_hold_up_other_keys():
+    """While one key's item is stuck, an idle worker handles every other key"""
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(item):
+        key, n = item
+        if key == "slow":
+            await release.wait()
+        handled.append(item)
+
+    pool = KeyedWorkerPool("test", handler, workers=2, queue_size=100)
+    await pool.start()
+    pool.submit("slow", ("slow", 0))
+    pool.submit("slow", ("slow", 1))
+    for n in range(10):
+        pool.submit(f"user-{n}", (f"user-{n}", 0))
+    await asyncio.sleep(0.01)
+
+    assert sorted(key for key, _ in handled) == sorted(f"user-{n}" for n in range(10))
+    stats = pool.stats()
+    assert (stats["depth"], stats["busy_keys"], stats["waiting_keys"]) == (1, 1, 1)
+    assert stats["oldest_wait_seconds"] > 0
+
+    release.set()
+    await pool.stop()
+    assert handled[-2:] == [("slow", 0), ("slow", 1)]
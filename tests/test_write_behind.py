@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models import ConversationTurn, GiftSession, User
+from app.services.write_behind import WriteBehindBuffer
+
+
+async def make_engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+async def load_detached(engine, count):
+    """Users with one session each, loaded and then detached as the handler leaves them"""
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        for i in range(count):
+            user = User(id=uuid.uuid4(), instagram_id=f"ig-{i}", total_conversations=0)
+            db.add_all([user, GiftSession(id=uuid.uuid4(), user_id=user.id, platform="instagram", turn_count=0)])
+        await db.commit()
+
+    async with factory() as db:
+        sessions = (await db.execute(select(GiftSession).order_by(GiftSession.id))).scalars().all()
+        users = {user.id: user for user in (await db.execute(select(User))).scalars().all()}
+    return [(users[session.user_id], session) for session in sessions]
+
+
+def message(user, session, text):
+    user.add_conversation()
+    session.update_insights({"occasion": text})
+    return session.add_conversation_turn(text, f"re: {text}")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_share_one_transaction(tmp_path):
+    """Writes arriving together are committed in one batch and leave the objects clean"""
+    engine = await make_engine(tmp_path)
+    buffer = WriteBehindBuffer(engine)
+    buffer.window = 0.05
+    await buffer.start()
+
+    pairs = await load_detached(engine, 3)
+    await asyncio.gather(*(
+        buffer.submit(user, session, message(user, session, f"birthday-{i}"))
+        for i, (user, session) in enumerate(pairs)
+    ))
+
+    assert buffer.stats()["batches"] == 1
+    assert buffer.stats()["records"] == 9
+
+    async with engine.connect() as conn:
+        turns = (await conn.execute(select(func.count()).select_from(ConversationTurn.__table__))).scalar()
+        counters = (await conn.execute(select(User.total_conversations))).scalars().all()
+        insights = (await conn.execute(select(GiftSession.extracted_insights))).scalars().all()
+    assert turns == 3
+    assert counters == [1, 1, 1]
+    assert sorted(i["occasion"] for i in insights) == ["birthday-0", "birthday-1", "birthday-2"]
+
+    # A second message builds on the committed state
+    user, session = pairs[0]
+    await buffer.submit(user, session, message(user, session, "anniversary"))
+    async with engine.connect() as conn:
+        seqs = (await conn.execute(
+            select(ConversationTurn.seq).where(ConversationTurn.session_id == session.id)
+        )).scalars().all()
+    assert sorted(seqs) == [1, 2]
+
+    await buffer.stop()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_counters_from_one_stale_snapshot_both_count(tmp_path):
+    """Two copies of the same user each add one; the increments are applied on the server"""
+    engine = await make_engine(tmp_path)
+    buffer = WriteBehindBuffer(engine)
+    await buffer.start()
+
+    [(user, _)] = await load_detached(engine, 1)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        stale = await db.get(User, user.id)
+    for copy in (user, stale):
+        copy.add_conversation()
+        copy.add_successful_recommendation()
+
+    await buffer.submit(user)
+    await buffer.submit(stale)
+
+    async with engine.connect() as conn:
+        counters = (await conn.execute(select(User.total_conversations, User.successful_recommendations))).one()
+    assert tuple(counters) == (2, 2)
+    assert stale.total_conversations == 1
+
+    await buffer.stop()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_record_only_fails_its_own_submission(tmp_path):
+    """A batch that fails is retried per submission"""
+    engine = await make_engine(tmp_path)
+    buffer = WriteBehindBuffer(engine)
+    buffer.window = 0.05
+    await buffer.start()
+
+    (good_user, good_session), (_, bad_session) = await load_detached(engine, 2)
+    duplicate = ConversationTurn(session_id=bad_session.id, seq=1, user_message="a", bot_response="b")
+    clash = ConversationTurn(session_id=bad_session.id, seq=1, user_message="c", bot_response="d")
+
+    results = await asyncio.gather(
+        buffer.submit(good_user, good_session, message(good_user, good_session, "birthday")),
+        buffer.submit(duplicate, clash),
+        return_exceptions=True
+    )
+
+    assert results[0] is None
+    assert isinstance(results[1], Exception)
+    assert buffer.stats()["failed"] == 1
+
+    await buffer.stop()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_writes(tmp_path):
+    """Writes still waiting for the window are committed on shutdown"""
+    engine = await make_engine(tmp_path)
+    buffer = WriteBehindBuffer(engine)
+    buffer.window = 60
+    await buffer.start()
+
+    [(user, session)] = await load_detached(engine, 1)
+    pending = asyncio.create_task(buffer.submit(user, session, message(user, session, "birthday")))
+    await asyncio.sleep(0)
+
+    await buffer.stop()
+    await pending
+
+    with pytest.raises(RuntimeError):
+        await buffer.submit(user)
+    await engine.dispose()